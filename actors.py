@@ -0,0 +1,101 @@
+"""
+Per-guild command actors.
+
+Everything that mutates a guild's GameState (slash commands, component
+callbacks, deadline timeouts) is queued on that guild's actor and run one job
+at a time, in arrival order. Each actor has an asyncio queue bounded at
+GUILD_QUEUE_DEPTH and at most one worker task, which exits once the queue is
+drained, so only guilds with work in flight hold a task. Guilds never wait on
+each other: there is no lock shared between them.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+# jobs a guild may have waiting before new commands are turned away
+GUILD_QUEUE_DEPTH = int(os.getenv('GUILD_QUEUE_DEPTH', '16'))
+
+T = TypeVar('T')
+Job = Callable[[], Awaitable[T]]
+
+
+class GuildBusy(Exception):
+    """The guild's queue is full; the caller should ask the user to retry."""
+
+
+class _Actor:
+    __slots__ = ('queue', 'worker')
+
+    def __init__(self):
+        # unbounded as a data structure; GuildActors.run enforces the depth so
+        # that jobs which must not be dropped can still be queued past it
+        self.queue: "asyncio.Queue[Tuple[Job, asyncio.Future]]" = asyncio.Queue()
+        self.worker: Optional[asyncio.Task] = None
+
+
+class GuildActors:
+    """Serialize jobs per guild, with queue-depth backpressure."""
+
+    def __init__(self, depth: int = GUILD_QUEUE_DEPTH):
+        if depth < 1:
+            raise ValueError('depth must be at least 1')
+        self.depth = depth
+        self._actors: Dict[int, _Actor] = {}
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        """Guilds with queued or running jobs."""
+        return len(self._actors)
+
+    def queued(self, guild_id: int) -> int:
+        actor = self._actors.get(guild_id)
+        return actor.queue.qsize() if actor else 0
+
+    async def run(self, guild_id: int, job: Job, force: bool = False) -> T:
+        """Run ``job()`` after the guild's earlier jobs and return its result.
+
+        Raises GuildBusy if ``depth`` jobs are already waiting, unless ``force``
+        is set (for jobs that must not be dropped, such as timeouts). Never
+        call this from a job of the same guild: it would wait on itself.
+        """
+        actor = self._actors.get(guild_id)
+        if actor is None:
+            actor = self._actors[guild_id] = _Actor()
+        elif not force and actor.queue.qsize() >= self.depth:
+            self.rejected += 1
+            raise GuildBusy(guild_id)
+        fut = asyncio.get_running_loop().create_future()
+        actor.queue.put_nowait((job, fut))
+        if actor.worker is None:
+            actor.worker = asyncio.create_task(self._drain(guild_id, actor))
+        return await fut
+
+    async def _drain(self, guild_id: int, actor: _Actor):
+        try:
+            while not actor.queue.empty():
+                job, fut = actor.queue.get_nowait()
+                if fut.cancelled():
+                    # the caller gave up (interaction expired) before its turn
+                    continue
+                try:
+                    result = await job()
+                except asyncio.CancelledError:
+                    if not fut.done():
+                        fut.cancel()
+                    if asyncio.current_task().cancelling():
+                        # the worker itself is being cancelled, not just the job
+                        raise
+                except BaseException as e:
+                    # whatever the job raised is its caller's to handle; the guild carries on
+                    if not fut.done():
+                        fut.set_exception(e)
+                else:
+                    if not fut.done():
+                        fut.set_result(result)
+        finally:
+            # only a cancelled worker leaves jobs behind, and nothing would ever run them
+            while not actor.queue.empty():
+                actor.queue.get_nowait()[1].cancel()
+            actor.worker = None
+            if self._actors.get(guild_id) is actor:
+                del self._actors[guild_id]
@@ -0,0 +1,271 @@
+"""
+Monte Carlo balance simulator for Basketball Blitz.
+
+Plays many full games at once in NumPy arrays, one possession per step for
+every game, using the same action sets the bot offers (``game_core``'s
+ATTACK_ACTIONS / SG_SHOTS / GUESS_OPTIONS / SAVE_OPTIONS) and the same
+outcome tables (GUESS_HITS / ACTION_POINTS) that ``game_core.resolve`` uses. Players
+pick uniformly at random unless a strategy mix says otherwise.
+
+NumPy is optional for the bot itself and only needed here:
+
+    pip install numpy
+    python balance_sim.py --games 1000000
+    python balance_sim.py --pg pg_half=3,sidepass=1 --guess 3-pointer=2 --json sim.json
+    python balance_sim.py --games 2000 --check    # compare with game_core.play_turn
+
+Rosters are full 3v3 with nobody AFK, so every possession uses exactly one move.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Dict, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from game_core import (GameState, MAX_MOVES, Action, ATTACK_ACTIONS, SG_SHOTS, GUESS_OPTIONS, SAVE_OPTIONS,
+                       GUESS_HITS, ACTION_POINTS)
+
+POSITIONS = ('pg', 'sg', 'ce')
+# every attacker action, PG then SG then CE, as indexed by the outcome arrays
+ACTIONS = tuple(value for pos in POSITIONS for value, _ in ATTACK_ACTIONS[pos])
+SG_SHOT_VALUES = tuple(value for value, _ in SG_SHOTS)
+BATCH_SIZE = 250_000
+
+
+def parse_mix(spec: Optional[str], options: Sequence[str]) -> Dict[str, float]:
+    """``'a=3,b=1'`` -> weights over ``options``; unnamed options get weight 0.
+
+    An empty spec is the uniform mix.
+    """
+    if not spec:
+        return {o: 1.0 for o in options}
+    weights = {o: 0.0 for o in options}
+    for part in spec.split(','):
+        name, _, w = part.partition('=')
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f'unknown choice {name!r}; expected one of {", ".join(options)}')
+        weights[name] = float(w) if w else 1.0
+    if not sum(weights.values()) > 0:
+        raise ValueError('strategy mix has no positive weights')
+    return weights
+
+
+class Strategy:
+    """How each role picks: weights over the options at each prompt."""
+
+    def __init__(self, pg: Optional[str] = None, sg: Optional[str] = None, sg_shot: Optional[str] = None,
+                 guess: Optional[str] = None, save: Optional[str] = None):
+        self.attack = {
+            'pg': parse_mix(pg, [v for v, _ in ATTACK_ACTIONS['pg']]),
+            'sg': parse_mix(sg, [v for v, _ in ATTACK_ACTIONS['sg']]),
+            'ce': parse_mix(None, [v for v, _ in ATTACK_ACTIONS['ce']]),
+        }
+        self.sg_shot = parse_mix(sg_shot, SG_SHOT_VALUES)
+        self.guess = parse_mix(guess, GUESS_OPTIONS)
+        self.save = parse_mix(save, SAVE_OPTIONS)
+
+    def describe(self) -> Dict[str, Dict[str, float]]:
+        return {'pg': self.attack['pg'], 'sg': self.attack['sg'], 'sg_shot': self.sg_shot,
+                'guess': self.guess, 'save': self.save}
+
+
+def _require_numpy():
+    if np is None:
+        sys.exit('balance_sim needs NumPy: pip install numpy')
+
+
+def _probs(weights: Dict[str, float], options: Sequence[str]):
+    p = np.array([weights.get(o, 0.0) for o in options], dtype=np.float64)
+    return p / p.sum()
+
+
+def _tables():
+    """game_core's outcome tables as arrays indexed by action / guess position."""
+    guess_hit = np.array([[GUESS_HITS[a, g] for g in GUESS_OPTIONS] for a in ACTIONS])
+    save_hit = np.array([[GUESS_HITS[a, g] for g in SAVE_OPTIONS] for a in ACTIONS])
+    points = np.array([ACTION_POINTS[a] for a in ACTIONS], dtype=np.int16)
+    sidepass = np.array([a == Action.SIDEPASS for a in ACTIONS])
+    sg_index = np.array([ACTIONS.index(v) for v in SG_SHOT_VALUES])
+    return guess_hit, save_hit, points, sidepass, sg_index
+
+
+def _draw(rng, probs, n: int):
+    return rng.choice(len(probs), size=n, p=probs)
+
+
+def simulate_batch(n: int, strategy: Strategy, rng) -> Dict[str, 'np.ndarray']:
+    """Play ``n`` games; team 0 won the toss and starts with the ball at PG."""
+    guess_hit, save_hit, points, sidepass, sg_index = _tables()
+    # per position: the action-index range in ACTIONS and the draw probabilities
+    offsets, probs = {}, {}
+    start = 0
+    for pos in POSITIONS:
+        values = [v for v, _ in ATTACK_ACTIONS[pos]]
+        offsets[pos] = start
+        probs[pos] = _probs(strategy.attack[pos], values)
+        start += len(values)
+    pos_codes = {pos: i for i, pos in enumerate(POSITIONS)}
+    guess_p = _probs(strategy.guess, GUESS_OPTIONS)
+    save_p = _probs(strategy.save, SAVE_OPTIONS)
+    sg_p = _probs(strategy.sg_shot, SG_SHOT_VALUES)
+
+    scores = np.zeros((n, 2), dtype=np.int16)
+    team = np.zeros(n, dtype=np.int8)
+    pos = np.zeros(n, dtype=np.int8)  # index into POSITIONS
+    steals = np.zeros(n, dtype=np.int16)
+    twos = np.zeros(n, dtype=np.int32)
+    threes = np.zeros(n, dtype=np.int32)
+    rows = np.arange(n)
+
+    for _ in range(MAX_MOVES):
+        action = np.empty(n, dtype=np.int16)
+        for p, code in pos_codes.items():
+            at = pos == code
+            k = int(at.sum())
+            if k:
+                action[at] = offsets[p] + _draw(rng, probs[p], k)
+
+        guessed = guess_hit[action, _draw(rng, guess_p, n)]
+        # a missed guess on a sidepass hands the shot to the SG
+        passed = sidepass[action] & ~guessed
+        shot = action.copy()
+        k = int(passed.sum())
+        if k:
+            shot[passed] = sg_index[_draw(rng, sg_p, k)]
+        saved = ~guessed & save_hit[shot, _draw(rng, save_p, n)]
+        scored = ~guessed & ~saved
+
+        pts = np.where(scored, points[shot], 0)
+        scores[rows, team] += pts.astype(np.int16)
+        twos += (pts == 2)
+        threes += (pts == 3)
+        steals += ~scored
+        # defence gets the ball: at CE after a steal, at PG after a score
+        team = 1 - team
+        pos = np.where(scored, pos_codes['pg'], pos_codes['ce']).astype(np.int8)
+
+    return {'scores': scores, 'steals': steals, 'twos': twos, 'threes': threes}
+
+
+def simulate(n_games: int, strategy: Strategy, seed: Optional[int] = None) -> Dict[str, 'np.ndarray']:
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    parts = [simulate_batch(min(BATCH_SIZE, n_games - done), strategy, rng)
+             for done in range(0, n_games, BATCH_SIZE)]
+    return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+
+def summarize(result: Dict[str, 'np.ndarray']) -> Dict[str, object]:
+    scores = result['scores'].astype(np.int32)
+    n = len(scores)
+    margin = scores[:, 0] - scores[:, 1]
+    total = scores.sum(axis=1)
+    pcts = (1, 5, 25, 50, 75, 95, 99)
+    shots = int(result['twos'].sum() + result['threes'].sum())
+    values, counts = np.unique(scores.ravel(), return_counts=True)
+    return {
+        'games': n,
+        'team_score': {
+            'mean': float(scores.mean()),
+            'std': float(scores.std()),
+            'percentiles': {p: float(v) for p, v in zip(pcts, np.percentile(scores, pcts))},
+            'histogram': {int(v): int(c) for v, c in zip(values, counts)},
+        },
+        'total_points_mean': float(total.mean()),
+        'steal_rate': float(result['steals'].sum()) / (n * MAX_MOVES),
+        'three_point_share': float(result['threes'].sum()) / shots if shots else 0.0,
+        # the game goes to overtime when tied after MAX_MOVES (GameState.check_overtime_needed)
+        'overtime_rate': float((margin == 0).mean()),
+        'toss_winner': {
+            'win': float((margin > 0).mean()),
+            'loss': float((margin < 0).mean()),
+            'tie': float((margin == 0).mean()),
+        },
+    }
+
+
+def simulate_reference(n_games: int, strategy: Strategy, seed: Optional[int] = None) -> Dict[str, 'np.ndarray']:
+    """The same games played one turn at a time through ``GameState.play_turn``."""
+    rng = random.Random(seed)
+
+    def pick(weights: Dict[str, float]) -> str:
+        return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    out = {k: np.zeros(n_games, dtype=np.int32) for k in ('steals', 'twos', 'threes')}
+    out['scores'] = np.zeros((n_games, 2), dtype=np.int16)
+    for i in range(n_games):
+        gs = GameState(1)
+        for uid in range(1, 7):
+            gs.join_player(uid, f'p{uid}')
+        gs.start_game(1)
+        while gs.active:
+            attack = pick(strategy.attack[gs.current_attacker_pos])
+            events = gs.play_turn(attack, pick(strategy.guess), pick(strategy.save), pick(strategy.sg_shot))
+            last = events[-1]
+            if last.points:
+                out['twos' if last.points == 2 else 'threes'][i] += 1
+            else:
+                out['steals'][i] += 1
+        out['scores'][i] = [gs.teams[1].score, gs.teams[2].score]
+    return out
+
+
+def _print_summary(label: str, s: Dict[str, object]):
+    ts = s['team_score']
+    tw = s['toss_winner']
+    print(f'{label}: {s["games"]:,} games')
+    print(f'  team score      mean {ts["mean"]:.2f}  std {ts["std"]:.2f}  '
+          f'p5/p50/p95 {ts["percentiles"][5]:.0f}/{ts["percentiles"][50]:.0f}/{ts["percentiles"][95]:.0f}')
+    print(f'  steal rate      {s["steal_rate"]:.3f} of possessions')
+    print(f'  3pt share       {s["three_point_share"]:.3f} of made shots')
+    print(f'  overtime        {s["overtime_rate"]:.3f} of games')
+    print(f'  toss winner     win {tw["win"]:.3f}  loss {tw["loss"]:.3f}  tie {tw["tie"]:.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Basketball Blitz Monte Carlo balance simulator')
+    parser.add_argument('--games', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--pg', help='PG action mix, e.g. pg_half=3,sidepass=1 (default: uniform)')
+    parser.add_argument('--sg', help='SG action mix when the SG has the ball')
+    parser.add_argument('--sg-shot', help='SG shot mix after a sidepass')
+    parser.add_argument('--guess', help='defender guess mix')
+    parser.add_argument('--save', help='centre save-attempt mix')
+    parser.add_argument('--check', action='store_true',
+                        help='also play --games through game_core.play_turn and compare')
+    parser.add_argument('--json', metavar='PATH', help='write the summary to a JSON file')
+    args = parser.parse_args()
+    _require_numpy()
+
+    try:
+        strategy = Strategy(args.pg, args.sg, args.sg_shot, args.guess, args.save)
+    except ValueError as e:
+        parser.error(str(e))
+
+    t0 = time.perf_counter()
+    summary = summarize(simulate(args.games, strategy, args.seed))
+    summary['seconds'] = time.perf_counter() - t0
+    _print_summary(f'simulated in {summary["seconds"]:.2f}s', summary)
+    doc = {'strategy': strategy.describe(), 'simulated': summary}
+
+    if args.check:
+        t0 = time.perf_counter()
+        reference = summarize(simulate_reference(args.games, strategy, args.seed))
+        reference['seconds'] = time.perf_counter() - t0
+        _print_summary(f'game_core engine in {reference["seconds"]:.2f}s', reference)
+        doc['engine'] = reference
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(doc, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,689 @@
+"""
+Benchmarks for Basketball Blitz.
+
+Everything runs headless against a throwaway database in a temp directory, so
+the live ``basketball_blitz.db`` is never touched.
+
+Usage:
+    python bench.py connections [--ops N] [--guilds N]
+    python bench.py writes [--moves N]
+    python bench.py restore [--games N] [--backend sqlite|memory]
+    python bench.py codec [--games N]
+    python bench.py match [--guilds N] [--backends sqlite memory] [--json PATH] [--trace-memory]
+    python bench.py memory [--lobbies N]
+    python bench.py outcomes [--rounds N]
+    python bench.py practice [--players N] [--shots N]
+    python bench.py livescore [--calls N] [--change-every N]
+    python bench.py career [--guilds N] [--players N] [--backend sqlite|memory]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import codec
+import game
+from benchutil import check, ms, percentile, temp_db
+import persistence
+import game_core
+from game_core import GameState, HALFTIME, MAX_MOVES, Action, Guess
+
+
+def full_lobby(host_id: int = 1) -> GameState:
+    """A started 3v3 game with every slot filled."""
+    gs = GameState(host_id)
+    for uid in range(host_id, host_id + 6):
+        gs.join_player(uid, f'player{uid}')
+    gs.start_game(host_id)
+    return gs
+
+
+# ---------------------------------------------------------------------------
+# connections: per-call sqlite3.connect vs. the pooled WAL connections
+# ---------------------------------------------------------------------------
+
+def _percall_init():
+    conn = sqlite3.connect(persistence.DB_PATH)
+    persistence._create_schema(conn.cursor())
+    conn.commit()
+    conn.close()
+
+
+def _percall_save(guild_id: int, gs: GameState):
+    # the pre-pool pattern: connect, write, commit, close
+    conn = sqlite3.connect(persistence.DB_PATH)
+    persistence._write_snapshot(conn.cursor(), guild_id, persistence._snapshot(guild_id, gs))
+    conn.commit()
+    conn.close()
+
+
+def _percall_load(guild_id: int):
+    conn = sqlite3.connect(persistence.DB_PATH)
+    gs = persistence._read_game(conn.cursor(), guild_id)
+    conn.close()
+    return gs
+
+
+def _time_ops(save: Callable, load: Callable, ops: int, guilds: int) -> Dict[str, float]:
+    games = {gid: full_lobby() for gid in range(1, guilds + 1)}
+    t0 = time.perf_counter()
+    for i in range(ops):
+        gid = i % guilds + 1
+        gs = games[gid]
+        gs.score_points(1, 2)
+        gs.increment_move()
+        save(gid, gs)
+    t1 = time.perf_counter()
+    for i in range(ops):
+        load(i % guilds + 1)
+    t2 = time.perf_counter()
+    return {
+        'save_ms': (t1 - t0) / ops * 1000,
+        'load_ms': (t2 - t1) / ops * 1000,
+        'saves_per_sec': ops / (t1 - t0),
+        'loads_per_sec': ops / (t2 - t1),
+    }
+
+
+def bench_connections(ops: int = 2000, guilds: int = 50) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with temp_db():
+        _percall_init()
+        results['per-call'] = _time_ops(_percall_save, _percall_load, ops, guilds)
+    with temp_db():
+        persistence.init_db()
+        results['pooled'] = _time_ops(persistence.save_game, persistence.load_game, ops, guilds)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# writes: rows written per move, full rewrite vs. dirty-tracked save
+# ---------------------------------------------------------------------------
+
+def bench_write_volume(moves: int = 36) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for mode in ('full', 'incremental'):
+        with temp_db() as path:
+            _percall_init()
+            conn = sqlite3.connect(path)
+            c = conn.cursor()
+            gs = full_lobby()
+            persistence._write_snapshot(c, 1, persistence._snapshot(1, gs))
+            conn.commit()
+            before = conn.total_changes
+            t0 = time.perf_counter()
+            for i in range(moves):
+                gs.score_points(1 + i % 2, 2)
+                gs.increment_move()
+                snap = persistence._snapshot(1, gs, full=(mode == 'full'))
+                persistence._write_snapshot(c, 1, snap)
+                conn.commit()
+            elapsed = time.perf_counter() - t0
+            rows = conn.total_changes - before
+            conn.close()
+        results[mode] = {
+            'rows_per_move': rows / moves,
+            'save_ms': elapsed / moves * 1000,
+        }
+    return results
+
+
+# ---------------------------------------------------------------------------
+# restore: startup load of every active game, per-guild vs. set-based
+# ---------------------------------------------------------------------------
+
+def bench_restore(n_games: int = 5000, backend: str = 'sqlite') -> Dict[str, Dict[str, float]]:
+    results = {}
+    with temp_db() as path:
+        store = persistence.make_backend(backend, **({'db_path': path} if backend == 'sqlite' else {}))
+        store.init()
+        for gid in range(1, n_games + 1):
+            gs = full_lobby(gid * 10)
+            gs.guild_id = gid
+            gs.make_sub_request(1, 'sg', gid * 10 + 9, 'bench')
+            store.save(gid, gs)
+
+        t0 = time.perf_counter()
+        per_guild = {gid: store.load(gid) for gid in store.list()}
+        t1 = time.perf_counter()
+        bulk = store.bulk_load()
+        t2 = time.perf_counter()
+        store.close()
+        check(len(per_guild) == len(bulk) == n_games, 'restored game counts')
+    results['per-guild'] = {'games': n_games, 'seconds': t1 - t0}
+    results['bulk'] = {'games': n_games, 'seconds': t2 - t1}
+    return results
+
+
+# ---------------------------------------------------------------------------
+# codec: binary blob snapshots vs. the normalized multi-row layout
+# ---------------------------------------------------------------------------
+
+def _busy_lobby(guild_id: int) -> GameState:
+    gs = full_lobby(guild_id * 10)
+    gs.guild_id = guild_id
+    gs.start_toss()
+    gs.set_toss_choice(1, 'high')
+    gs.set_toss_choice(2, 'low')
+    gs.make_sub_request(1, 'sg', guild_id * 10 + 9, 'bench sub')
+    gs.score_points(1, 7)
+    gs.score_points(2, 5)
+    for _ in range(12):
+        gs.increment_move()
+    return gs
+
+
+def bench_codec(n_games: int = 2000) -> Dict[str, Dict[str, float]]:
+    games = [_busy_lobby(gid) for gid in range(1, n_games + 1)]
+
+    t0 = time.perf_counter()
+    blobs = [codec.encode(gs) for gs in games]
+    t1 = time.perf_counter()
+    decoded = [codec.decode(b) for b in blobs]
+    t2 = time.perf_counter()
+    check(all(codec.encode(gs) == b for gs, b in zip(decoded, blobs)), 'codec round trip')
+    codec_times = ((t1 - t0) / n_games * 1e6, (t2 - t1) / n_games * 1e6)
+
+    results = {}
+    old_mode = persistence.STORAGE_MODE
+    try:
+        for mode in ('rows', 'blob'):
+            persistence.STORAGE_MODE = mode
+            with temp_db() as path:
+                persistence.init_db()
+                empty = os.path.getsize(path)
+                with persistence.get_pool().connection() as conn:
+                    c = conn.cursor()
+                    t0 = time.perf_counter()
+                    for gs in games:
+                        snap = persistence._snapshot(gs.guild_id, gs, full=True)
+                        persistence._write_snapshot(c, gs.guild_id, snap)
+                    t1 = time.perf_counter()
+                with persistence.get_pool().connection() as conn:
+                    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    c = conn.cursor()
+                    t2 = time.perf_counter()
+                    for gs in games:
+                        persistence._read_game(c, gs.guild_id)
+                    t3 = time.perf_counter()
+                size = os.path.getsize(path) - empty
+            results[mode] = {
+                'encode_us': codec_times[0] if mode == 'blob' else None,
+                'decode_us': codec_times[1] if mode == 'blob' else None,
+                'save_us': (t1 - t0) / n_games * 1e6,
+                'load_us': (t3 - t2) / n_games * 1e6,
+                'bytes_per_game': size / n_games,
+            }
+        results['blob']['blob_bytes'] = sum(len(b) for b in blobs) / n_games
+        results['rows']['blob_bytes'] = None
+    finally:
+        persistence.STORAGE_MODE = old_mode
+    return results
+
+
+# ---------------------------------------------------------------------------
+# match: thousands of guilds playing full games, persisted along the way
+# ---------------------------------------------------------------------------
+
+SUB_CHANCE = 0.25
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _open_lobby(gid: int) -> GameState:
+    host = gid * 100
+    gs = GameState(host, gid)
+    for uid in range(host, host + 6):
+        gs.join_player(uid, f'player{uid}')
+    return gs
+
+
+def _toss(gs: GameState, rng: random.Random):
+    gs.start_toss()
+    gs.set_toss_choice(1, 'high')
+    gs.set_toss_choice(2, 'low')
+    winner = gs.resolve_toss(rng.choice(['high', 'low']))
+    gs.set_possession(winner, 'pg')
+
+
+def _play_move(gs: GameState, rng: random.Random):
+    """One possession: score and hand the ball over, or the defence wins it at CE."""
+    team = gs.current_possession_team
+    opp = gs.opponent_team(team)
+    roll = rng.random()
+    if roll < 0.4:
+        gs.score_points(team, 3 if roll < 0.1 else 2)
+        gs.set_possession(opp, 'pg')
+    elif roll < 0.7:
+        gs.set_possession(opp, 'ce')
+    else:
+        gs.set_possession(team, 'sg')
+    gs.increment_move()
+
+
+def _substitute(gs: GameState, rng: random.Random):
+    team = rng.choice([1, 2])
+    pos = rng.choice(['pg', 'sg', 'ce'])
+    in_user = gs.host_id + 50 + gs.move_count
+    gs.make_sub_request(team, pos, in_user, f'sub{in_user}')
+    gs.complete_sub(in_user, accept=True)
+
+
+def run_match(n_guilds: int, store: Optional['persistence.StorageBackend'] = None,
+              seed: int = 1, trace_memory: bool = False) -> Dict[str, float]:
+    """Play a full game in every guild, moves interleaved across guilds.
+
+    Every state change is followed by ``store.save`` (timed); halftime and
+    final states are read back with ``store.load`` and checked.
+    """
+    rng = random.Random(seed)
+    save_times: List[float] = []
+    load_times: List[float] = []
+
+    def save(gid: int, gs: GameState):
+        if store is not None:
+            t = time.perf_counter()
+            store.save(gid, gs)
+            save_times.append(time.perf_counter() - t)
+
+    def verify_reload(gid: int, gs: GameState):
+        if store is not None:
+            t = time.perf_counter()
+            loaded = store.load(gid)
+            load_times.append(time.perf_counter() - t)
+            check(loaded.move_count == gs.move_count, f'reloaded move count of guild {gid}')
+            check([t.score for t in loaded.teams.values()] == [t.score for t in gs.teams.values()],
+                  f'reloaded scores of guild {gid}')
+
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    games: Dict[int, GameState] = {}
+    for gid in range(1, n_guilds + 1):
+        games[gid] = gs = _open_lobby(gid)
+        save(gid, gs)
+    for gid, gs in games.items():
+        gs.start_game(gs.host_id)
+        _toss(gs, rng)
+        save(gid, gs)
+    subs = 0
+    for move in range(MAX_MOVES):
+        for gid, gs in games.items():
+            if rng.random() < SUB_CHANCE / MAX_MOVES:
+                _substitute(gs, rng)
+                subs += 1
+            _play_move(gs, rng)
+            save(gid, gs)
+            if gs.move_count in (HALFTIME, MAX_MOVES):
+                verify_reload(gid, gs)
+    elapsed = time.perf_counter() - t0
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    check(all(gs.finished for gs in games.values()), 'every game finished')
+    save_times.sort()
+    load_times.sort()
+    moves = n_guilds * MAX_MOVES
+    return {
+        'guilds': n_guilds,
+        'moves': moves,
+        'subs': subs,
+        'seconds': elapsed,
+        'moves_per_sec': moves / elapsed,
+        'save_p50_ms': ms(percentile(save_times, 0.50)),
+        'save_p99_ms': ms(percentile(save_times, 0.99)),
+        'load_p50_ms': ms(percentile(load_times, 0.50)),
+        'load_p99_ms': ms(percentile(load_times, 0.99)),
+        'traced_peak_mb': traced_peak,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def bench_match(n_guilds: int = 2000, backends: List[str] = ('memory', 'sqlite'),
+                seed: int = 1, trace_memory: bool = False) -> Dict[str, Dict[str, float]]:
+    # game logic alone first, so the persistence rows can be read against it
+    results = {'core': run_match(n_guilds, None, seed, trace_memory)}
+    for name in backends:
+        with temp_db() as path:
+            store = persistence.make_backend(name, **({'db_path': path} if name == 'sqlite' else {}))
+            store.init()
+            try:
+                results[name] = run_match(n_guilds, store, seed, trace_memory)
+            finally:
+                store.close()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# memory: resident bytes per lobby held in ``games``
+# ---------------------------------------------------------------------------
+
+def _lobbies(n: int, players: int) -> Dict[int, GameState]:
+    games = {}
+    for gid in range(1, n + 1):
+        gs = GameState(gid * 100, gid)
+        for uid in range(gid * 100, gid * 100 + players):
+            gs.join_player(uid, f'player{uid}')
+        gs.clear_dirty()
+        games[gid] = gs
+    return games
+
+
+def bench_memory(n_lobbies: int = 10000) -> Dict[str, Dict[str, float]]:
+    """Traced bytes per lobby: an abandoned 1-player lobby, a full one, a started game."""
+    results = {}
+    for label, players, started in (('idle-1p', 1, False), ('full-6p', 6, False), ('started', 6, True)):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        games = _lobbies(n_lobbies, players)
+        if started:
+            for gs in games.values():
+                gs.start_game(gs.host_id)
+                gs.clear_dirty()
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results[label] = {
+            'lobbies': n_lobbies,
+            'bytes_per_lobby': size / n_lobbies,
+            'total_mb': size / (1024 * 1024),
+        }
+        del games
+    return results
+
+
+# ---------------------------------------------------------------------------
+# outcomes: the precomputed guess table vs. the string-matching rules
+# ---------------------------------------------------------------------------
+
+# inputs outside the menus, which match_guess hands to the string rules
+_FREE_FORM = (None, '', 'LAYUP', '3 pointer', '3', 'pg_3_half', 'Jump Shot', 'dribble_dunk')
+
+
+def verify_outcomes() -> int:
+    """Check that the tables still agree with the string rules; returns pairs checked.
+
+    The tables are built from the rules, so this only catches the two
+    drifting apart. test_game_core.py pins both to the original outcomes.
+    """
+    actions = list(Action) + list(_FREE_FORM)
+    guesses = list(Guess) + [g for g in _FREE_FORM if g is not None]
+    checked = 0
+    for a in actions:
+        for g in guesses:
+            got, want = game_core.match_guess(a, g), game_core.match_guess_rules(a, g)
+            if got != want:
+                raise RuntimeError(f'match_guess({a!r}, {g!r}) = {got}, rules say {want}')
+            checked += 1
+        if a and game_core.shot_points(a) != game_core.shot_points_rule(a):
+            raise RuntimeError(f'shot_points({a!r}) disagrees with the rules')
+    return checked
+
+
+def bench_outcomes(rounds: int = 2000) -> Dict[str, Dict[str, float]]:
+    checked = verify_outcomes()
+    # plain strings, as they arrive from select menus
+    pairs = [(str(a), str(g)) for a in Action for g in Guess]
+    results = {}
+    for label, fn in (('rules', game_core.match_guess_rules), ('table', game_core.match_guess)):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for a, g in pairs:
+                fn(a, g)
+        elapsed = time.perf_counter() - t0
+        results[label] = {'pairs_checked': checked, 'ns_per_call': elapsed / (rounds * len(pairs)) * 1e9}
+    return results
+
+
+# ---------------------------------------------------------------------------
+# career: aggregates kept with the move log, and leaderboard reads
+# ---------------------------------------------------------------------------
+
+def _engine_match(gs: GameState, store: 'persistence.StorageBackend', rng: random.Random) -> int:
+    """Play ``gs`` to the end through the turn engine, logging every step; returns the steps."""
+    options = {game_core.ATTACK: None, game_core.GUESS: game_core.GUESS_OPTIONS,
+               game_core.SG_CHOICE: [v for v, _ in game_core.SG_SHOTS], game_core.SAVE: game_core.SAVE_OPTIONS}
+    steps = 0
+    while gs.active:
+        prompt = gs.begin_turn()
+        while prompt is not None:
+            choices = options[prompt.stage] or [v for v, _ in game_core.ATTACK_ACTIONS[prompt.pos]]
+            event, prompt = gs.play(prompt, rng.choice(choices))
+            store.queue_move(gs.guild_id, gs, event)
+            steps += 1
+    return steps
+
+
+def bench_career(n_guilds: int = 2000, n_players: int = 5000, backend: str = 'sqlite',
+                 seed: int = 1, queries: int = 200) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    with temp_db() as path:
+        store = persistence.make_backend(backend, **({'db_path': path} if backend == 'sqlite' else {}))
+        store.init()
+        try:
+            steps = 0
+            games: Dict[int, GameState] = {}
+            t0 = time.perf_counter()
+            for gid in range(1, n_guilds + 1):
+                players = rng.sample(range(1, n_players + 1), 6)
+                games[gid] = gs = GameState(players[0], gid)
+                for uid in players:
+                    gs.join_player(uid, f'player{uid}')
+                gs.start_game(players[0])
+                _toss(gs, rng)
+                steps += _engine_match(gs, store, rng)
+            store.flush().result()
+            elapsed = time.perf_counter() - t0
+
+            # the per-guild aggregates must add up to the final scores
+            for gid, gs in games.items():
+                points = sum(store.career(s.user_id, gid)['points']
+                             for t in gs.teams.values() for s in t.slots.values())
+                check(points == sum(t.score for t in gs.teams.values()), f'career points of guild {gid}')
+            t1 = time.perf_counter()
+            for i in range(queries):
+                store.leaderboard(None, 'points', 10)
+            t2 = time.perf_counter()
+            for i in range(queries):
+                store.leaderboard(i % n_guilds + 1, 'wins', 10)
+            t3 = time.perf_counter()
+            for i in range(queries):
+                store.career(i % n_players + 1)
+            t4 = time.perf_counter()
+        finally:
+            store.close()
+    return {backend: {'guilds': n_guilds, 'players': n_players, 'steps': steps, 'steps_per_sec': steps / elapsed,
+                      'global_top_ms': (t2 - t1) / queries * 1e3, 'guild_top_ms': (t3 - t2) / queries * 1e3,
+                      'stats_ms': (t4 - t3) / queries * 1e3}}
+
+
+# ---------------------------------------------------------------------------
+# livescore: GameState.get_livescore, rebuilt vs. reused while unchanged
+# ---------------------------------------------------------------------------
+
+def bench_livescore(calls: int = 100000, change_every: int = 20) -> Dict[str, Dict[str, float]]:
+    """Spectators polling one game that changes every ``change_every`` calls."""
+    results = {}
+    for label in ('rebuild', 'cached'):
+        gs = full_lobby()
+        rebuilds = 0
+        t0 = time.perf_counter()
+        for i in range(calls):
+            if i % change_every == 0:
+                gs.score_points(1, 2)
+            if label == 'rebuild':
+                gs._livescore = None
+            before = gs._livescore
+            data = gs.get_livescore()
+            rebuilds += gs._livescore is not before
+            check(data['teams'][1]['score'] == gs.teams[1].score, 'livescore is current')
+        elapsed = time.perf_counter() - t0
+        results[label] = {'calls': calls, 'hit_rate': 1 - rebuilds / calls, 'us_per_call': elapsed / calls * 1e6}
+    return results
+
+
+# ---------------------------------------------------------------------------
+# practice: game.Game shot-by-shot vs. shoot_many, and leaderboard queries
+# ---------------------------------------------------------------------------
+
+def bench_practice(n_players: int = 10000, shots: int = 20) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for label in ('shoot', 'shoot_many'):
+        g = game.Game()
+        for uid in range(n_players):
+            g.start_player(uid)
+        t0 = time.perf_counter()
+        if label == 'shoot':
+            for uid in range(n_players):
+                for _ in range(shots):
+                    g.shoot(uid)
+        else:
+            for uid in range(n_players):
+                g.shoot_many(uid, shots)
+        elapsed = time.perf_counter() - t0
+        made = sum(p['made'] for p in g.players.values())
+        results[label] = {'players': n_players, 'shots': n_players * shots, 'seconds': elapsed,
+                          'made_rate': made / (n_players * shots), 'us_per_query': None}
+
+    # the incremental board must agree with a full sort of the same stats
+    by_sort = sorted(g.players, key=lambda u: (-g.players[u]['score'],
+                                               -g.players[u]['made'] / g.players[u]['shots'], u))
+    check([u for u, _, _ in g.top(100)] == by_sort[:100], 'leaderboard top 100')
+    check(all(g.rank(u) == i + 1 for i, u in enumerate(by_sort[:1000])), 'leaderboard ranks')
+    queries = 1000
+    t0 = time.perf_counter()
+    for uid in range(queries):
+        g.top(10)
+        g.rank(uid)
+    t1 = time.perf_counter()
+    for uid in range(queries // 10):
+        sorted(g.players, key=lambda u: (-g.players[u]['score'], u))[:10]
+    t2 = time.perf_counter()
+    for label, per_query in (('board', (t1 - t0) / queries), ('full-sort', (t2 - t1) / (queries // 10))):
+        results[label] = {'players': n_players, 'shots': None, 'seconds': None, 'made_rate': None,
+                          'us_per_query': per_query * 1e6}
+
+    with temp_db():
+        persistence.init_db()
+        g.save()
+        loaded = game.Game.load()
+        check(loaded.players == g.players and loaded.top(10) == g.top(10), 'practice reload')
+    return results
+
+
+def write_json(path: str, bench: str, args: argparse.Namespace, results: Dict[str, Dict[str, float]]):
+    """Write results with enough context to diff runs between releases."""
+    doc = {
+        'bench': bench,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'args': {k: v for k, v in vars(args).items() if k not in ('bench', 'json')},
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(doc, f, indent=2)
+
+
+def _print_table(results: Dict[str, Dict[str, float]]):
+    cols = list(next(iter(results.values())).keys())
+    print(f"{'mode':<10}" + ''.join(f'{c:>16}' for c in cols))
+    for mode, row in results.items():
+        print(f'{mode:<10}' + ''.join(f'{row[c]:>16.3f}' if row[c] is not None else f'{"-":>16}'
+                                       for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Basketball Blitz benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p = sub.add_parser('connections', help='per-call connections vs. pooled WAL connections')
+    p.add_argument('--ops', type=int, default=2000)
+    p.add_argument('--guilds', type=int, default=50)
+
+    p = sub.add_parser('writes', help='rows written per move, full vs. dirty-tracked saves')
+    p.add_argument('--moves', type=int, default=36)
+
+    p = sub.add_parser('restore', help='startup restore, load_game per guild vs. load_all_games')
+    p.add_argument('--games', type=int, default=5000)
+    p.add_argument('--backend', choices=('sqlite', 'memory'), default='sqlite')
+
+    p = sub.add_parser('codec', help='binary blob snapshots vs. multi-row layout')
+    p.add_argument('--games', type=int, default=2000)
+
+    p = sub.add_parser('match', help='full 36-move games across many guilds, with persistence')
+    p.add_argument('--guilds', type=int, default=2000)
+    p.add_argument('--backends', nargs='*', choices=('sqlite', 'memory'), default=['memory', 'sqlite'])
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--trace-memory', action='store_true',
+                   help='also report the traced Python heap peak (slows the run)')
+
+    p = sub.add_parser('memory', help='bytes per lobby held in memory')
+    p.add_argument('--lobbies', type=int, default=10000)
+
+    p = sub.add_parser('outcomes', help='verify and time the match_guess outcome table')
+    p.add_argument('--rounds', type=int, default=2000)
+
+    p = sub.add_parser('career', help='career stats kept with the move log, and leaderboard reads')
+    p.add_argument('--guilds', type=int, default=2000)
+    p.add_argument('--players', type=int, default=5000)
+    p.add_argument('--backend', choices=['sqlite', 'memory'], default='sqlite')
+
+    p = sub.add_parser('livescore', help='livescore rendering, rebuilt vs. version-cached')
+    p.add_argument('--calls', type=int, default=100000)
+    p.add_argument('--change-every', type=int, default=20)
+
+    p = sub.add_parser('practice', help='shooting practice: batched shots and the leaderboard')
+    p.add_argument('--players', type=int, default=10000)
+    p.add_argument('--shots', type=int, default=20)
+
+    for p in sub.choices.values():
+        p.add_argument('--json', metavar='PATH', help='also write the results to a JSON file')
+
+    args = parser.parse_args()
+    if args.bench == 'connections':
+        results = bench_connections(args.ops, args.guilds)
+    elif args.bench == 'writes':
+        results = bench_write_volume(args.moves)
+    elif args.bench == 'restore':
+        results = bench_restore(args.games, args.backend)
+    elif args.bench == 'codec':
+        results = bench_codec(args.games)
+    elif args.bench == 'match':
+        results = bench_match(args.guilds, args.backends, args.seed, args.trace_memory)
+    elif args.bench == 'memory':
+        results = bench_memory(args.lobbies)
+    elif args.bench == 'outcomes':
+        results = bench_outcomes(args.rounds)
+    elif args.bench == 'career':
+        results = bench_career(args.guilds, args.players, args.backend)
+    elif args.bench == 'livescore':
+        results = bench_livescore(args.calls, args.change_every)
+    elif args.bench == 'practice':
+        results = bench_practice(args.players, args.shots)
+    _print_table(results)
+    if args.json:
+        write_json(args.json, args.bench, args, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Helpers shared by the benchmarks (bench.py) and the load test (loadtest.py).
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import persistence
+
+
+@contextmanager
+def temp_db() -> Iterator[str]:
+    """Point ``persistence`` at a fresh database file for the duration of the block."""
+    old_path = persistence.DB_PATH
+    tmpdir = tempfile.mkdtemp(prefix='blitz-bench-')
+    persistence.close_pool()
+    persistence.DB_PATH = os.path.join(tmpdir, 'bench.db')
+    try:
+        yield persistence.DB_PATH
+    finally:
+        persistence.close_pool()
+        persistence.DB_PATH = old_path
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def check(ok: bool, what: str):
+    """Fail a run whose results are wrong; unlike ``assert`` this survives ``python -O``."""
+    if not ok:
+        raise RuntimeError(f'check failed: {what}')
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """The ``p`` quantile (0-1) of already sorted values; None if there are none."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else seconds * 1000
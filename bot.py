@@ -1,14 +1,26 @@
 import os
+import time
+import json
 import asyncio
+import hashlib
 import logging
+import functools
 from dotenv import load_dotenv
 import discord
 from discord import app_commands
-from discord.ext import commands
-from game_core import GameState
-from typing import Dict, Optional
+from discord.ext import commands, tasks
+from game_core import (GameState, MoveEvent, TurnPrompt, SubRequest, ATTACK, GUESS, SG_CHOICE, SAVE,
+                       ATTACK_ACTIONS, SG_SHOTS, GUESS_OPTIONS, SAVE_OPTIONS, SUB_TIMEOUT)
+from typing import Dict, Optional, Tuple
 import random
-from persistence import init_db, save_game, load_game, delete_game, list_games
+from persistence import StorageBackend, SQLiteBackend, make_backend, LEADERBOARD_ORDERS
+from cluster import shard_config
+from deadlines import DeadlineScheduler
+from actors import GuildActors, GuildBusy
+from outbox import Outboxes
+from registry import GameRegistry
+import metrics
+from metrics import timed_command
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
@@ -17,29 +29,216 @@ logging.basicConfig(level=logging.INFO)
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+# set by cluster.py when this process is one worker of a sharded deployment
+SHARD_IDS, SHARD_COUNT = shard_config()
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix='!', intents=intents,
+                                  shard_ids=SHARD_IDS, shard_count=SHARD_COUNT)
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
+
+# every change to a guild's game runs on that guild's actor, one at a time
+actors = GuildActors()
+# single game per guild (only this worker's guilds when sharded); idle and
+# finished games are saved and dropped, and loaded back on their next command
+games = GameRegistry(actors=actors)
+# every pending move and sub-request deadline in this process; views carry no timers
+deadlines = DeadlineScheduler()
+BUSY_TEXT = 'This game is busy — try again in a moment.'
+# play-by-play and prompts go out through per-channel, rate-limited queues
+outboxes = Outboxes()
+
+
+async def in_guild_order(interaction: discord.Interaction, job):
+    """Run ``job`` on the interaction's guild actor; tell the user to retry if it is backed up."""
+    try:
+        return await actors.run(interaction.guild_id or 0, job)
+    except GuildBusy:
+        await interaction.response.send_message(BUSY_TEXT, ephemeral=True)
 
-# single game per guild
-games: Dict[int, GameState] = {}
 
-def match_guess(att_choice: str, guess: str) -> bool:
-    if not att_choice:
-        return False
-    a = att_choice.lower()
-    g = guess.lower()
-    if '3' in a or 'halfcourt' in a or 'fullcourt' in a:
-        return g in ('3-pointer', '3 pointer', 'halfcourt', 'fullcourt', '3')
-    if 'dribble' in a:
-        return g in ('dribble',)
-    # suffix match: 'pg_dribble_layup' matches 'layup'
-    if a.endswith(g.replace(' ', '_')) or a == g:
-        return True
-    return False
+def serialized(func):
+    """Run a command that changes the guild's game on the guild's actor.
+
+    An evicted game is loaded back first, so the command finds it in ``games``.
+    """
+    @functools.wraps(func)
+    async def wrapper(self, interaction: discord.Interaction, *args, **kwargs):
+        async def job():
+            await games.load(interaction.guild_id or 0)
+            return await func(self, interaction, *args, **kwargs)
+        await in_guild_order(interaction, job)
+    return wrapper
+
+
+def record_move(storage: StorageBackend, gs: GameState, prompt: TurnPrompt, value: Optional[str]):
+    """Resolve ``prompt`` with ``value`` and append the step to the game's move log.
+
+    The next prompt's deadline is set from now and logged with the step.
+    Returns ``(event, next_prompt)``, or None if the prompt was already answered.
+    """
+    result = gs.play(prompt, value, now=time.time())
+    if result:
+        storage.queue_move(gs.guild_id, gs, result[0])
+    return result
+
+
+def game_channel(gs: GameState) -> Optional[discord.abc.Messageable]:
+    return bot.get_channel(gs.channel_id) if gs.channel_id else None
+
+
+def arm_turn(storage: StorageBackend, gs: GameState, view: Optional[discord.ui.View] = None):
+    """Schedule the timeout of the prompt ``gs`` is waiting on (rendered by ``view``, if any)."""
+    prompt = gs.turn
+    key = ('turn', gs.guild_id)
+    if prompt is None or prompt.deadline is None:
+        deadlines.cancel(key)
+        return
+
+    async def timed_out():
+        if view is not None:
+            view.stop()
+        result = record_move(storage, gs, prompt, None)
+        if result:
+            metrics.VIEW_TIMEOUTS.inc(_TURN_VIEWS[prompt.stage].__name__)
+            announce(storage, gs, *result)
+
+    async def expire():
+        # a timeout is never turned away, however busy the guild is
+        await actors.run(gs.guild_id, timed_out, force=True)
+
+    deadlines.arm(key, prompt.deadline, expire)
+
+
+def arm_sub(storage: StorageBackend, gs: GameState, req: SubRequest, view: Optional[discord.ui.View] = None):
+    """Schedule the lapse of sub request ``req``."""
+    if req.deadline is None:
+        return
+
+    async def lapsed():
+        if view is not None:
+            view.stop()
+        if gs.sub_requests.get(req.in_user_id) is not req:
+            return
+        gs.complete_sub(req.in_user_id, False)
+        storage.queue_save(gs.guild_id, gs)
+        metrics.VIEW_TIMEOUTS.inc(SubAcceptView.__name__)
+        channel = game_channel(gs)
+        if channel:
+            outboxes.for_channel(channel).line(f'Sub request for <@{req.in_user_id}> timed out and was cancelled.')
+
+    async def expire():
+        await actors.run(gs.guild_id, lapsed, force=True)
+
+    deadlines.arm(('sub', gs.guild_id, req.in_user_id), req.deadline, expire)
+
+
+def arm_deadlines(storage: StorageBackend, gs: GameState):
+    """Re-arm the stored deadlines of a game loaded from storage."""
+    arm_turn(storage, gs)
+    for req in gs.sub_requests.values():
+        arm_sub(storage, gs, req)
+
+
+def disarm_deadlines(gs: GameState):
+    deadlines.cancel(('turn', gs.guild_id))
+    for in_user_id in gs.sub_requests:
+        deadlines.cancel(('sub', gs.guild_id, in_user_id))
+
+
+def announce(storage: StorageBackend, gs: GameState, event: MoveEvent, nxt: Optional[TurnPrompt],
+             channel: Optional[discord.abc.Messageable] = None):
+    """Arm the deadline of the prompt that follows ``event`` and queue it (or the outcome) for posting.
+
+    Prompts go out as messages of their own, ahead of anything else queued
+    for the channel; an outcome becomes a line on the channel's rolling
+    scoreboard. ``channel`` defaults to the game's channel.
+    """
+    view = TurnView.create_for(storage, gs, nxt) if nxt else None
+    arm_turn(storage, gs, view)
+    channel = channel or game_channel(gs)
+    if channel is None:
+        # nowhere to post: the deadline still moves the game on
+        return
+    box = outboxes.for_channel(channel)
+    if nxt is None:
+        box.line(outcome_text(event), header=livescores.get(gs)[0])
+    elif nxt.stage == GUESS:
+        box.prompt(f'<@{nxt.actor_id}>, attacker chose an action — make your guess.', view)
+    elif nxt.stage == SG_CHOICE:
+        box.prompt(f'<@{nxt.actor_id}>, you received a sidepass — choose your shot.', view)
+    else:
+        text = ('Centre, attempt a save on the SG shot.' if event.kind == 'sg_choice'
+                else 'Incorrect guess — centre attempt a save.')
+        box.prompt(text, view)
+
+
+def render_livescore(gs: GameState) -> Tuple[str, discord.Embed]:
+    """The /livescore message for ``gs``: plain text (for places embeds don't fit) and an embed."""
+    data = gs.get_livescore()
+    text = f"Move: {data['move']}\n"
+    embed = discord.Embed(title=f"Livescore — move {data['move']}")
+    for tid, t in data['teams'].items():
+        cap = t.get('captain_name') or 'None'
+        slots = t['slots']
+        text += (f"Team {tid} ({t['name']}) — Captain: {cap} — Score: {t['score']} — "
+                 f"PG: {slots['pg']}, SG: {slots['sg']}, CE: {slots['ce']}\n")
+        embed.add_field(name=f"Team {tid} ({t['name']}) — {t['score']}",
+                        value=f"Captain: {cap}\nPG: {slots['pg']}\nSG: {slots['sg']}\nCE: {slots['ce']}")
+    return text, embed
+
+
+class LivescoreCache:
+    """Rendered /livescore payloads per guild, reused until the game's ``version`` changes."""
+
+    def __init__(self):
+        # guild_id -> (game, version, (text, embed))
+        self._entries: Dict[int, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, gs: GameState) -> Tuple[str, discord.Embed]:
+        entry = self._entries.get(gs.guild_id)
+        if entry is not None and entry[0] is gs and entry[1] == gs.version:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        payload = render_livescore(gs)
+        self._entries[gs.guild_id] = (gs, gs.version, payload)
+        return payload
+
+    def discard(self, guild_id: int):
+        self._entries.pop(guild_id, None)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+livescores = LivescoreCache()
+
+
+def outcome_text(event: MoveEvent) -> str:
+    """What to tell the channel when a possession ends with ``event``."""
+    if event.afk_user_id is not None:
+        return f'<@{event.afk_user_id}> did not act in time and is marked AFK — possession to opposing PG.'
+    if event.kind in ('attack', 'sg_choice'):
+        return f'No defender present — scored {event.points} points.'
+    if event.possession is None:
+        return 'SG not present; automatic score for attacker.'
+    if event.possession[1] == 'ce':
+        if event.kind == 'save':
+            return 'Save successful — CE gains possession.'
+        return 'Defence guessed correctly — possession to defence (CE).'
+    return f'Shot scored for {event.points} points. Possession to opposing PG.'
 
 
 class SubAcceptView(discord.ui.View):
-    def __init__(self, gs: GameState, target_user_id: int):
-        super().__init__(timeout=15)
+    def __init__(self, storage: StorageBackend, gs: GameState, target_user_id: int):
+        # the request's deadline is owned by the scheduler, see arm_sub
+        super().__init__(timeout=None)
+        self.storage = storage
         self.gs = gs
         self.target_user_id = target_user_id
 
@@ -48,72 +247,68 @@ class SubAcceptView(discord.ui.View):
         discord.SelectOption(label='Decline', value='decline')
     ])
     async def select_callback(self, select: discord.ui.Select, interaction: discord.Interaction):
+        await in_guild_order(interaction, lambda: self.answer(interaction, select.values[0]))
+
+    async def answer(self, interaction: discord.Interaction, choice: str):
         if interaction.user.id != self.target_user_id:
             await interaction.response.send_message('This prompt is not for you.', ephemeral=True)
             return
-        choice = select.values[0]
         accepted = choice == 'accept'
+        self.stop()
+        deadlines.cancel(('sub', self.gs.guild_id, self.target_user_id))
         result = self.gs.complete_sub(interaction.user.id, accepted)
+        self.storage.queue_save(self.gs.guild_id, self.gs)
         if accepted and result:
             await interaction.response.edit_message(content='Sub accepted and completed.', view=None)
         else:
             await interaction.response.edit_message(content='Sub declined or failed.', view=None)
 
 
-class AttackerChoiceView(discord.ui.View):
-    def __init__(self, gs: GameState, attacker_id: int, team: int, pos: str):
-        super().__init__(timeout=30)
+class TurnView(discord.ui.View):
+    """Select prompt for one stage of a possession; the rules are in game_core.resolve."""
+    echo = 'You chose: {}'
+    not_yours = 'This prompt is not for you.'
+
+    def __init__(self, storage: StorageBackend, gs: GameState, prompt: TurnPrompt):
+        # the prompt's deadline is owned by the scheduler, see arm_turn
+        super().__init__(timeout=None)
+        self.storage = storage
         self.gs = gs
-        self.attacker_id = attacker_id
-        self.team = team
-        self.pos = pos
+        self.prompt = prompt
 
-    @discord.ui.select(placeholder='Choose action', min_values=1, max_values=1, options=[])
-    async def select_callback(self, select: discord.ui.Select, interaction: discord.Interaction):
-        if interaction.user.id != self.attacker_id:
-            await interaction.response.send_message('Not your action to take.', ephemeral=True)
+    @classmethod
+    def create_for(cls, storage: StorageBackend, gs: GameState, prompt: TurnPrompt):
+        return _TURN_VIEWS[prompt.stage].create_for(storage, gs, prompt)
+
+    async def resolve(self, interaction: discord.Interaction, value: str):
+        await in_guild_order(interaction, lambda: self.answer(interaction, value))
+
+    async def answer(self, interaction: discord.Interaction, value: str):
+        if interaction.user.id != self.prompt.actor_id:
+            await interaction.response.send_message(self.not_yours, ephemeral=True)
             return
-        choice = select.values[0]
-        await interaction.response.edit_message(content=f'You chose: {choice}', view=None)
-        opp = self.gs.opponent_team(self.team)
-        ce = self.gs.get_slot(opp, 'ce')
-        if not ce:
-            pts = 3 if '3' in choice else 2
-            self.gs.score_points(self.team, pts)
-            self.gs.increment_move()
-            await interaction.followup.send(f'No defender present — scored {pts} points.')
+        self.stop()
+        if self.prompt is not self.gs.turn:
+            await interaction.response.edit_message(content='This prompt has expired.', view=None)
             return
-        self.gs._last_att_choice = choice
-        view = DefenderGuessView(self.gs, ce.user_id, self.team, choice)
-        await interaction.followup.send(f'<@{ce.user_id}>, attacker chose an action — make your guess.', view=view)
+        await interaction.response.edit_message(content=self.echo.format(value), view=None)
+        result = record_move(self.storage, self.gs, self.prompt, value)
+        if result:
+            announce(self.storage, self.gs, *result, channel=interaction.channel)
 
-    async def on_timeout(self):
-        self.gs.mark_afk(self.attacker_id)
-        self.gs.set_possession(self.gs.opponent_team(self.team))
+
+class AttackerChoiceView(TurnView):
+    not_yours = 'Not your action to take.'
+
+    @discord.ui.select(placeholder='Choose action', min_values=1, max_values=1, options=[])
+    async def select_callback(self, select: discord.ui.Select, interaction: discord.Interaction):
+        await self.resolve(interaction, select.values[0])
 
     @classmethod
-    def create_for(cls, gs: GameState, attacker_id: int, team: int, pos: str):
-        view = cls(gs, attacker_id, team, pos)
-        options = []
-        if pos == 'pg':
-            options = [
-                discord.SelectOption(label='Side-pass to SG', value='sidepass'),
-                discord.SelectOption(label='Dribble → Layup', value='pg_dribble_layup'),
-                discord.SelectOption(label='Dribble → Jump shot', value='pg_dribble_jump'),
-                discord.SelectOption(label='Halfcourt shot (PG)', value='pg_half'),
-                discord.SelectOption(label='Fullcourt shot (PG)', value='pg_full'),
-                discord.SelectOption(label='Hold (bounce pass)', value='hold'),
-                discord.SelectOption(label='Play back', value='play_back')
-            ]
-        elif pos == 'sg':
-            options = [
-                discord.SelectOption(label='Dribble → Layup', value='sg_dribble_layup'),
-                discord.SelectOption(label='Dribble → Dunk', value='sg_dribble_dunk'),
-                discord.SelectOption(label='3-pointer Halfcourt', value='sg_3_half'),
-                discord.SelectOption(label='3-pointer Fullcourt', value='sg_3_full')
-            ]
-        else:
-            options = [discord.SelectOption(label='Action', value='action')]
+    def create_for(cls, storage: StorageBackend, gs: GameState, prompt: TurnPrompt):
+        view = cls(storage, gs, prompt)
+        actions = ATTACK_ACTIONS.get(prompt.pos, ATTACK_ACTIONS['ce'])
+        options = [discord.SelectOption(label=label, value=value) for value, label in actions]
         sel = None
         for child in view.children:
             if isinstance(child, discord.ui.Select):
@@ -124,98 +319,31 @@ class AttackerChoiceView(discord.ui.View):
         return view
 
 
-class DefenderGuessView(discord.ui.View):
-    def __init__(self, gs: GameState, defender_id: int, attacking_team: int, att_choice: str):
-        super().__init__(timeout=30)
-        self.gs = gs
-        self.defender_id = defender_id
-        self.attacking_team = attacking_team
-        self.att_choice = att_choice
+class DefenderGuessView(TurnView):
+    echo = 'You guessed: {}'
 
     @discord.ui.select(placeholder='Make your guess', min_values=1, max_values=1, options=[
-        discord.SelectOption(label='3-pointer', value='3-pointer'),
-        discord.SelectOption(label='dribble', value='dribble'),
-        discord.SelectOption(label='sidepass', value='sidepass'),
-        discord.SelectOption(label='layup', value='layup'),
-        discord.SelectOption(label='dunk', value='dunk'),
-        discord.SelectOption(label='halfcourt', value='halfcourt'),
-        discord.SelectOption(label='fullcourt', value='fullcourt'),
-        discord.SelectOption(label='jump shot', value='jump shot'),
+        discord.SelectOption(label=g, value=g) for g in GUESS_OPTIONS
     ])
     async def select_callback(self, select: discord.ui.Select, interaction: discord.Interaction):
-        if interaction.user.id != self.defender_id:
-            await interaction.response.send_message('This prompt is not for you.', ephemeral=True)
-            return
-        guess = select.values[0]
-        await interaction.response.edit_message(content=f'You guessed: {guess}', view=None)
-        if match_guess(self.att_choice, guess):
-            self.gs.set_possession(self.gs.opponent_team(self.attacking_team), 'ce')
-            self.gs.increment_move()
-            await interaction.followup.send('Defence guessed correctly — possession to defence (CE).')
-            return
-        # incorrect
-        if self.att_choice == 'sidepass':
-            sg = self.gs.get_slot(self.attacking_team, 'sg')
-            if not sg:
-                pts = 2
-                self.gs.score_points(self.attacking_team, pts)
-                self.gs.increment_move()
-                await interaction.followup.send('SG not present; automatic score for attacker.')
-                return
-            sg_view = SGChoiceView.create_for(self.gs, sg.user_id, self.attacking_team)
-            await interaction.followup.send(f'<@{sg.user_id}>, you received a sidepass — choose your shot.', view=sg_view)
-            return
-        save_view = SaveAttemptView(self.gs, self.gs.opponent_team(self.attacking_team), self.attacking_team, self.att_choice)
-        await interaction.followup.send('Incorrect guess — centre attempt a save.', view=save_view)
-
-    async def on_timeout(self):
-        # treat as incorrect guess
-        if self.att_choice == 'sidepass':
-            sg = self.gs.get_slot(self.attacking_team, 'sg')
-            if sg:
-                sg_view = SGChoiceView.create_for(self.gs, sg.user_id, self.attacking_team)
-                # best-effort channel send
-                return
-            else:
-                pts = 2
-                self.gs.score_points(self.attacking_team, pts)
-                self.gs.increment_move()
-                return
-        save_view = SaveAttemptView(self.gs, self.gs.opponent_team(self.attacking_team), self.attacking_team, self.att_choice)
+        await self.resolve(interaction, select.values[0])
 
+    @classmethod
+    def create_for(cls, storage: StorageBackend, gs: GameState, prompt: TurnPrompt):
+        return cls(storage, gs, prompt)
 
-class SGChoiceView(discord.ui.View):
-    def __init__(self, gs: GameState, sg_id: int, team: int):
-        super().__init__(timeout=30)
-        self.gs = gs
-        self.sg_id = sg_id
-        self.team = team
+
+class SGChoiceView(TurnView):
+    echo = 'SG chose: {}'
 
     @discord.ui.select(placeholder='Choose SG shot', min_values=1, max_values=1, options=[])
     async def select_callback(self, select: discord.ui.Select, interaction: discord.Interaction):
-        if interaction.user.id != self.sg_id:
-            await interaction.response.send_message('This prompt is not for you.', ephemeral=True)
-            return
-        choice = select.values[0]
-        await interaction.response.edit_message(content=f'SG chose: {choice}', view=None)
-        ce = self.gs.get_slot(self.gs.opponent_team(self.team), 'ce')
-        if not ce:
-            pts = 3 if '3' in choice else 2
-            self.gs.score_points(self.team, pts)
-            self.gs.increment_move()
-            return
-        save_view = SaveAttemptView(self.gs, ce.user_id, self.team, choice)
-        await interaction.followup.send('Centre, attempt a save on the SG shot.', view=save_view)
+        await self.resolve(interaction, select.values[0])
 
     @classmethod
-    def create_for(cls, gs: GameState, sg_id: int, team: int):
-        view = cls(gs, sg_id, team)
-        options = [
-            discord.SelectOption(label='Dribble → Layup', value='sg_dribble_layup'),
-            discord.SelectOption(label='Dribble → Dunk', value='sg_dribble_dunk'),
-            discord.SelectOption(label='3-pointer Halfcourt', value='sg_3_half'),
-            discord.SelectOption(label='3-pointer Fullcourt', value='sg_3_full')
-        ]
+    def create_for(cls, storage: StorageBackend, gs: GameState, prompt: TurnPrompt):
+        view = cls(storage, gs, prompt)
+        options = [discord.SelectOption(label=label, value=value) for value, label in SG_SHOTS]
         sel = None
         for child in view.children:
             if isinstance(child, discord.ui.Select):
@@ -226,66 +354,150 @@ class SGChoiceView(discord.ui.View):
         return view
 
 
-class SaveAttemptView(discord.ui.View):
-    def __init__(self, gs: GameState, ce_id: int, attacking_team: int, att_choice: str):
-        super().__init__(timeout=30)
-        self.gs = gs
-        self.ce_id = ce_id
-        self.attacking_team = attacking_team
-        self.att_choice = att_choice
+class SaveAttemptView(TurnView):
+    echo = 'You attempted save: {}'
 
     @discord.ui.select(placeholder='Attempt save (guess shot type)', min_values=1, max_values=1, options=[
-        discord.SelectOption(label='3-pointer', value='3-pointer'),
-        discord.SelectOption(label='layup', value='layup'),
-        discord.SelectOption(label='dunk', value='dunk'),
-        discord.SelectOption(label='dribble', value='dribble')
+        discord.SelectOption(label=g, value=g) for g in SAVE_OPTIONS
     ])
     async def select_callback(self, select: discord.ui.Select, interaction: discord.Interaction):
-        if interaction.user.id != self.ce_id:
-            await interaction.response.send_message('This prompt is not for you.', ephemeral=True)
-            return
-        guess = select.values[0]
-        await interaction.response.edit_message(content=f'You attempted save: {guess}', view=None)
-        if match_guess(self.att_choice, guess):
-            self.gs.set_possession(self.gs.opponent_team(self.attacking_team), 'ce')
-            self.gs.increment_move()
-            await interaction.followup.send('Save successful — CE gains possession.')
-            return
-        pts = 3 if '3' in self.att_choice else 2
-        self.gs.score_points(self.attacking_team, pts)
-        self.gs.increment_move()
-        self.gs.set_possession(self.gs.opponent_team(self.attacking_team), 'pg')
-        await interaction.followup.send(f'Shot scored for {pts} points. Possession to opposing PG.')
+        await self.resolve(interaction, select.values[0])
 
-    async def on_timeout(self):
-        pts = 3 if '3' in self.att_choice else 2
-        self.gs.score_points(self.attacking_team, pts)
-        self.gs.increment_move()
-        self.gs.set_possession(self.gs.opponent_team(self.attacking_team), 'pg')
+    @classmethod
+    def create_for(cls, storage: StorageBackend, gs: GameState, prompt: TurnPrompt):
+        return cls(storage, gs, prompt)
+
+
+_TURN_VIEWS = {
+    ATTACK: AttackerChoiceView,
+    GUESS: DefenderGuessView,
+    SG_CHOICE: SGChoiceView,
+    SAVE: SaveAttemptView,
+}
+
+
+def forget_game(gs: GameState):
+    """Drop what the process holds for a game leaving memory besides the game itself."""
+    disarm_deadlines(gs)
+    livescores.discard(gs.guild_id)
+    outboxes.discard(gs.channel_id)
+
+
+games.on_evict = forget_game
+
+
+def game_counts() -> Dict[Tuple[str], int]:
+    counts = {('active',): 0, ('lobby',): 0, ('finished',): 0}
+    for gs in games.values():
+        state = 'finished' if gs.finished else 'active' if gs.active else 'lobby'
+        counts[(state,)] += 1
+    return counts
+
+
+def register_metrics(storage: StorageBackend):
+    """Scrape-time gauges and counters over this process's games, queues and database."""
+    reg = metrics.registry
+    reg.gauge('bb_games_loaded', 'Games held in memory.', lambda: len(games))
+    reg.gauge('bb_games', 'Games in memory by state.', game_counts, ['state'])
+    reg.counter_callback('bb_games_evicted_total', 'Games saved and dropped from memory.', lambda: games.evictions)
+    reg.counter_callback('bb_games_reloaded_total', 'Evicted games loaded back from storage.', lambda: games.reloads)
+    # memory and remote backends have no database file of their own
+    if isinstance(storage, SQLiteBackend):
+        db_path = storage.pool().db_path
+        reg.gauge('bb_db_size_bytes', 'Database file size, WAL included.',
+                  lambda: metrics.file_size(db_path, db_path + '-wal'))
+    reg.gauge('bb_deadlines_pending', 'Armed move and sub deadlines.', lambda: len(deadlines))
+    reg.gauge('bb_guild_queues_busy', 'Guilds with commands queued or running.', lambda: len(actors))
+    reg.counter_callback('bb_guild_queue_rejected_total', 'Commands turned away by a full guild queue.',
+                         lambda: actors.rejected)
+    reg.counter_callback('bb_livescore_cache_total', 'Livescore render cache lookups.',
+                         lambda: {('hit',): livescores.hits, ('miss',): livescores.misses}, ['result'])
+    out = outboxes.stats
+    reg.counter_callback('bb_outbox_posts_total', 'Lines and prompts queued for posting.',
+                         lambda: {('line',): out.lines, ('prompt',): out.prompts}, ['kind'])
+    reg.counter_callback('bb_outbox_calls_total', 'Discord sends and edits made by the outbox.',
+                         lambda: {('send',): out.sends, ('edit',): out.edits}, ['call'])
+    reg.gauge('bb_outbox_messages_saved', 'Posts that did not need a message of their own.',
+              lambda: out.messages_saved)
 
 
 class MyBot(commands.Cog):
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, storage: StorageBackend):
         self.bot = bot
+        self.storage = storage
+        self.metrics_server = None
+        games.attach(storage)
+
+    async def cog_load(self):
+        self.archive_task.start()
+        self.evict_task.start()
+        deadlines.start()
+        register_metrics(self.storage)
+        try:
+            self.metrics_server = await metrics.serve()
+        except OSError:
+            logging.exception('Could not start the metrics endpoint')
+
+    async def cog_unload(self):
+        self.archive_task.cancel()
+        self.evict_task.cancel()
+        await deadlines.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+
+    @tasks.loop(hours=1)
+    async def archive_task(self):
+        """Move finished games out of the live store, off the event loop."""
+        try:
+            await asyncio.to_thread(self.storage.archive_finished)
+        except Exception:
+            logging.exception('Archival sweep failed')
+        logging.info('livescore cache: %d hits, %d misses (hit rate %.2f)',
+                     livescores.hits, livescores.misses, livescores.hit_rate)
+        out = outboxes.stats
+        logging.info('outbox: %d lines, %d prompts, %d sends, %d edits, %d messages saved, %.1fs throttled',
+                     out.lines, out.prompts, out.sends, out.edits, out.messages_saved, out.throttled_seconds)
+
+    @tasks.loop(minutes=5)
+    async def evict_task(self):
+        """Save and drop finished and idle games so memory stays flat."""
+        evicted = await games.sweep()
+        if evicted:
+            logging.info('Evicted %d games; %d in memory', evicted, len(games))
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        await games.evict_queued(guild.id)
 
     @app_commands.command(name='newgame')
+    @timed_command
+    @serialized
     async def newgame(self, interaction: discord.Interaction):
         """Create a new game"""
         gid = interaction.guild_id or 0
         if gid in games and games[gid].active:
             await interaction.response.send_message('A game is already active in this server.', ephemeral=True)
             return
-        gs = GameState(interaction.user.id)
+        if gid in games:
+            disarm_deadlines(games[gid])
+            livescores.discard(gid)
+            outboxes.discard(games[gid].channel_id)
+        gs = GameState(interaction.user.id, gid)
+        gs.channel_id = interaction.channel_id
         games[gid] = gs
         # auto-join the host as first player
         res = gs.join_player(interaction.user.id, interaction.user.display_name)
-        save_game(gid, gs)
+        # a new lobby replaces whatever an earlier game left behind, move log included
+        self.storage.queue_delete(gid)
+        self.storage.queue_save(gid, gs)
         if res:
             await interaction.response.send_message(f'Lobby created. Host joined as {res}. Players may now `/join`.')
         else:
             await interaction.response.send_message('Lobby created. (Host could not auto-join.) Players may now `/join`.')
 
     @app_commands.command(name='join')
+    @timed_command
+    @serialized
     async def join(self, interaction: discord.Interaction):
         """Join the lobby"""
         gid = interaction.guild_id or 0
@@ -297,10 +509,12 @@ class MyBot(commands.Cog):
         if not res:
             await interaction.response.send_message('Could not join — maybe already joined, or lobby full/locked.', ephemeral=True)
             return
-        save_game(gid, gs)
+        self.storage.queue_save(gid, gs)
         await interaction.response.send_message(f'Joined as {res}.')
 
     @app_commands.command(name='leave')
+    @timed_command
+    @serialized
     async def leave(self, interaction: discord.Interaction):
         """Leave the lobby"""
         gid = interaction.guild_id or 0
@@ -310,28 +524,65 @@ class MyBot(commands.Cog):
         gs = games[gid]
         ok = gs.leave_player(interaction.user.id)
         if ok:
-            save_game(gid, gs)
+            self.storage.queue_save(gid, gs)
             await interaction.response.send_message('You left the lobby.')
         else:
             await interaction.response.send_message('Could not leave (game active or not in lobby).', ephemeral=True)
 
     @app_commands.command(name='livescore')
+    @timed_command
     async def livescore(self, interaction: discord.Interaction):
         """Check the current game status"""
         gid = interaction.guild_id or 0
-        if gid not in games:
+        if await games.load(gid) is None:
             await interaction.response.send_message('No game/lobby.', ephemeral=True)
             return
-        gs = games[gid]
-        data = gs.get_livescore()
-        msg = f"Move: {data['move']}\n"
-        for tid, t in data['teams'].items():
-            cap = t.get('captain_name') or 'None'
-            msg += f"Team {tid} ({t['name']}) — Captain: {cap} — Score: {t['score']} — PG: {t['slots']['pg']}, SG: {t['slots']['sg']}, CE: {t['slots']['ce']}\n"
+        _, embed = livescores.get(games[gid])
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(name='leaderboard')
+    @app_commands.describe(scope='server (default) or global', by='points (default) or wins')
+    @timed_command
+    async def leaderboard(self, interaction: discord.Interaction, scope: str = 'server', by: str = 'points'):
+        """Top players by career points or wins"""
+        by = by.lower()
+        if by not in LEADERBOARD_ORDERS:
+            await interaction.response.send_message('Rank by `points` or `wins`.', ephemeral=True)
+            return
+        guild_id = None if scope.lower() == 'global' else interaction.guild_id or 0
+        # career reads go to the database; keep them off the event loop
+        rows = await asyncio.to_thread(self.storage.leaderboard, guild_id, by, 10)
+        if not rows:
+            await interaction.response.send_message('No career stats recorded yet.', ephemeral=True)
+            return
+        title = 'Global' if guild_id is None else 'Server'
+        lines = [f'**{title} leaderboard — {by}**']
+        lines += [f'{i}. <@{user_id}> — {value}' for i, (user_id, value) in enumerate(rows, 1)]
+        await interaction.response.send_message('\n'.join(lines), allowed_mentions=discord.AllowedMentions.none())
+
+    @app_commands.command(name='stats')
+    @app_commands.describe(user='Player to look up (default: you)')
+    @timed_command
+    async def stats(self, interaction: discord.Interaction, user: Optional[discord.Member] = None):
+        """Career stats for a player"""
+        user = user or interaction.user
+        here, overall = await asyncio.to_thread(
+            lambda: (self.storage.career(user.id, interaction.guild_id or 0), self.storage.career(user.id)))
+        if not overall:
+            await interaction.response.send_message(f'No games recorded for {user.display_name}.', ephemeral=True)
+            return
+        msg = f'**{user.display_name}** — career\n'
+        for label, s in (('All servers', overall), ('This server', here)):
+            if s:
+                msg += (f"{label}: {s['games']} games, {s['wins']} wins, {s['points']} points, "
+                        f"{s['steals']} steals, {s['saves']} saves — moves PG/SG/CE "
+                        f"{s['pg_moves']}/{s['sg_moves']}/{s['ce_moves']}\n")
         await interaction.response.send_message(msg)
 
     @app_commands.command(name='cc')
     @app_commands.describe(new_captain='Member to transfer captaincy to')
+    @timed_command
+    @serialized
     async def cc(self, interaction: discord.Interaction, new_captain: discord.Member):
         """Transfer your team captaincy to a player."""
         gid = interaction.guild_id or 0
@@ -339,11 +590,7 @@ class MyBot(commands.Cog):
             await interaction.response.send_message('No lobby/game.', ephemeral=True)
             return
         gs = games[gid]
-        caller_team = None
-        for tid, team in gs.teams.items():
-            if team.captain_id == interaction.user.id:
-                caller_team = tid
-                break
+        caller_team = gs.team_captained_by(interaction.user.id)
         if caller_team is None:
             await interaction.response.send_message('You are not a captain on any team.', ephemeral=True)
             return
@@ -351,11 +598,13 @@ class MyBot(commands.Cog):
         if gs.find_team_of_user(new_captain.id) != caller_team:
             await interaction.response.send_message('Target user is not on your team.', ephemeral=True)
             return
-        gs.teams[caller_team].captain_id = new_captain.id
-        save_game(gid, gs)
+        gs.set_captain(caller_team, new_captain.id)
+        self.storage.queue_save(gid, gs)
         await interaction.response.send_message(f'{new_captain.display_name} is now captain of Team {caller_team}.')
 
     @app_commands.command(name='start')
+    @timed_command
+    @serialized
     async def start(self, interaction: discord.Interaction):
         """Start the game (host only). Teams must be full."""
         gid = interaction.guild_id or 0
@@ -367,10 +616,12 @@ class MyBot(commands.Cog):
         if not ok:
             await interaction.response.send_message('Only host can start or teams not filled.', ephemeral=True)
             return
-        save_game(gid, gs)
+        self.storage.queue_save(gid, gs)
         await interaction.response.send_message('Game started! Use `/toss` to begin coin toss.')
 
     @app_commands.command(name='toss')
+    @timed_command
+    @serialized
     async def toss(self, interaction: discord.Interaction):
         """Start the coin toss for possession."""
         gid = interaction.guild_id or 0
@@ -379,11 +630,13 @@ class MyBot(commands.Cog):
             return
         gs = games[gid]
         gs.start_toss()
-        save_game(gid, gs)
+        self.storage.queue_save(gid, gs)
         await interaction.response.send_message('**Coin Toss Started:** Both teams, choose HIGH or LOW. Use `/tosschoose`.')
 
     @app_commands.command(name='tosschoose')
     @app_commands.describe(team='Your team number (1 or 2)', choice='HIGH or LOW')
+    @timed_command
+    @serialized
     async def tosschoose(self, interaction: discord.Interaction, team: int, choice: str):
         """Team captains choose high or low for toss."""
         gid = interaction.guild_id or 0
@@ -413,12 +666,14 @@ class MyBot(commands.Cog):
             else:
                 winner = random.choice([1, 2])
                 gs.set_possession(winner, 'pg')
-            save_game(gid, gs)
+            self.storage.queue_save(gid, gs)
             await interaction.channel.send(f'**Toss Result: {pick.upper()}** → Team {winner} gets possession at PG. Use `/ctn` to start play.')
 
 
     @app_commands.command(name='sub')
     @app_commands.describe(team='Team number (1 or 2)', position='Position to replace: pg/sg/ce', player='User to sub in')
+    @timed_command
+    @serialized
     async def sub(self, interaction: discord.Interaction, team: int, position: str, player: discord.Member):
         """Substitute a player in"""
         gid = interaction.guild_id or 0
@@ -430,73 +685,177 @@ class MyBot(commands.Cog):
         if not team_obj or team_obj.captain_id != interaction.user.id:
             await interaction.response.send_message('Only the team captain can initiate subs.', ephemeral=True)
             return
-        gs.make_sub_request(team, position, player.id, player.display_name)
-        save_game(gid, gs)
-        view = SubAcceptView(gs, player.id)
+        req = gs.make_sub_request(team, position, player.id, player.display_name,
+                                  deadline=time.time() + SUB_TIMEOUT)
+        self.storage.queue_save(gid, gs)
+        view = SubAcceptView(self.storage, gs, player.id)
+        arm_sub(self.storage, gs, req, view)
         await interaction.response.send_message(f'{player.mention}, you have a sub request to join {team} as {position}. Accept?', view=view)
 
     @app_commands.command(name='yeet')
+    @timed_command
+    @serialized
     async def yeet(self, interaction: discord.Interaction):
         """Deletes the current game"""
         gid = interaction.guild_id or 0
         if gid not in games:
             await interaction.response.send_message('No game.', ephemeral=True)
             return
-        gs = games.pop(gid)
-        gs.end_game()
+        gs = games.drop(gid)
+        if gs.active or gs.finished:
+            gs.end_game()
+            # persist the ended state so it is not restored and gets archived
+            self.storage.queue_save(gid, gs)
+        else:
+            # a lobby that never started has no result worth archiving
+            self.storage.queue_delete(gid)
         await interaction.response.send_message('Game ended.')
 
+    @app_commands.command(name='kick')
+    @app_commands.describe(user='User to kick from the game')
+    @timed_command
+    @serialized
+    async def kick(self, interaction: discord.Interaction, user: discord.Member):
+        """Kick a player from the lobby"""
+        gid = interaction.guild_id or 0
+        if gid not in games:
+            await interaction.response.send_message('No game in progress.', ephemeral=True)
+            return
+        gs = games[gid]
+        # Check if the interaction user is the host (creator)
+        host_id = getattr(gs, 'host_id', None)
+        if host_id != interaction.user.id:
+            await interaction.response.send_message('Only the host can kick players.', ephemeral=True)
+            return
+        # Remove the user from game
+        result = gs.leave_player(user.id)
+        if result:
+            self.storage.queue_save(gid, gs)
+            await interaction.response.send_message(f'{user.display_name} has been kicked from the game.')
+        else:
+            await interaction.response.send_message('User not in game or cannot be kicked.', ephemeral=True)
+
 
-@bot.event
-async def on_ready():
-    print('Bot ready')
+# where the fingerprint of the last synced command tree is kept
+COMMAND_SYNC_FILE = os.getenv('COMMAND_SYNC_FILE', '.command_sync')
+# set to 1 to sync the command tree on the next start even if it looks unchanged
+FORCE_COMMAND_SYNC = os.getenv('FORCE_COMMAND_SYNC', '0') == '1'
+
+# seconds spent in each startup phase, logged once the bot is ready
+startup_timings: Dict[str, float] = {}
+_started_at = time.perf_counter()
+_sync_checked = False
+
+
+def command_fingerprint(tree: app_commands.CommandTree) -> str:
+    """A stable hash of the command tree: names, descriptions and parameters.
+
+    Commands are sorted by name, so the order they are registered in does not
+    change the hash.
+    """
+    spec = []
+    for cmd in sorted(tree.get_commands(), key=lambda c: c.name):
+        params = [[p.name, p.description, p.type.value, p.required,
+                   [[c.name, c.value] for c in p.choices]]
+                  for p in getattr(cmd, 'parameters', [])]
+        spec.append([type(cmd).__name__, cmd.name, getattr(cmd, 'description', ''), params])
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def last_synced_fingerprint(application_id: Optional[int]) -> Optional[str]:
+    try:
+        with open(COMMAND_SYNC_FILE, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # a different application (another token) has never seen our commands
+    if data.get('application_id') != application_id:
+        return None
+    return data.get('fingerprint')
+
+
+def store_synced_fingerprint(application_id: Optional[int], fingerprint: str):
+    tmp = COMMAND_SYNC_FILE + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'application_id': application_id, 'fingerprint': fingerprint}, f)
+    os.replace(tmp, COMMAND_SYNC_FILE)
+
+
+async def sync_commands_if_changed() -> bool:
+    """Sync the global command tree only if it changed since the last sync; returns whether it synced."""
+    fingerprint = command_fingerprint(bot.tree)
+    if not FORCE_COMMAND_SYNC and last_synced_fingerprint(bot.application_id) == fingerprint:
+        logging.info('Command tree unchanged; skipping sync')
+        return False
+    synced = await bot.tree.sync()
+    logging.info('Synced %d commands', len(synced))
     try:
-        synced = await bot.tree.sync()
-        print(f'Synced {len(synced)} commands')
-    except Exception as e:
-        print('Sync failed', e)
+        store_synced_fingerprint(bot.application_id, fingerprint)
+    except OSError:
+        logging.warning('Could not record the synced command fingerprint', exc_info=True)
+    return True
 
 
-async def setup():
-    await bot.add_cog(MyBot(bot))
+@bot.event
+async def on_ready():
+    global _sync_checked
+    logging.info('Bot ready')
+    # on_ready fires again after every reconnect; the tree cannot change in between
+    if _sync_checked:
+        return
+    _sync_checked = True
+    # commands are global, so one worker syncing them is enough
+    if SHARD_IDS is None or 0 in SHARD_IDS:
+        start = time.perf_counter()
+        try:
+            await sync_commands_if_changed()
+        except Exception:
+            _sync_checked = False
+            logging.exception('Command sync failed')
+        startup_timings['sync'] = time.perf_counter() - start
+    logging.info('Startup: %s; ready %.2fs after launch',
+                 ', '.join(f'{phase} {secs:.2f}s' for phase, secs in startup_timings.items()),
+                 time.perf_counter() - _started_at)
+
+
+async def setup(storage: StorageBackend):
+    await bot.add_cog(MyBot(bot, storage))
+
+
+def restore_games(storage: StorageBackend) -> int:
+    """Reload every active game from ``storage`` into ``games``."""
+    start = time.perf_counter()
+    games.attach(storage)
+    restored = storage.bulk_load()
+    games.update(restored)
+    # move and sub deadlines were stored with the games; hand them back to the scheduler
+    for gs in restored.values():
+        arm_deadlines(storage, gs)
+    logging.info('Loaded %d games from database in %.2fs', len(restored), time.perf_counter() - start)
+    return len(restored)
 
 
 if __name__ == '__main__':
     async def main():
+        start = time.perf_counter()
+        storage = make_backend()
         # Ensure DB schema exists before commands run
-        init_db()
-        await setup()
+        storage.init()
+        startup_timings['db init'] = time.perf_counter() - start
+        # restore live matches before the gateway connects and interactions arrive
+        start = time.perf_counter()
+        restore_games(storage)
+        startup_timings['restore'] = time.perf_counter() - start
+        start = time.perf_counter()
+        await setup(storage)
+        startup_timings['cog load'] = time.perf_counter() - start
         if not TOKEN:
             print('DISCORD_TOKEN not set. create a .env file or set env var DISCORD_TOKEN')
             return
-        await bot.start(TOKEN)
+        try:
+            await bot.start(TOKEN)
+        finally:
+            # commit any saves still queued on the write-behind thread
+            storage.close()
 
     asyncio.run(main())
-@commands.Cog.listener()
-async def setup(self):
-    pass
-
-# Add these inside your MyBot class
-
-@app_commands.command(name='kick')
-@app_commands.describe(user='User to kick from the game')
-async def kick(self, interaction: discord.Interaction, user: discord.Member):
-    """Kick a player from the lobby"""
-    gid = interaction.guild_id or 0
-    if gid not in games:
-        await interaction.response.send_message('No game in progress.', ephemeral=True)
-        return
-    gs = games[gid]
-    # Check if the interaction user is the host (creator)
-    host_id = getattr(gs, 'host_id', None)
-    if host_id != interaction.user.id:
-        await interaction.response.send_message('Only the host can kick players.', ephemeral=True)
-        return
-    # Remove the user from game
-    result = gs.leave_player(user.id)
-    if result:
-        save_game(gid, gs)
-        await interaction.response.send_message(f'{user.display_name} has been kicked from the game.')
-    else:
-        await interaction.response.send_message('User not in game or cannot be kicked.', ephemeral=True)
-
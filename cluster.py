@@ -0,0 +1,523 @@
+"""
+Sharded multi-process runtime for Basketball Blitz.
+
+A supervisor starts one writer process and N bot workers and restarts any
+that exit:
+
+    python cluster.py run --workers 4 [--shards 8]
+
+Each worker is an ordinary ``bot.py`` process connected to its own subset of
+Discord gateway shards (``SHARD_IDS`` / ``SHARD_COUNT``), so it only receives
+its guilds' interactions and only holds their GameStates. Workers never open
+the database: their ``RemoteBackend`` sends every operation to the writer
+process, which is the only process that touches SQLite.
+
+The writer can also be run on its own with ``python cluster.py writer``.
+"""
+import os
+import sys
+import time
+import queue
+import signal
+import asyncio
+import logging
+import argparse
+import threading
+import subprocess
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Dict, List, Optional, Set, Tuple
+
+import codec
+import persistence
+from game_core import GameState, MoveEvent, career_deltas
+
+logger = logging.getLogger(__name__)
+
+WRITER_ADDRESS = os.getenv('WRITER_ADDRESS', '127.0.0.1:7450')
+# how long a restarted child must stay up before its backoff resets
+STABLE_AFTER_SECONDS = 300
+MAX_RESTART_DELAY = 60
+ARCHIVE_INTERVAL_SECONDS = 3600
+
+
+class WriterError(RuntimeError):
+    """An operation failed in the writer process, or the writer is unreachable."""
+
+
+def shard_for(guild_id: int, shard_count: int) -> int:
+    """The gateway shard Discord routes ``guild_id`` to."""
+    return (guild_id >> 22) % shard_count
+
+
+def assign_shards(shard_count: int, workers: int) -> List[List[int]]:
+    """Split shard ids round-robin across ``workers`` processes."""
+    return [list(range(i, shard_count, workers)) for i in range(workers)]
+
+
+def shard_config() -> Tuple[Optional[List[int]], Optional[int]]:
+    """``(shard_ids, shard_count)`` from the environment; ``(None, None)`` when unsharded."""
+    count = int(os.getenv('SHARD_COUNT', '0')) or None
+    ids = [int(s) for s in os.getenv('SHARD_IDS', '').split(',') if s.strip()] or None
+    return ids, count
+
+
+def _parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def _authkey() -> bytes:
+    key = os.getenv('CLUSTER_AUTHKEY')
+    if not key:
+        raise WriterError('CLUSTER_AUTHKEY is not set')
+    return key.encode()
+
+
+def _pack(gs: GameState) -> Tuple[bytes, Optional[Set[Tuple]]]:
+    """GameState to wire form; the dirty set travels with it (None = all dirty)."""
+    return codec.encode(gs), gs.take_dirty()
+
+
+def _unpack(blob: bytes, dirty: Optional[Set[Tuple]]) -> GameState:
+    gs = codec.decode(blob)
+    gs.clear_dirty()
+    if dirty is None:
+        gs.mark_dirty()
+    else:
+        for key in dirty:
+            gs.mark_dirty(key)
+    return gs
+
+
+# ---------------------------------------------------------------------------
+# worker side
+# ---------------------------------------------------------------------------
+
+class RemoteBackend:
+    """StorageBackend that forwards every operation to the writer process.
+
+    Requests are pipelined over one connection. Calls only enqueue: a sender
+    thread connects, reconnects and writes to the socket, and a reader thread
+    resolves the matching futures, so the event loop never blocks on the
+    writer. If the writer goes away, in-flight futures fail, the affected
+    games are marked fully dirty, and the next request reconnects.
+    """
+
+    def __init__(self, address: str = WRITER_ADDRESS, authkey: Optional[bytes] = None,
+                 shard_ids: Optional[List[int]] = None, shard_count: Optional[int] = None):
+        self.address = _parse_address(address)
+        self.authkey = authkey or _authkey()
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self._lock = threading.Lock()
+        self._conn: Optional[Connection] = None
+        self._next_id = 0
+        self._waiters: Dict[int, Future] = {}
+        # (req_id, op, args, future) in call order; None stops the sender
+        self._outgoing: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self._sender: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> 'RemoteBackend':
+        shard_ids, shard_count = shard_config()
+        return cls(WRITER_ADDRESS, _authkey(), shard_ids, shard_count)
+
+    def _connect(self) -> Connection:
+        conn = Client(self.address, authkey=self.authkey)
+        threading.Thread(target=self._read, args=(conn,), name='writer-client', daemon=True).start()
+        return conn
+
+    def _call(self, op: str, *args) -> Future:
+        """Queue a request for the sender thread; the future fails with WriterError if it can't be made."""
+        fut: Future = Future()
+        with self._lock:
+            self._next_id += 1
+            self._outgoing.put((self._next_id, op, args, fut))
+            if self._sender is None or not self._sender.is_alive():
+                self._sender = threading.Thread(target=self._send, name='writer-sender', daemon=True)
+                self._sender.start()
+        return fut
+
+    def _send(self):
+        while True:
+            item = self._outgoing.get()
+            if item is None:
+                return
+            req_id, op, args, fut = item
+            with self._lock:
+                conn = self._conn
+            try:
+                if conn is None:
+                    conn = self._connect()
+                    with self._lock:
+                        self._conn = conn
+                with self._lock:
+                    if self._conn is not conn:
+                        raise EOFError('connection to writer lost')
+                    self._waiters[req_id] = fut
+                conn.send((req_id, op, args))
+            except (OSError, EOFError, AuthenticationError) as e:
+                with self._lock:
+                    self._waiters.pop(req_id, None)
+                    if self._conn is conn:
+                        self._conn = None
+                if not fut.done():
+                    fut.set_exception(WriterError(f'writer unreachable at {self.address}: {e}'))
+
+    def _read(self, conn: Connection):
+        while True:
+            try:
+                req_id, ok, value = conn.recv()
+            except (OSError, EOFError):
+                break
+            with self._lock:
+                fut = self._waiters.pop(req_id, None)
+            if fut is None:
+                continue
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(WriterError(value))
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+            lost, self._waiters = self._waiters, {}
+        for fut in lost.values():
+            if not fut.done():
+                fut.set_exception(WriterError('connection to writer lost'))
+
+    def _save_call(self, op: str, guild_id: int, gs: GameState, *args) -> Future:
+        fut = self._call(op, guild_id, *_pack(gs), *args)
+        try:
+            loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        def failed(f: Future):
+            # the writer held the only copy of those dirty rows; resend everything next time.
+            # The game belongs to the loop, so the sender or reader thread hands it back there.
+            if f.exception() is None:
+                return
+            if loop is None or loop.is_closed():
+                gs.mark_dirty()
+            else:
+                loop.call_soon_threadsafe(gs.mark_dirty)
+        fut.add_done_callback(failed)
+        return fut
+
+    def _owned(self, guild_id: int) -> bool:
+        return self.shard_ids is None or shard_for(guild_id, self.shard_count) in self.shard_ids
+
+    def init(self):
+        self._call('init').result()
+
+    def save(self, guild_id: int, gs: GameState):
+        self._save_call('save', guild_id, gs).result()
+
+    def load(self, guild_id: int) -> Optional[GameState]:
+        packed = self._call('load', guild_id).result()
+        return _unpack(*packed) if packed else None
+
+    def delete(self, guild_id: int):
+        self._call('delete', guild_id).result()
+
+    def list(self) -> List[int]:
+        return [gid for gid in self._call('list').result() if self._owned(gid)]
+
+    def bulk_load(self, active_only: bool = True) -> Dict[int, GameState]:
+        shards = (self.shard_ids, self.shard_count) if self.shard_ids is not None else None
+        packed = self._call('bulk_load', active_only, shards).result()
+        return {gid: _unpack(*p) for gid, p in packed.items()}
+
+    def queue_save(self, guild_id: int, gs: GameState) -> Future:
+        return self._save_call('queue_save', guild_id, gs, False)
+
+    def queue_delete(self, guild_id: int) -> Future:
+        return self._call('queue_delete', guild_id)
+
+    def queue_move(self, guild_id: int, gs: GameState, event: MoveEvent) -> Future:
+        # the deltas need the live roster, so they are worked out here, not by the writer
+        fut = self._call('queue_event', guild_id, event, career_deltas(gs, event))
+        if gs.is_checkpoint(event):
+            fut = self._save_call('queue_save', guild_id, gs, True)
+        return fut
+
+    def flush(self) -> Future:
+        return self._call('flush')
+
+    def archive_finished(self, **kwargs) -> int:
+        # the writer process runs the sweep on its own schedule
+        return 0
+
+    def career(self, user_id: int, guild_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        return self._call('career', user_id, guild_id).result()
+
+    def leaderboard(self, guild_id: Optional[int] = None, order: str = 'points', limit: int = 10) -> List[tuple]:
+        return self._call('leaderboard', guild_id, order, limit).result()
+
+    def close(self):
+        with self._lock:
+            connected = self._conn is not None
+        if connected:
+            try:
+                self.flush().result(timeout=30)
+            except Exception:
+                logger.exception('Final flush to writer failed')
+        with self._lock:
+            self._outgoing.put(None)
+            self._sender = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ---------------------------------------------------------------------------
+# writer side
+# ---------------------------------------------------------------------------
+
+class WriterServer:
+    """Owns the database: one pool, one write-behind queue, many worker connections."""
+
+    def __init__(self, address: str = WRITER_ADDRESS, authkey: Optional[bytes] = None,
+                 db_path: Optional[str] = None):
+        self.address = _parse_address(address)
+        self.authkey = authkey or _authkey()
+        self.pool = persistence.ConnectionPool(db_path or persistence.DB_PATH)
+        self.writer = persistence.WriteBehindQueue(lambda: self.pool)
+        self._listener: Optional[Listener] = None
+
+    def serve_forever(self):
+        persistence.init_db(self.pool)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        threading.Thread(target=self._archive_loop, name='archiver', daemon=True).start()
+        logger.info('Writer listening on %s:%d', *self.address)
+        while True:
+            try:
+                conn = self._listener.accept()
+            except (OSError, AuthenticationError):
+                if self._listener is None:
+                    break
+                logger.exception('Rejected worker connection')
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name='writer-conn', daemon=True).start()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+        self.writer.close()
+        self.pool.close()
+
+    def _archive_loop(self):
+        while True:
+            time.sleep(ARCHIVE_INTERVAL_SECONDS)
+            try:
+                persistence.archive_finished_games(pool=self.pool)
+            except Exception:
+                logger.exception('Archival sweep failed')
+
+    def _serve(self, conn: Connection):
+        send_lock = threading.Lock()
+
+        def reply(req_id: int, ok: bool, value):
+            with send_lock:
+                try:
+                    conn.send((req_id, ok, value))
+                except (OSError, EOFError):
+                    pass
+
+        def on_done(req_id: int, fut: Future):
+            exc = fut.exception()
+            reply(req_id, exc is None, None if exc is None else f'{type(exc).__name__}: {exc}')
+
+        while True:
+            try:
+                req_id, op, args = conn.recv()
+            except (OSError, EOFError):
+                break
+            try:
+                result = getattr(self, '_op_' + op)(*args)
+            except Exception as e:
+                logger.exception('Writer op %s failed', op)
+                reply(req_id, False, f'{type(e).__name__}: {e}')
+                continue
+            if isinstance(result, Future):
+                result.add_done_callback(lambda f, r=req_id: on_done(r, f))
+            else:
+                reply(req_id, True, result)
+        conn.close()
+
+    def _op_init(self):
+        persistence.init_db(self.pool)
+
+    def _op_save(self, guild_id: int, blob: bytes, dirty):
+        persistence.save_game(guild_id, _unpack(blob, dirty), self.pool)
+
+    def _op_load(self, guild_id: int):
+        gs = persistence.load_game(guild_id, self.pool)
+        return _pack(gs) if gs else None
+
+    def _op_delete(self, guild_id: int):
+        persistence.delete_game(guild_id, self.pool)
+
+    def _op_list(self):
+        return persistence.list_games(self.pool)
+
+    def _op_bulk_load(self, active_only: bool, shards):
+        games = persistence.load_all_games(active_only, self.pool)
+        if shards:
+            ids, count = shards
+            games = {gid: gs for gid, gs in games.items() if shard_for(gid, count) in ids}
+        return {gid: _pack(gs) for gid, gs in games.items()}
+
+    def _op_queue_save(self, guild_id: int, blob: bytes, dirty, compact: bool) -> Future:
+        return self.writer.submit_save(guild_id, _unpack(blob, dirty), compact=compact)
+
+    def _op_queue_delete(self, guild_id: int) -> Future:
+        return self.writer.submit_delete(guild_id)
+
+    def _op_queue_event(self, guild_id: int, event: MoveEvent, career=None) -> Future:
+        return self.writer.submit_event(guild_id, event, career)
+
+    def _op_career(self, user_id: int, guild_id: Optional[int]):
+        return persistence.load_career(user_id, guild_id, self.pool)
+
+    def _op_leaderboard(self, guild_id: Optional[int], order: str, limit: int):
+        return persistence.load_leaderboard(guild_id, order, limit, self.pool)
+
+    def _op_flush(self) -> Future:
+        return self.writer.flush()
+
+
+# ---------------------------------------------------------------------------
+# supervisor
+# ---------------------------------------------------------------------------
+
+class _Child:
+    def __init__(self, name: str, argv: List[str], env: Dict[str, str]):
+        self.name = name
+        self.argv = argv
+        self.env = env
+        self.proc: Optional[subprocess.Popen] = None
+        self.started = 0.0
+        self.failures = 0
+        self.restart_at = 0.0
+
+    def start(self):
+        # own session, so a terminal Ctrl-C reaches only the supervisor, which stops children in order
+        self.proc = subprocess.Popen(self.argv, env=self.env, start_new_session=True)
+        self.started = time.monotonic()
+        logger.info('Started %s (pid %d)', self.name, self.proc.pid)
+
+    def check(self, now: float):
+        """Restart the child with exponential backoff once it has exited."""
+        if self.proc is not None:
+            code = self.proc.poll()
+            if code is None:
+                return
+            if now - self.started >= STABLE_AFTER_SECONDS:
+                self.failures = 0
+            delay = min(2 ** self.failures, MAX_RESTART_DELAY)
+            self.failures += 1
+            self.restart_at = now + delay
+            self.proc = None
+            logger.warning('%s exited with code %s; restarting in %ds', self.name, code, delay)
+        if now >= self.restart_at:
+            self.start()
+
+    def stop(self, timeout: float):
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        # SIGINT lets bot.py / the writer run their shutdown flushes
+        self.proc.send_signal(signal.SIGINT)
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning('%s did not stop in %ss; killing', self.name, timeout)
+            self.proc.kill()
+            self.proc.wait()
+
+
+def _wait_for_writer(address: Tuple[str, int], authkey: bytes, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            Client(address, authkey=authkey).close()
+            return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise WriterError(f'writer did not come up on {address[0]}:{address[1]}')
+            time.sleep(0.2)
+
+
+def supervise(workers: int, shard_count: int, address: str = WRITER_ADDRESS):
+    """Run the writer and ``workers`` bot processes until interrupted."""
+    env = dict(os.environ)
+    env.setdefault('CLUSTER_AUTHKEY', os.urandom(16).hex())
+    env['WRITER_ADDRESS'] = address
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    writer = _Child('writer', [sys.executable, os.path.join(here, 'cluster.py'), 'writer'], env)
+    bots = []
+    for i, shard_ids in enumerate(assign_shards(shard_count, workers)):
+        worker_env = dict(env, STORAGE_BACKEND='remote', SHARD_COUNT=str(shard_count),
+                          SHARD_IDS=','.join(map(str, shard_ids)))
+        bots.append(_Child(f'worker-{i} (shards {shard_ids})',
+                           [sys.executable, os.path.join(here, 'bot.py')], worker_env))
+
+    writer.start()
+    _wait_for_writer(_parse_address(address), env['CLUSTER_AUTHKEY'].encode())
+    for child in bots:
+        child.start()
+    try:
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            for child in [writer] + bots:
+                child.check(now)
+    except KeyboardInterrupt:
+        logger.info('Shutting down cluster')
+    finally:
+        # workers first so their last writes reach the writer before it drains
+        for child in bots:
+            child.stop(30)
+        writer.stop(60)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    # SIGTERM (systemd stop, docker stop) shuts down as cleanly as Ctrl-C
+    signal.signal(signal.SIGTERM, _interrupt)
+    parser = argparse.ArgumentParser(description='Basketball Blitz sharded runtime')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p = sub.add_parser('run', help='start the writer and bot workers under a supervisor')
+    p.add_argument('--workers', type=int, default=2)
+    p.add_argument('--shards', type=int, default=None, help='gateway shard count (default: --workers)')
+    p.add_argument('--address', default=WRITER_ADDRESS)
+
+    p = sub.add_parser('writer', help='run only the database writer process')
+    p.add_argument('--address', default=WRITER_ADDRESS)
+    p.add_argument('--db', default=None)
+
+    args = parser.parse_args()
+    if args.cmd == 'run':
+        supervise(args.workers, args.shards or args.workers, args.address)
+    elif args.cmd == 'writer':
+        server = WriterServer(args.address, db_path=args.db)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Compact, versioned binary encoding of a GameState.
+
+Layout (little-endian), version 2:
+
+    magic 'BB', version u8
+    guild_id i64, host_id i64, flags u8, move_count u16, event_seq u32
+    possession team i8 (-1 = none), attacker pos str
+    toss_choices: count u8, then (team i8, choice str) pairs
+    join_order: count u8, then user_id i64 each
+    teams: count u8, then per team
+        team_id i8, name str, captain_id opt-i64, score i32,
+        slots: count u8, then (pos str, present u8[, user_id i64, name str, afk u8])
+    sub_requests: count u16, then (team i8, out_pos str, in_user_id i64, in_name str, deadline opt-f64)
+    channel_id opt-i64
+    turn: present u8[, stage str, team i8, actor_id i64, att_choice str, pos str, deadline opt-f64]
+
+Strings are a u16 byte length followed by UTF-8 (0xFFFF marks None); opt-
+values are a u8 presence flag followed by the value. Version 1 blobs (no
+deadlines, channel or turn) still decode.
+Decoding restores the exact state, including int team keys in toss_choices.
+"""
+import struct
+from typing import List, Optional, Tuple
+
+from game_core import GameState, Team, PlayerSlot, SubRequest, TurnPrompt
+
+MAGIC = b'BB'
+VERSION = 2
+
+_FLAG_ACTIVE = 1
+_FLAG_TOSS_ACTIVE = 2
+_FLAG_LOCKED = 4
+_FLAG_FINISHED = 8
+
+_HEADER = struct.Struct('<2sB')
+_GAME = struct.Struct('<qqBHI')
+_I8 = struct.Struct('<b')
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_I32 = struct.Struct('<i')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_NONE_LEN = 0xFFFF
+
+
+class CodecError(ValueError):
+    """Raised for blobs that are truncated, corrupt or of an unknown version."""
+
+
+def _put_str(out: List[bytes], value: Optional[str]):
+    if value is None:
+        out.append(_U16.pack(_NONE_LEN))
+        return
+    data = value.encode('utf-8')
+    if len(data) >= _NONE_LEN:
+        raise CodecError('string too long to encode')
+    out.append(_U16.pack(len(data)))
+    out.append(data)
+
+
+def _put_opt_i64(out: List[bytes], value: Optional[int]):
+    if value is None:
+        out.append(_U8.pack(0))
+    else:
+        out.append(_U8.pack(1))
+        out.append(_I64.pack(value))
+
+
+def _put_opt_f64(out: List[bytes], value: Optional[float]):
+    if value is None:
+        out.append(_U8.pack(0))
+    else:
+        out.append(_U8.pack(1))
+        out.append(_F64.pack(value))
+
+
+def encode(gs: GameState) -> bytes:
+    """Serialize ``gs`` to bytes."""
+    out: List[bytes] = [_HEADER.pack(MAGIC, VERSION)]
+    flags = ((_FLAG_ACTIVE if gs.active else 0)
+             | (_FLAG_TOSS_ACTIVE if gs.toss_active else 0)
+             | (_FLAG_LOCKED if gs.locked else 0)
+             | (_FLAG_FINISHED if gs.finished else 0))
+    out.append(_GAME.pack(gs.guild_id, gs.host_id, flags, gs.move_count, gs.event_seq))
+    team = gs.current_possession_team
+    out.append(_I8.pack(-1 if team is None else team))
+    _put_str(out, gs.current_attacker_pos)
+
+    out.append(_U8.pack(len(gs.toss_choices)))
+    for team_id, choice in gs.toss_choices.items():
+        out.append(_I8.pack(team_id))
+        _put_str(out, choice)
+
+    out.append(_U8.pack(len(gs.join_order)))
+    for user_id in gs.join_order:
+        out.append(_I64.pack(user_id))
+
+    out.append(_U8.pack(len(gs.teams)))
+    for team_id, t in gs.teams.items():
+        out.append(_I8.pack(team_id))
+        _put_str(out, t.name)
+        _put_opt_i64(out, t.captain_id)
+        out.append(_I32.pack(t.score))
+        out.append(_U8.pack(len(t.slots)))
+        for pos, slot in t.slots.items():
+            _put_str(out, pos)
+            if slot is None:
+                out.append(_U8.pack(0))
+            else:
+                out.append(_U8.pack(1))
+                out.append(_I64.pack(slot.user_id))
+                _put_str(out, slot.name)
+                out.append(_U8.pack(1 if slot.afk else 0))
+
+    out.append(_U16.pack(len(gs.sub_requests)))
+    for req in gs.sub_requests.values():
+        out.append(_I8.pack(req.team))
+        _put_str(out, req.out_pos)
+        out.append(_I64.pack(req.in_user_id))
+        _put_str(out, req.in_name)
+        _put_opt_f64(out, req.deadline)
+
+    _put_opt_i64(out, gs.channel_id)
+    turn = gs.turn
+    if turn is None:
+        out.append(_U8.pack(0))
+    else:
+        out.append(_U8.pack(1))
+        _put_str(out, turn.stage)
+        out.append(_I8.pack(turn.team))
+        out.append(_I64.pack(turn.actor_id))
+        _put_str(out, turn.att_choice)
+        _put_str(out, turn.pos)
+        _put_opt_f64(out, turn.deadline)
+    return b''.join(out)
+
+
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, st: struct.Struct) -> Tuple:
+        try:
+            values = st.unpack_from(self.data, self.pos)
+        except struct.error as e:
+            raise CodecError(f'truncated game blob at offset {self.pos}') from e
+        self.pos += st.size
+        return values
+
+    def one(self, st: struct.Struct):
+        return self.unpack(st)[0]
+
+    def text(self) -> Optional[str]:
+        n = self.one(_U16)
+        if n == _NONE_LEN:
+            return None
+        end = self.pos + n
+        if end > len(self.data):
+            raise CodecError(f'truncated game blob at offset {self.pos}')
+        value = self.data[self.pos:end].decode('utf-8')
+        self.pos = end
+        return value
+
+    def opt_i64(self) -> Optional[int]:
+        return self.one(_I64) if self.one(_U8) else None
+
+    def opt_f64(self) -> Optional[float]:
+        return self.one(_F64) if self.one(_U8) else None
+
+
+def decode(data: bytes) -> GameState:
+    """Rebuild a GameState from ``encode`` output."""
+    r = _Reader(data)
+    magic, version = r.unpack(_HEADER)
+    if magic != MAGIC:
+        raise CodecError('not a game blob')
+    if version not in (1, VERSION):
+        raise CodecError(f'unsupported game blob version {version}')
+    guild_id, host_id, flags, move_count, event_seq = r.unpack(_GAME)
+    gs = GameState(host_id, guild_id)
+    gs.active = bool(flags & _FLAG_ACTIVE)
+    gs.toss_active = bool(flags & _FLAG_TOSS_ACTIVE)
+    gs.locked = bool(flags & _FLAG_LOCKED)
+    gs.finished = bool(flags & _FLAG_FINISHED)
+    gs.move_count = move_count
+    gs.event_seq = event_seq
+    team = r.one(_I8)
+    gs.current_possession_team = None if team == -1 else team
+    gs.current_attacker_pos = r.text()
+
+    gs.toss_choices = {}
+    for _ in range(r.one(_U8)):
+        team_id = r.one(_I8)
+        gs.toss_choices[team_id] = r.text()
+
+    gs.join_order = [r.one(_I64) for _ in range(r.one(_U8))]
+
+    gs.teams = {}
+    for _ in range(r.one(_U8)):
+        team_id = r.one(_I8)
+        t = Team(name=r.text())
+        t.captain_id = r.opt_i64()
+        t.score = r.one(_I32)
+        t.slots = {}
+        for _ in range(r.one(_U8)):
+            pos = r.text()
+            if r.one(_U8):
+                user_id = r.one(_I64)
+                name = r.text()
+                t.slots[pos] = PlayerSlot(user_id=user_id, name=name, position=pos, afk=bool(r.one(_U8)))
+            else:
+                t.slots[pos] = None
+        gs.teams[team_id] = t
+
+    gs.sub_requests = {}
+    for _ in range(r.one(_U16)):
+        team_id = r.one(_I8)
+        out_pos = r.text()
+        in_user_id = r.one(_I64)
+        in_name = r.text()
+        gs.sub_requests[in_user_id] = SubRequest(team=team_id, out_pos=out_pos, in_user_id=in_user_id,
+                                                 in_name=in_name, deadline=r.opt_f64() if version > 1 else None)
+
+    if version > 1:
+        gs.channel_id = r.opt_i64()
+        if r.one(_U8):
+            stage = r.text()
+            team_id = r.one(_I8)
+            actor_id = r.one(_I64)
+            gs.turn = TurnPrompt(stage, team_id, actor_id, att_choice=r.text(), pos=r.text(),
+                                 deadline=r.opt_f64())
+    if r.pos != len(data):
+        raise CodecError('trailing bytes after game blob')
+    gs.reindex()
+    return gs
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+# test_utils.py is the /test_* command cog, not a test module
+collect_ignore = ['test_utils.py']
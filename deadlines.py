@@ -0,0 +1,111 @@
+"""
+Per-process deadline scheduler.
+
+Every pending move prompt and sub request in the process shares one heap and
+one asyncio task, instead of each Discord view running a timer of its own.
+Deadlines are wall-clock (``time.time()``) seconds, so the values stored with
+a game still name the same moment after a restart and can simply be armed
+again.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[], Awaitable[None]]
+
+
+class DeadlineScheduler:
+    """Run an async callback once its deadline passes, one pending deadline per key.
+
+    Arming a key again replaces its deadline and callback. Superseded and
+    cancelled heap entries are not searched for; they are dropped when they
+    reach the top of the heap.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        # key -> (token of its live heap entry, callback)
+        self._pending: Dict[Hashable, Tuple[int, Callback]] = {}
+        self._tokens = itertools.count()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def arm(self, key: Hashable, due: float, callback: Callback):
+        """Run ``callback`` at ``due`` unless ``key`` is re-armed or cancelled first."""
+        token = next(self._tokens)
+        self._pending[key] = (token, callback)
+        heapq.heappush(self._heap, (due, token, key))
+        if self._wake is not None and self._heap[0][1] == token:
+            # new earliest deadline: the loop is sleeping for too long
+            self._wake.set()
+
+    def cancel(self, key: Hashable) -> bool:
+        return self._pending.pop(key, None) is not None
+
+    def pop_due(self, now: float) -> List[Callback]:
+        """Remove and return the callbacks whose deadline is at or before ``now``."""
+        fired = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, token, key = heapq.heappop(heap)
+            entry = self._pending.get(key)
+            if entry is not None and entry[0] == token:
+                del self._pending[key]
+                fired.append(entry[1])
+        return fired
+
+    def next_due(self) -> Optional[float]:
+        heap = self._heap
+        while heap:
+            _, token, key = heap[0]
+            entry = self._pending.get(key)
+            if entry is not None and entry[0] == token:
+                return heap[0][0]
+            heapq.heappop(heap)
+        return None
+
+    def start(self):
+        """Start firing deadlines on the running event loop."""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        self._wake = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            for callback in self.pop_due(self.clock()):
+                # a slow callback (a Discord send) must not hold up the others
+                task = asyncio.create_task(callback())
+                self._running.add(task)
+                task.add_done_callback(self._finished)
+            due = self.next_due()
+            timeout = None if due is None else max(0.0, due - self.clock())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error('deadline callback failed', exc_info=task.exception())
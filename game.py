@@ -1,8 +1,56 @@
 import random
+from bisect import bisect_left, insort
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from persistence import ConnectionPool
+
+# shot outcomes and their cumulative odds: 40% miss, 40% 2-pointer, 20% 3-pointer
+SHOT_POINTS = (0, 2, 3)
+SHOT_CUM_WEIGHTS = (0.4, 0.8, 1.0)
+
+
+class Leaderboard:
+    """Players ranked by score, then accuracy, kept sorted as stats change.
+
+    An update moves one entry with two bisections instead of re-sorting
+    everyone, so top-N and rank-of-user queries never sort the board.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[int, float, int]] = []
+        self._key_of: Dict[int, Tuple[int, float, int]] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, user_id: int, score: int, shots: int, made: int):
+        old = self._key_of.get(user_id)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, old)]
+        # negated so the best entry sorts first; user_id breaks ties stably
+        key = (-score, -(made / shots if shots else 0.0), user_id)
+        self._key_of[user_id] = key
+        insort(self._keys, key)
+
+    def top(self, n: int = 10) -> List[Tuple[int, int, float]]:
+        """The best ``n`` players as (user_id, score, accuracy)."""
+        return [(user_id, -score, -acc) for score, acc, user_id in self._keys[:n]]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based position of the user, or None if they never shot."""
+        key = self._key_of.get(user_id)
+        if key is None:
+            return None
+        return bisect_left(self._keys, key) + 1
+
 
 class Game:
     def __init__(self):
         self.players = {}  # user_id -> stats
+        self.leaderboard = Leaderboard()
+        # players whose stats changed since the last save()
+        self._dirty: Set[int] = set()
 
     def start_player(self, user_id):
         if user_id not in self.players:
@@ -17,15 +65,69 @@ class Game:
         r = random.random()
         # simple probabilities: 40% miss, 40% 2-pointer, 20% 3-pointer
         if r < 0.4:
-            return {"result": "miss", "points": 0}
+            result = {"result": "miss", "points": 0}
         elif r < 0.8:
             self.players[user_id]["made"] += 1
             self.players[user_id]["score"] += 2
-            return {"result": "2pt", "points": 2}
+            result = {"result": "2pt", "points": 2}
         else:
             self.players[user_id]["made"] += 1
             self.players[user_id]["score"] += 3
-            return {"result": "3pt", "points": 3}
+            result = {"result": "3pt", "points": 3}
+        self._changed(user_id)
+        return result
+
+    def shoot_many(self, user_id, n):
+        """Take ``n`` shots at once, with the same odds as ``shoot``.
+
+        All ``n`` outcomes come from a single ``random.choices`` draw and the
+        stats and leaderboard are updated once, not per shot.
+        """
+        if user_id not in self.players:
+            return {"error": "not_started"}
+        if n < 1:
+            return {"error": "no_shots"}
+        draws = random.choices(SHOT_POINTS, cum_weights=SHOT_CUM_WEIGHTS, k=n)
+        twos = draws.count(2)
+        threes = draws.count(3)
+        points = 2 * twos + 3 * threes
+        stats = self.players[user_id]
+        stats["shots"] += n
+        stats["made"] += twos + threes
+        stats["score"] += points
+        self._changed(user_id)
+        return {"shots": n, "miss": n - twos - threes, "2pt": twos, "3pt": threes, "points": points}
+
+    def _changed(self, user_id):
+        stats = self.players[user_id]
+        self.leaderboard.update(user_id, stats["score"], stats["shots"], stats["made"])
+        self._dirty.add(user_id)
 
     def stats(self, user_id):
         return self.players.get(user_id, None)
+
+    def top(self, n=10):
+        return self.leaderboard.top(n)
+
+    def rank(self, user_id):
+        return self.leaderboard.rank(user_id)
+
+    def save(self, pool: Optional['ConnectionPool'] = None):
+        """Write the stats changed since the last save to the database."""
+        if not self._dirty:
+            return
+        # imported here so practice games run without the database module
+        import persistence
+        rows = {user_id: self.players[user_id] for user_id in self._dirty}
+        persistence.save_practice_stats(rows, pool)
+        self._dirty = set()
+
+    @classmethod
+    def load(cls, pool: Optional['ConnectionPool'] = None) -> 'Game':
+        """A Game holding every player's stored practice stats."""
+        import persistence
+        game = cls()
+        for user_id, stats in persistence.load_practice_stats(pool).items():
+            game.players[user_id] = stats
+            game.leaderboard.update(user_id, stats["score"], stats["shots"], stats["made"])
+        return game
@@ -1,36 +1,182 @@
-import asyncio
 from dataclasses import dataclass, field
-from typing import Dict, Optional, List
+from enum import StrEnum
+from typing import Dict, FrozenSet, Optional, List, Set, Tuple
 
 MAX_MOVES = 36
 HALFTIME = 18
 JOIN_LIMIT = 6
+# seconds a player has to answer a move prompt / a sub request
+TURN_TIMEOUT = 30
+SUB_TIMEOUT = 15
 
-@dataclass
+# The roster classes are slotted: an idle lobby is mostly these objects, and
+# dropping the per-instance __dict__ roughly halves its footprint.
+
+@dataclass(slots=True)
 class PlayerSlot:
     user_id: int
     name: str
     position: str  # 'pg','sg','ce'
     afk: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class Team:
     name: str
     slots: Dict[str, Optional[PlayerSlot]] = field(default_factory=lambda: {'pg': None, 'sg': None, 'ce': None})
     captain_id: Optional[int] = None
     score: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class SubRequest:
     team: int
     out_pos: str
     in_user_id: int
     in_name: str
-    task: Optional[asyncio.Task] = None
+    deadline: Optional[float] = None  # epoch seconds; the request lapses after this
+
+@dataclass
+class MoveEvent:
+    """One resolved step of a possession, as written to the move log.
+
+    ``apply`` replays the step's effect on a state, so a game can be rebuilt
+    from its last snapshot plus the events recorded after it.
+    """
+    kind: str  # 'attack', 'guess', 'sg_choice', 'save', 'timeout'
+    team: int  # attacking team
+    actor_id: Optional[int] = None
+    choice: Optional[str] = None  # attacker / SG action
+    guess: Optional[str] = None  # defender guess or save attempt
+    points: int = 0
+    possession: Optional[Tuple[int, str]] = None  # (team, pos) after the step
+    move: bool = False  # whether the step used up a move
+    afk_user_id: Optional[int] = None
+    seq: int = 0
+    turn: Optional['TurnPrompt'] = None  # the prompt the game waits on after the step
+
+    def apply(self, gs: 'GameState'):
+        if self.afk_user_id is not None:
+            gs.mark_afk(self.afk_user_id)
+        if self.points:
+            gs.score_points(self.team, self.points)
+        if self.move:
+            gs.increment_move()
+        if self.possession is not None:
+            gs.set_possession(*self.possession)
+        gs.turn = self.turn
+        gs.event_seq = self.seq
+        gs.mark_dirty(('game',))
+
+class Action(StrEnum):
+    """Attacker actions; the values are what the select menus send back."""
+    SIDEPASS = 'sidepass'
+    PG_DRIBBLE_LAYUP = 'pg_dribble_layup'
+    PG_DRIBBLE_JUMP = 'pg_dribble_jump'
+    PG_HALF = 'pg_half'
+    PG_FULL = 'pg_full'
+    HOLD = 'hold'
+    PLAY_BACK = 'play_back'
+    SG_DRIBBLE_LAYUP = 'sg_dribble_layup'
+    SG_DRIBBLE_DUNK = 'sg_dribble_dunk'
+    SG_3_HALF = 'sg_3_half'
+    SG_3_FULL = 'sg_3_full'
+    ACTION = 'action'  # the CE's only option
+
+
+class Guess(StrEnum):
+    """Defender guesses and centre save attempts."""
+    THREE_POINTER = '3-pointer'
+    DRIBBLE = 'dribble'
+    SIDEPASS = 'sidepass'
+    LAYUP = 'layup'
+    DUNK = 'dunk'
+    HALFCOURT = 'halfcourt'
+    FULLCOURT = 'fullcourt'
+    JUMP_SHOT = 'jump shot'
+
+
+# (value, label) choices offered at each prompt; the bot renders these as select
+# options and the balance simulator draws from the same sets
+ATTACK_ACTIONS: Dict[str, Tuple[Tuple[Action, str], ...]] = {
+    'pg': (
+        (Action.SIDEPASS, 'Side-pass to SG'),
+        (Action.PG_DRIBBLE_LAYUP, 'Dribble → Layup'),
+        (Action.PG_DRIBBLE_JUMP, 'Dribble → Jump shot'),
+        (Action.PG_HALF, 'Halfcourt shot (PG)'),
+        (Action.PG_FULL, 'Fullcourt shot (PG)'),
+        (Action.HOLD, 'Hold (bounce pass)'),
+        (Action.PLAY_BACK, 'Play back'),
+    ),
+    'sg': (
+        (Action.SG_DRIBBLE_LAYUP, 'Dribble → Layup'),
+        (Action.SG_DRIBBLE_DUNK, 'Dribble → Dunk'),
+        (Action.SG_3_HALF, '3-pointer Halfcourt'),
+        (Action.SG_3_FULL, '3-pointer Fullcourt'),
+    ),
+    'ce': (
+        (Action.ACTION, 'Action'),
+    ),
+}
+SG_SHOTS = ATTACK_ACTIONS['sg']
+# the position that plays each action, i.e. who shoots it
+ACTION_POSITION: Dict[str, str] = {value: pos for pos, actions in ATTACK_ACTIONS.items() for value, _ in actions}
+GUESS_OPTIONS = tuple(Guess)
+SAVE_OPTIONS = (Guess.THREE_POINTER, Guess.LAYUP, Guess.DUNK, Guess.DRIBBLE)
+
+
+def match_guess_rules(att_choice: Optional[str], guess: str) -> bool:
+    """The guess-matching rules on raw strings; ``GUESS_HITS`` is built from this."""
+    if not att_choice:
+        return False
+    a = att_choice.lower()
+    g = guess.lower()
+    if '3' in a or 'halfcourt' in a or 'fullcourt' in a:
+        return g in ('3-pointer', '3 pointer', 'halfcourt', 'fullcourt', '3')
+    if 'dribble' in a:
+        return g in ('dribble',)
+    # suffix match: 'pg_dribble_layup' matches 'layup'
+    if a.endswith(g.replace(' ', '_')) or a == g:
+        return True
+    return False
+
+
+def shot_points_rule(choice: str) -> int:
+    return 3 if '3' in choice else 2
+
+
+# outcome tables, computed once: does this guess catch this action, and what
+# does the action score if it goes in
+GUESS_HITS: Dict[Tuple[Action, Guess], bool] = {(a, g): match_guess_rules(a, g) for a in Action for g in Guess}
+ACTION_POINTS: Dict[Action, int] = {a: shot_points_rule(a) for a in Action}
+
+# stages of a possession, in the order they can occur
+ATTACK = 'attack'
+GUESS = 'guess'
+SG_CHOICE = 'sg_choice'
+SAVE = 'save'
+
+@dataclass(slots=True)
+class TurnPrompt:
+    """The input a possession is waiting for, and from whom."""
+    stage: str  # ATTACK, GUESS, SG_CHOICE or SAVE
+    team: int  # attacking team
+    actor_id: int  # the player who must answer
+    att_choice: Optional[str] = None  # action being guessed / saved against
+    pos: Optional[str] = None  # attacker position (ATTACK only)
+    deadline: Optional[float] = None  # epoch seconds; unanswered by then it resolves as a timeout
+
+# shared "nothing changed" value, so a clean state carries no set of its own
+_CLEAN: FrozenSet[Tuple] = frozenset()
+
 
 class GameState:
-    def __init__(self, host_id: int):
+    __slots__ = ('host_id', 'guild_id', 'teams', 'move_count', 'active', 'current_possession_team',
+                 'current_attacker_pos', 'sub_requests', 'locked', 'join_order', 'toss_active',
+                 'toss_choices', 'finished', 'event_seq', '_dirty', '_dirty_all', '_slot_of',
+                 '_captain_team', 'turn', 'channel_id', 'version', '_livescore')
+
+    def __init__(self, host_id: int, guild_id: int = 0):
         self.host_id = host_id
+        self.guild_id = guild_id
         self.teams: Dict[int, Team] = {1: Team(name='Team 1'), 2: Team(name='Team 2')}
         self.move_count = 0
         self.active = False
@@ -41,15 +187,69 @@ class GameState:
         self.join_order: List[int] = []
         self.toss_active = False
         self.toss_choices: Dict[int, str] = {}
+        # set once the match is over (all moves played or ended early); a
+        # finished game is eligible for archival
+        self.finished = False
+        # sequence number of the last MoveEvent applied to this state
+        self.event_seq = 0
+        # Rows changed since the last flush to storage, keyed like
+        # ('game',), ('team', team_id), ('slot', team_id, pos), ('sub', in_user_id).
+        # A fresh state has never been written, so everything starts dirty.
+        self._dirty: Set[Tuple] = _CLEAN
+        self._dirty_all = True
+        # lookup indexes over the rosters: user_id -> (team_id, pos) for every
+        # seated player, and captain user_id -> team_id
+        self._slot_of: Dict[int, Tuple[int, str]] = {}
+        self._captain_team: Dict[int, int] = {}
+        # the prompt the current possession is waiting on; stored with the
+        # game (and on every move event) so its deadline survives a restart
+        self.turn: Optional[TurnPrompt] = None
+        # channel the game is played in, where timed-out prompts are followed up
+        self.channel_id: Optional[int] = None
+        # bumped on every change (see mark_dirty); renderings of the state are
+        # cached against it
+        self.version = 0
+        self._livescore: Optional[Tuple[int, dict]] = None
+
+    def reindex(self):
+        """Rebuild the roster indexes after ``teams`` was filled in directly (loaders)."""
+        self._slot_of = {s.user_id: (tid, p) for tid, t in self.teams.items()
+                         for p, s in t.slots.items() if s}
+        self._captain_team = {}
+        for tid, t in self.teams.items():
+            if t.captain_id is not None:
+                self._captain_team.setdefault(t.captain_id, tid)
+
+    def mark_dirty(self, key: Optional[Tuple] = None):
+        """Record that a stored row changed. With no key, the whole state is dirty.
+
+        Every mutator comes through here, so this also bumps ``version``.
+        """
+        self.version += 1
+        if key is None:
+            self._dirty_all = True
+        elif self._dirty is _CLEAN:
+            self._dirty = {key}
+        else:
+            self._dirty.add(key)
+
+    def take_dirty(self) -> Optional[Set[Tuple]]:
+        """Return and reset the changed rows; None means everything must be written."""
+        dirty = None if self._dirty_all else self._dirty
+        self._dirty = _CLEAN
+        self._dirty_all = False
+        return dirty
+
+    def clear_dirty(self):
+        self._dirty = _CLEAN
+        self._dirty_all = False
 
     def join_player(self, user_id: int, name: str) -> Optional[str]:
         if self.locked or len(self.join_order) >= JOIN_LIMIT:
             return None
         # prevent a user joining more than once / occupying multiple positions
-        for t in self.teams.values():
-            for s in t.slots.values():
-                if s and s.user_id == user_id:
-                    return None
+        if user_id in self._slot_of:
+            return None
         # assign to first available slot across teams
         for team_id in (1,2):
             team = self.teams[team_id]
@@ -57,8 +257,12 @@ class GameState:
                 if team.slots[pos] is None:
                     slot = PlayerSlot(user_id=user_id, name=name, position=pos)
                     team.slots[pos] = slot
+                    self._slot_of[user_id] = (team_id, pos)
+                    self.mark_dirty(('slot', team_id, pos))
                     if team.captain_id is None:
                         team.captain_id = slot.user_id  # CE auto-assigned earlier, but simple fallback
+                        self._captain_team[user_id] = team_id
+                        self.mark_dirty(('team', team_id))
                     self.join_order.append(user_id)
                     if len(self.join_order) >= JOIN_LIMIT:
                         self.locked = True
@@ -70,15 +274,16 @@ class GameState:
         # only allow leave if not active
         if self.active:
             return False
-        for t in self.teams.values():
-            for p, slot in t.slots.items():
-                if slot and slot.user_id == user_id:
-                    t.slots[p] = None
-                    if user_id in self.join_order:
-                        self.join_order.remove(user_id)
-                    self.locked = len(self.join_order) >= JOIN_LIMIT
-                    return True
-        return False
+        loc = self._slot_of.pop(user_id, None)
+        if loc is None:
+            return False
+        tid, p = loc
+        self.teams[tid].slots[p] = None
+        self.mark_dirty(('slot', tid, p))
+        if user_id in self.join_order:
+            self.join_order.remove(user_id)
+        self.locked = len(self.join_order) >= JOIN_LIMIT
+        return True
 
     def start_game(self, starter_id: int) -> bool:
         if starter_id != self.host_id:
@@ -92,11 +297,13 @@ class GameState:
         # default possession to team 1's PG
         self.current_possession_team = 1
         self.current_attacker_pos = 'pg'
+        self.mark_dirty(('game',))
         return True
 
     def start_toss(self):
         self.toss_active = True
         self.toss_choices = {}
+        self.mark_dirty(('game',))
 
     def set_toss_choice(self, team_id:int, choice:str):
         if not self.toss_active:
@@ -106,6 +313,7 @@ class GameState:
         if choice not in ('high','low'):
             return False
         self.toss_choices[team_id] = choice
+        self.mark_dirty(('game',))
         return True
 
     def resolve_toss(self, pick:str) -> Optional[int]:
@@ -113,6 +321,7 @@ class GameState:
         if not self.toss_active:
             return None
         self.toss_active = False
+        self.mark_dirty(('game',))
         # find a matching team
         winners = [tid for tid,ch in self.toss_choices.items() if ch == pick]
         if len(winners) == 1:
@@ -122,57 +331,102 @@ class GameState:
 
     def end_game(self):
         self.active = False
+        self.finished = True
+        self.turn = None
+        self.mark_dirty(('game',))
 
-    def make_sub_request(self, team_id: int, out_pos: str, in_user_id:int, in_name:str) -> SubRequest:
-        req = SubRequest(team=team_id, out_pos=out_pos, in_user_id=in_user_id, in_name=in_name)
+    def make_sub_request(self, team_id: int, out_pos: str, in_user_id:int, in_name:str,
+                         deadline: Optional[float] = None) -> SubRequest:
+        req = SubRequest(team=team_id, out_pos=out_pos, in_user_id=in_user_id, in_name=in_name, deadline=deadline)
         self.sub_requests[in_user_id] = req
+        self.mark_dirty(('sub', in_user_id))
         return req
 
     def complete_sub(self, in_user_id:int, accept:bool) -> bool:
         req = self.sub_requests.pop(in_user_id, None)
         if not req:
             return False
+        self.mark_dirty(('sub', in_user_id))
         if not accept:
             return False
         # perform sub
         team = self.teams[req.team]
+        out = team.slots.get(req.out_pos)
+        if out is not None and self._slot_of.get(out.user_id) == (req.team, req.out_pos):
+            del self._slot_of[out.user_id]
         team.slots[req.out_pos] = PlayerSlot(user_id=req.in_user_id, name=req.in_name, position=req.out_pos)
+        self._slot_of[req.in_user_id] = (req.team, req.out_pos)
+        self.mark_dirty(('slot', req.team, req.out_pos))
         return True
 
     def set_possession(self, team_id:int, attacker_pos:str='pg'):
         self.current_possession_team = team_id
         self.current_attacker_pos = attacker_pos
+        self.mark_dirty(('game',))
 
     def get_slot(self, team_id:int, pos:str) -> Optional[PlayerSlot]:
         return self.teams[team_id].slots.get(pos)
 
+    def find_slot_of_user(self, user_id:int) -> Optional[Tuple[int, str]]:
+        """``(team_id, pos)`` of the user's seat, or None."""
+        return self._slot_of.get(user_id)
+
     def find_team_of_user(self, user_id:int) -> Optional[int]:
-        for tid, t in self.teams.items():
-            for p, s in t.slots.items():
-                if s and s.user_id == user_id:
-                    return tid
-        return None
+        loc = self._slot_of.get(user_id)
+        return loc[0] if loc else None
+
+    def team_captained_by(self, user_id:int) -> Optional[int]:
+        return self._captain_team.get(user_id)
+
+    def _set_afk(self, user_id:int, afk:bool):
+        loc = self._slot_of.get(user_id)
+        if loc:
+            self.teams[loc[0]].slots[loc[1]].afk = afk
+            self.mark_dirty(('slot', *loc))
 
     def mark_afk(self, user_id:int):
-        for t in self.teams.values():
-            for s in t.slots.values():
-                if s and s.user_id == user_id:
-                    s.afk = True
+        self._set_afk(user_id, True)
 
     def clear_afk(self, user_id:int):
-        for t in self.teams.values():
-            for s in t.slots.values():
-                if s and s.user_id == user_id:
-                    s.afk = False
+        self._set_afk(user_id, False)
+
+    def set_captain(self, team_id:int, user_id:int):
+        team = self.teams[team_id]
+        old, team.captain_id = team.captain_id, user_id
+        if self._captain_team.get(old) == team_id:
+            del self._captain_team[old]
+            # a subbed-across player can captain both teams; keep the other one indexed
+            for tid, t in self.teams.items():
+                if t.captain_id == old:
+                    self._captain_team[old] = tid
+        self._captain_team[user_id] = team_id
+        self.mark_dirty(('team', team_id))
 
     def opponent_team(self, team_id:int) -> int:
         return 1 if team_id == 2 else 2
 
     def increment_move(self):
         self.move_count += 1
+        self.mark_dirty(('game',))
         # halftime handling can be done outside
         if self.move_count >= MAX_MOVES:
             self.active = False
+            self.finished = True
+
+    def advance_moves(self, moves: int):
+        """Skip the move counter ahead without playing (the /test_advance command)."""
+        self.move_count += moves
+        self.mark_dirty(('game',))
+
+    def record_event(self, event: MoveEvent) -> MoveEvent:
+        """Number ``event`` as the next step of this game and apply it."""
+        event.seq = self.event_seq + 1
+        event.apply(self)
+        return event
+
+    def is_checkpoint(self, event: MoveEvent) -> bool:
+        """Whether ``event`` just reached halftime or the end of the game."""
+        return event.move and (self.is_halftime() or not self.active)
 
     def is_halftime(self):
         return self.move_count == HALFTIME
@@ -183,17 +437,23 @@ class GameState:
 
     def score_points(self, team_id:int, pts:int):
         self.teams[team_id].score += pts
+        self.mark_dirty(('team', team_id))
 
     def get_livescore(self):
+        """Score and lineups as a dict, rebuilt only when ``version`` has moved on.
+
+        The dict is shared between calls until then; treat it as read-only.
+        """
+        cached = self._livescore
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
         data = {'move': self.move_count, 'teams':{}}
         for tid, t in self.teams.items():
             # determine captain name if present in slots
             cap_name = None
-            if t.captain_id is not None:
-                for s in t.slots.values():
-                    if s and s.user_id == t.captain_id:
-                        cap_name = s.name
-                        break
+            loc = self._slot_of.get(t.captain_id)
+            if loc and loc[0] == tid:
+                cap_name = t.slots[loc[1]].name
             data['teams'][tid] = {
                 'name': t.name,
                 'score': t.score,
@@ -201,4 +461,154 @@ class GameState:
                 'captain_name': cap_name,
                 'slots': {p:(s.name if s else None) for p,s in t.slots.items()}
             }
+        self._livescore = (self.version, data)
         return data
+
+    def begin_turn(self, team_id: Optional[int] = None, pos: Optional[str] = None,
+                   now: Optional[float] = None) -> Optional[TurnPrompt]:
+        """Open a possession for ``team_id``/``pos`` (default: current possession).
+
+        With ``now`` (epoch seconds) the prompt gets a deadline TURN_TIMEOUT later.
+        """
+        team_id = team_id or self.current_possession_team
+        pos = pos or self.current_attacker_pos or 'pg'
+        slot = self.get_slot(team_id, pos) if team_id in self.teams else None
+        if not self.active or slot is None:
+            return None
+        self.turn = TurnPrompt(ATTACK, team_id, slot.user_id, pos=pos,
+                               deadline=None if now is None else now + TURN_TIMEOUT)
+        self.mark_dirty(('game',))
+        return self.turn
+
+    def play(self, prompt: TurnPrompt, value: Optional[str],
+             now: Optional[float] = None) -> Optional[Tuple[MoveEvent, Optional[TurnPrompt]]]:
+        """Answer ``prompt`` with ``value`` (None = timed out) and apply the result.
+
+        Returns the recorded event and the next prompt, or None if ``prompt``
+        is no longer the one this game is waiting on (already answered). With
+        ``now`` the next prompt gets a deadline TURN_TIMEOUT later.
+        """
+        if prompt is not self.turn:
+            return None
+        event, nxt = resolve(self, prompt, value)
+        if nxt is not None and now is not None:
+            nxt.deadline = now + TURN_TIMEOUT
+        event.turn = nxt
+        self.record_event(event)
+        return event, nxt
+
+    def play_turn(self, attack: Optional[str], guess: Optional[str] = None, save: Optional[str] = None,
+                  sg_choice: Optional[str] = None) -> List[MoveEvent]:
+        """Resolve a whole possession from its inputs; a None input is a timeout."""
+        inputs = {ATTACK: attack, GUESS: guess, SG_CHOICE: sg_choice, SAVE: save}
+        events = []
+        prompt = self.begin_turn()
+        while prompt is not None:
+            event, prompt = self.play(prompt, inputs[prompt.stage])
+            events.append(event)
+        return events
+
+
+def match_guess(att_choice: Optional[str], guess: str) -> bool:
+    """Whether ``guess`` catches ``att_choice``: a table lookup for the menu values."""
+    hit = GUESS_HITS.get((att_choice, guess))
+    if hit is None:
+        # free-form text outside the menus
+        return match_guess_rules(att_choice, guess)
+    return hit
+
+
+def shot_points(choice: str) -> int:
+    points = ACTION_POINTS.get(choice)
+    return points if points is not None else shot_points_rule(choice)
+
+
+def resolve(gs: GameState, prompt: TurnPrompt, value: Optional[str]) -> Tuple[MoveEvent, Optional[TurnPrompt]]:
+    """The rules of one possession step, without touching ``gs``.
+
+    Returns the event that records the step's effect and the prompt the
+    possession moves on to (None once the possession is over).
+    """
+    team = prompt.team
+    opp = gs.opponent_team(team)
+    ce = gs.get_slot(opp, 'ce')
+
+    if prompt.stage in (ATTACK, SG_CHOICE):
+        if value is None:
+            # attacker AFK: possession goes to the other side
+            return MoveEvent(kind='timeout', team=team, actor_id=prompt.actor_id, afk_user_id=prompt.actor_id,
+                             possession=(opp, 'pg')), None
+        if not ce:
+            return MoveEvent(kind=prompt.stage, team=team, actor_id=prompt.actor_id, choice=value,
+                             points=shot_points(value), move=True), None
+        event = MoveEvent(kind=prompt.stage, team=team, actor_id=prompt.actor_id, choice=value)
+        if prompt.stage == ATTACK:
+            return event, TurnPrompt(GUESS, team, ce.user_id, att_choice=value)
+        return event, TurnPrompt(SAVE, team, ce.user_id, att_choice=value)
+
+    choice = prompt.att_choice
+    kind = 'timeout' if value is None else prompt.stage
+    if prompt.stage == GUESS:
+        # a timed-out guess counts as incorrect
+        if value is not None and match_guess(choice, value):
+            return MoveEvent(kind=kind, team=team, actor_id=prompt.actor_id, choice=choice, guess=value,
+                             move=True, possession=(opp, 'ce')), None
+        if choice == Action.SIDEPASS:
+            sg = gs.get_slot(team, 'sg')
+            if not sg:
+                return MoveEvent(kind=kind, team=team, actor_id=prompt.actor_id, choice=choice, guess=value,
+                                 points=2, move=True), None
+            return (MoveEvent(kind=kind, team=team, actor_id=prompt.actor_id, choice=choice, guess=value),
+                    TurnPrompt(SG_CHOICE, team, sg.user_id))
+        event = MoveEvent(kind=kind, team=team, actor_id=prompt.actor_id, choice=choice, guess=value)
+        if ce:
+            return event, TurnPrompt(SAVE, team, ce.user_id, att_choice=choice)
+        # the centre left before the save: the shot goes in
+        event.points, event.move, event.possession = shot_points(choice), True, (opp, 'pg')
+        return event, None
+
+    # SAVE; a timed-out save attempt lets the shot in
+    if value is not None and match_guess(choice, value):
+        return MoveEvent(kind=kind, team=team, actor_id=prompt.actor_id, choice=choice, guess=value,
+                         move=True, possession=(opp, 'ce')), None
+    return MoveEvent(kind=kind, team=team, actor_id=prompt.actor_id, choice=choice, guess=value,
+                     points=shot_points(choice), move=True, possession=(opp, 'pg')), None
+
+
+# per-player career counters, in the order the stats tables store them
+CAREER_FIELDS = ('games', 'wins', 'points', 'steals', 'saves', 'pg_moves', 'sg_moves', 'ce_moves')
+_CAREER_INDEX = {name: i for i, name in enumerate(CAREER_FIELDS)}
+
+
+def career_deltas(gs: GameState, event: MoveEvent) -> Dict[int, List[int]]:
+    """How ``event``, just recorded on ``gs``, changes each player's career counters.
+
+    Returns ``{user_id: [delta per CAREER_FIELDS]}`` for the players it touches.
+    Points go to the player who took the shot, steals and saves to the
+    defender, and a game that just ended counts for everyone seated.
+    """
+    deltas: Dict[int, List[int]] = {}
+
+    def add(user_id: Optional[int], name: str, n: int = 1):
+        if user_id is not None:
+            deltas.setdefault(user_id, [0] * len(CAREER_FIELDS))[_CAREER_INDEX[name]] += n
+
+    pos = ACTION_POSITION.get(event.choice)
+    if event.kind in (ATTACK, SG_CHOICE) and pos:
+        add(event.actor_id, f'{pos}_moves')
+    if event.points and pos:
+        shooter = gs.get_slot(event.team, pos)
+        add(shooter.user_id if shooter else None, 'points', event.points)
+    if event.possession is not None and event.possession[1] == 'ce':
+        # the defence won the ball: a correct guess or a successful save
+        add(event.actor_id, 'steals' if event.kind == GUESS else 'saves')
+    if event.move and gs.finished and not gs.active:
+        scores = {tid: t.score for tid, t in gs.teams.items()}
+        for tid, team in gs.teams.items():
+            won = scores[tid] > scores[gs.opponent_team(tid)]
+            for slot in team.slots.values():
+                if slot is not None:
+                    add(slot.user_id, 'games')
+                    if won:
+                        add(slot.user_id, 'wins')
+    return deltas
@@ -0,0 +1,348 @@
+"""
+Load test for the real command handlers and views, without Discord.
+
+Each simulated guild plays through /newgame, /join (5 players at once),
+/start, /toss, both captains' /tosschoose, a /sub offer and its answer, and
+then possessions answered through the TurnView select callbacks, all on one
+event loop. The handlers are the ones in bot.py; only Interaction, its
+response/followup and the channel are stand-ins. Those record what the bot
+tried to do: answering an interaction twice, or not at all, counts as an
+error, like a raised exception.
+
+Reported per command and per view: calls, errors, ephemeral rejections,
+first responses later than Discord's 3 second window, and latency
+percentiles. The event loop's lag is sampled throughout. The exit status is
+1 if anything errored, so this can gate a deploy.
+
+Usage:
+    python loadtest.py [--guilds N] [--possessions N] [--backend memory|sqlite]
+                       [--api-latency MS] [--seed N] [--json PATH]
+
+Needs the bot's requirements (discord.py) installed, but no token or network.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import bot as app
+import persistence
+from benchutil import ms, percentile, temp_db
+from outbox import Outboxes
+
+# Discord fails an interaction that gets no response within this long
+RESPONSE_WINDOW = 3.0
+# seconds the harness waits for the bot to post the next prompt
+PROMPT_WAIT = 10.0
+
+
+class InteractionResponded(Exception):
+    """The handler answered an interaction that was already answered."""
+
+
+class FakeMember:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = self.display_name = f'player{user_id}'
+        self.mention = f'<@{user_id}>'
+
+
+class FakeMessage:
+    def __init__(self, channel: 'FakeChannel', content: Optional[str], view=None):
+        self.channel = channel
+        self.content = content
+        self.view = view
+
+    async def edit(self, content: Optional[str] = None, **kwargs):
+        await self.channel.api()
+        self.content = content
+        self.channel.edits += 1
+
+
+class FakeChannel:
+    """Collects what the bot posts; prompts that carry a view are queued for the players."""
+
+    def __init__(self, channel_id: int, api_latency: float):
+        self.id = channel_id
+        self.api_latency = api_latency
+        self.sends = 0
+        self.edits = 0
+        self.prompts: "asyncio.Queue" = asyncio.Queue()
+
+    async def api(self):
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        await self.api()
+        self.sends += 1
+        view = kwargs.get('view')
+        if view is not None:
+            self.prompts.put_nowait(view)
+        return FakeMessage(self, content, view)
+
+
+class FakeResponse:
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+        self._done = False
+        self.responded_at: Optional[float] = None
+        self.ephemeral = False
+        self.view = None
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, kwargs: dict):
+        if self._done:
+            raise InteractionResponded(self._interaction.name)
+        self._done = True
+        self.responded_at = time.perf_counter()
+        self.ephemeral = kwargs.get('ephemeral', False)
+        self.view = kwargs.get('view')
+        await self._interaction.channel.api()
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        await self._respond(kwargs)
+
+    async def edit_message(self, content: Optional[str] = None, **kwargs):
+        await self._respond(kwargs)
+
+    async def defer(self, **kwargs):
+        await self._respond(kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        if not self._interaction.response.is_done():
+            raise RuntimeError('followup sent before the interaction was answered')
+        return await self._interaction.channel.send(content, **kwargs)
+
+
+class FakeInteraction:
+    def __init__(self, name: str, user: FakeMember, guild_id: int, channel: FakeChannel):
+        self.name = name
+        self.user = user
+        self.guild_id = guild_id
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild = None
+        self.created = time.perf_counter()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+class Harness:
+    def __init__(self, cog: app.MyBot, api_latency: float):
+        self.cog = cog
+        self.api_latency = api_latency
+        self.channels: Dict[int, FakeChannel] = {}
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.rejected: Dict[str, int] = defaultdict(int)
+        self.late: Dict[str, int] = defaultdict(int)
+        self.first_error: Dict[str, str] = {}
+        self.lag: List[float] = []
+
+    def channel(self, guild_id: int) -> FakeChannel:
+        ch = self.channels.get(guild_id)
+        if ch is None:
+            ch = self.channels[guild_id] = FakeChannel(guild_id, self.api_latency)
+        return ch
+
+    def _error(self, name: str, reason: str):
+        self.errors[name] += 1
+        self.first_error.setdefault(name, reason)
+
+    async def _call(self, name: str, interaction: FakeInteraction, run) -> FakeInteraction:
+        start = time.perf_counter()
+        try:
+            await run()
+        except Exception as e:
+            self._error(name, repr(e))
+        self.latency[name].append(time.perf_counter() - start)
+        response = interaction.response
+        if not response.is_done():
+            self._error(name, 'interaction never answered')
+        elif response.responded_at - interaction.created > RESPONSE_WINDOW:
+            self.late[name] += 1
+        elif response.ephemeral:
+            self.rejected[name] += 1
+        return interaction
+
+    async def command(self, name: str, user: FakeMember, guild_id: int, **params) -> FakeInteraction:
+        """Invoke the ``MyBot`` slash command ``name`` as ``user``."""
+        interaction = FakeInteraction(name, user, guild_id, self.channel(guild_id))
+        cmd = getattr(self.cog, name)
+        return await self._call(name, interaction, lambda: cmd.callback(self.cog, interaction, **params))
+
+    async def select(self, view, user: FakeMember, guild_id: int, value: str) -> FakeInteraction:
+        """Pick ``value`` on ``view`` as ``user``, the way its select callback does."""
+        name = f'view:{type(view).__name__}'
+        interaction = FakeInteraction(name, user, guild_id, self.channel(guild_id))
+        if isinstance(view, app.TurnView):
+            run = lambda: view.resolve(interaction, value)
+        else:
+            run = lambda: app.in_guild_order(interaction, lambda: view.answer(interaction, value))
+        return await self._call(name, interaction, run)
+
+    async def watch_loop(self, interval: float = 0.01):
+        """Sample how late the loop wakes a sleeper, until cancelled."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag.append(max(0.0, time.perf_counter() - start - interval))
+
+
+def _options(view) -> List[str]:
+    for child in view.children:
+        options = getattr(child, 'options', None)
+        if options:
+            return [o.value for o in options]
+    return []
+
+
+async def run_guild(h: Harness, guild_id: int, possessions: int, rng: random.Random):
+    base = guild_id * 100
+    players = [FakeMember(base + i) for i in range(1, 7)]
+    host = players[0]
+    members = {p.id: p for p in players}
+
+    await h.command('newgame', host, guild_id)
+    await asyncio.gather(*(h.command('join', p, guild_id) for p in players[1:]))
+    await h.command('start', host, guild_id)
+    await h.command('toss', host, guild_id)
+    gs = app.games.get(guild_id)
+    if gs is None or not gs.active:
+        return
+    picks = ['high', 'low']
+    rng.shuffle(picks)
+    await asyncio.gather(*(h.command('tosschoose', members.get(t.captain_id, host), guild_id,
+                                     team=tid, choice=picks[tid - 1])
+                           for tid, t in gs.teams.items()))
+
+    # offer a bench player a seat; half the time they take it
+    bench_player = FakeMember(base + 7)
+    members[bench_player.id] = bench_player
+    captain = members.get(gs.teams[1].captain_id, host)
+    offer = await h.command('sub', captain, guild_id, team=1, position=rng.choice(['pg', 'sg', 'ce']),
+                            player=bench_player)
+    if offer.response.view is not None:
+        await h.select(offer.response.view, bench_player, guild_id, rng.choice(['accept', 'decline']))
+
+    channel = h.channel(guild_id)
+    for _ in range(possessions):
+        gs = app.games.get(guild_id)
+        if gs is None or not gs.active:
+            return
+
+        async def open_possession():
+            prompt = gs.begin_turn(now=time.time())
+            if prompt is None:
+                return None
+            view = app.TurnView.create_for(h.cog.storage, gs, prompt)
+            app.arm_turn(h.cog.storage, gs, view)
+            return view
+
+        # what the missing /ctn command would do, in the guild's order
+        view = await app.actors.run(guild_id, open_possession)
+        while view is not None:
+            actor = members.get(view.prompt.actor_id) or FakeMember(view.prompt.actor_id)
+            if rng.random() < 0.1:
+                # someone else grabs the menu first and is turned away
+                await h.select(view, host if actor is not host else players[1], guild_id,
+                               rng.choice(_options(view)))
+            await h.select(view, actor, guild_id, rng.choice(_options(view)))
+            if gs.turn is None:
+                break
+            try:
+                view = await asyncio.wait_for(channel.prompts.get(), PROMPT_WAIT)
+            except asyncio.TimeoutError:
+                h._error('prompt', 'next prompt was never posted')
+                break
+
+
+async def run(n_guilds: int, possessions: int, backend: str, api_latency: float, seed: int) -> Harness:
+    storage = persistence.make_backend(backend)
+    storage.init()
+    cog = app.MyBot(app.bot, storage)
+    h = Harness(cog, api_latency)
+    # deadline posts find their channel the way bot.get_channel would
+    app.bot.get_channel = lambda channel_id: h.channels.get(channel_id)
+    # Discord's pacing is not what is under test here
+    app.outboxes = Outboxes(rate=1000.0, burst=1000, linger=0.0)
+    app.deadlines.start()
+    watcher = asyncio.create_task(h.watch_loop())
+    rng = random.Random(seed)
+    try:
+        await asyncio.gather(*(run_guild(h, gid, possessions, random.Random(rng.random()))
+                               for gid in range(1, n_guilds + 1)))
+    finally:
+        watcher.cancel()
+        await app.deadlines.stop()
+        storage.flush().result()
+        storage.close()
+    return h
+
+
+def report(h: Harness, elapsed: float) -> Dict[str, Dict[str, Optional[float]]]:
+    rows = {}
+    for name in sorted(h.latency):
+        lat = sorted(h.latency[name])
+        rows[name] = {
+            'calls': len(lat),
+            'errors': h.errors.get(name, 0),
+            'rejected': h.rejected.get(name, 0),
+            'late': h.late.get(name, 0),
+            'p50_ms': ms(percentile(lat, 0.5)),
+            'p95_ms': ms(percentile(lat, 0.95)),
+            'p99_ms': ms(percentile(lat, 0.99)),
+            'max_ms': ms(lat[-1]),
+        }
+    lag = sorted(h.lag)
+    rows['loop lag'] = {'calls': len(lag), 'errors': h.errors.get('prompt', 0), 'rejected': None, 'late': None,
+                        'p50_ms': ms(percentile(lag, 0.5)), 'p95_ms': ms(percentile(lag, 0.95)),
+                        'p99_ms': ms(percentile(lag, 0.99)), 'max_ms': ms(lag[-1] if lag else None)}
+    cols = list(next(iter(rows.values())).keys())
+    print(f"{'':<24}" + ''.join(f'{c:>10}' for c in cols))
+    for name, row in rows.items():
+        print(f'{name:<24}' + ''.join(f'{row[c]:>10.2f}' if isinstance(row[c], float)
+                                      else f'{"-" if row[c] is None else row[c]:>10}' for c in cols))
+    total = sum(len(v) for v in h.latency.values())
+    print(f'\n{total} interactions in {elapsed:.2f}s ({total / elapsed:.0f}/s); '
+          f'outbox saved {app.outboxes.stats.messages_saved} messages')
+    for name, reason in sorted(h.first_error.items()):
+        print(f'first error in {name}: {reason}')
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Basketball Blitz handler load test')
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--possessions', type=int, default=6)
+    parser.add_argument('--backend', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--api-latency', type=float, default=0.0,
+                        help='simulated milliseconds per Discord API call')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with temp_db():
+        h = asyncio.run(run(args.guilds, args.possessions, args.backend, args.api_latency / 1000, args.seed))
+    rows = report(h, time.perf_counter() - start)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': rows}, f, indent=2)
+    sys.exit(1 if sum(h.errors.values()) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Prometheus metrics, served as text from a local HTTP ``/metrics`` endpoint.
+
+Recording is a lock and a few additions per observation; nothing is
+formatted until a scrape arrives. Gauges (game counts, DB size, queue
+lengths), and counters whose totals other objects already keep, are
+callbacks evaluated only at scrape time, so they cost nothing in
+between. The endpoint is off unless METRICS_PORT is set.
+
+Only the standard library is used, so the bot has no extra dependency.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the endpoint; bind to localhost unless told otherwise
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# seconds; Discord wants a response within 3
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Labels, extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _num(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_label_text(self.labelnames, labels)} {_num(value)}'
+
+
+class Histogram:
+    """Observations counted into cumulative ``le`` buckets, per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                running += n
+                le = _label_text(self.labelnames, labels, f'le="{_num(bound)}"')
+                yield f'{self.name}_bucket{le} {running}'
+            text = _label_text(self.labelnames, labels)
+            yield f'{self.name}_sum{text} {_num(total)}'
+            yield f'{self.name}_count{text} {running}'
+
+
+GaugeValue = Union[None, float, Dict[Labels, float]]
+
+
+class Gauge:
+    """A value read from ``fn`` at scrape time.
+
+    ``fn`` returns a number, a dict of label values -> number, or None to
+    leave the gauge out of this scrape.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, fn: Callable[[], GaugeValue], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterator[str]:
+        value = self.fn()
+        if value is None:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, v in value.items():
+            yield f'{self.name}{_label_text(self.labelnames, labels)} {_num(v)}'
+
+
+class CounterCallback(Gauge):
+    """A counter whose running total is kept elsewhere and read from ``fn`` at scrape time."""
+
+    kind = 'counter'
+
+
+Metric = Union[Counter, Histogram, Gauge]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], GaugeValue], labelnames: Sequence[str] = ()) -> Gauge:
+        """Register (or replace) a scrape-time gauge."""
+        metric = self._metrics[name] = Gauge(name, help, fn, labelnames)
+        return metric
+
+    def counter_callback(self, name: str, help: str, fn: Callable[[], GaugeValue],
+                         labelnames: Sequence[str] = ()) -> CounterCallback:
+        """Register (or replace) a counter read from ``fn``, which must never go down."""
+        metric = self._metrics[name] = CounterCallback(name, help, fn, labelnames)
+        return metric
+
+    def render(self) -> str:
+        """The registry in Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # one broken gauge must not take the whole scrape down
+                logger.exception('collecting %s failed', metric.name)
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# recorded by bot.py and persistence.py
+COMMAND_SECONDS = registry.histogram(
+    'bb_command_seconds', 'Slash command handling time, queueing on the guild actor included.', ['command'])
+COMMAND_ERRORS = registry.counter(
+    'bb_command_errors_total', 'Slash commands whose handler raised.', ['command'])
+DB_SECONDS = registry.histogram(
+    'bb_db_seconds', 'Time spent in storage operations.', ['op'])
+VIEW_TIMEOUTS = registry.counter(
+    'bb_view_timeouts_total', 'Prompts and sub requests that ran out of time, by view class.', ['view'])
+
+
+def timed_command(func):
+    """Record the latency and failures of an ``app_commands`` handler under its name."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            COMMAND_ERRORS.inc(name)
+            raise
+        finally:
+            COMMAND_SECONDS.observe(time.perf_counter() - start, name)
+    return wrapper
+
+
+def file_size(*paths: str) -> Optional[float]:
+    """Combined size in bytes of the paths that exist, or None if none do."""
+    total, found = 0, False
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+            found = True
+        except OSError:
+            pass
+    return total if found else None
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5)
+        # skip the headers; nothing in them matters here
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request.split()
+        if len(parts) >= 2 and parts[0] == b'GET' and parts[1].split(b'?')[0] == b'/metrics':
+            status, ctype, body = '200 OK', 'text/plain; version=0.0.4; charset=utf-8', registry.render().encode()
+        else:
+            status, ctype, body = '404 Not Found', 'text/plain; charset=utf-8', b'not found\n'
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n'
+                     f'Connection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[asyncio.AbstractServer]:
+    """Serve ``/metrics`` on the running loop; returns None when ``port`` is 0."""
+    if not port:
+        return None
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info('Serving metrics on http://%s:%d/metrics', host, port)
+    return server
@@ -0,0 +1,215 @@
+"""
+Per-channel outbound message pipeline.
+
+Play-by-play lines are not sent as messages of their own. They ride along
+with the next prompt that goes out, or are written into one rolling
+scoreboard message per channel that is edited in place; lines arriving within
+OUTBOX_LINGER seconds of each other share a single edit. Prompts (messages
+that carry a view and wait on a player) jump ahead of pending lines. Every
+send or edit takes a token from a per-channel bucket sized below Discord's
+channel rate limit, so a burst waits here instead of turning into 429s.
+
+Only ``channel.send(content, view=...)`` and ``message.edit(content=...)``
+are used, so anything with those coroutines can stand in for a channel.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# sends/edits per second per channel, and how many may go out back to back
+OUTBOX_RATE = float(os.getenv('OUTBOX_RATE', '1.0'))
+OUTBOX_BURST = int(os.getenv('OUTBOX_BURST', '4'))
+# how long a play-by-play line waits for company before the board is edited
+OUTBOX_LINGER = float(os.getenv('OUTBOX_LINGER', '0.5'))
+# play-by-play lines kept on the scoreboard message
+BOARD_LINES = 10
+MESSAGE_LIMIT = 2000
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate: float = OUTBOX_RATE, burst: int = OUTBOX_BURST,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self._stamp = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    async def take(self) -> float:
+        """Wait for a token and spend it; returns the seconds spent waiting."""
+        self._refill()
+        waited = 0.0
+        if self.tokens < 1:
+            waited = (1 - self.tokens) / self.rate
+            await asyncio.sleep(waited)
+            self._refill()
+        self.tokens -= 1
+        return waited
+
+
+class OutboxStats:
+    """Counters shared by every channel's outbox."""
+
+    def __init__(self):
+        self.lines = 0  # play-by-play lines posted
+        self.prompts = 0  # prompts posted
+        self.sends = 0  # new messages actually sent
+        self.edits = 0  # scoreboard edits
+        self.throttled_seconds = 0.0  # time spent waiting on the token buckets
+        self.errors = 0
+
+    @property
+    def messages_saved(self) -> int:
+        """Posts that did not need a message of their own."""
+        return self.lines + self.prompts - self.sends
+
+
+class ChannelOutbox:
+    """The outbound queue of one channel; a worker task runs only while it has work."""
+
+    def __init__(self, channel, stats: OutboxStats, rate: float = OUTBOX_RATE,
+                 burst: int = OUTBOX_BURST, linger: float = OUTBOX_LINGER):
+        self.channel = channel
+        self.stats = stats
+        self.linger = linger
+        self.bucket = TokenBucket(rate, burst)
+        self._prompts: Deque[Tuple[str, object, asyncio.Future]] = deque()
+        self._lines: List[str] = []
+        self._header: Optional[str] = None
+        self._board = None  # the rolling scoreboard message
+        self._board_lines: Deque[str] = deque(maxlen=BOARD_LINES)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def line(self, text: str, header: Optional[str] = None):
+        """Queue a play-by-play line; ``header`` replaces the scoreboard's heading."""
+        self.stats.lines += 1
+        self._lines.append(text)
+        if header is not None:
+            self._header = header
+        self._kick()
+
+    def prompt(self, text: str, view=None) -> asyncio.Future:
+        """Queue a message that waits on a player; it goes out before pending lines.
+
+        The future resolves to the sent message.
+        """
+        self.stats.prompts += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._prompts.append((text, view, fut))
+        self._wake.set()
+        self._kick()
+        return fut
+
+    def _kick(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while self._prompts or self._lines:
+                if not self._prompts:
+                    # give more lines (or a prompt to carry them) a moment to arrive
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.linger)
+                    except asyncio.TimeoutError:
+                        pass
+                if self._prompts:
+                    await self._send_prompt(*self._prompts.popleft())
+                elif self._lines:
+                    await self._update_board()
+        finally:
+            self._task = None
+
+    async def _take(self):
+        self.stats.throttled_seconds += await self.bucket.take()
+
+    async def _send_prompt(self, text: str, view, fut: asyncio.Future):
+        # pending lines lead into the prompt, in one message
+        lines, self._lines = self._lines, []
+        content = '\n'.join(lines + [text])
+        if len(content) > MESSAGE_LIMIT:
+            self._lines, content = lines, text
+        else:
+            self._board_lines.extend(lines)
+        await self._take()
+        try:
+            message = await self.channel.send(content, view=view)
+        except Exception as e:
+            self.stats.errors += 1
+            logger.exception('Sending prompt failed')
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        self.stats.sends += 1
+        if not fut.done():
+            fut.set_result(message)
+
+    def _render(self) -> str:
+        lines = list(self._board_lines)
+        head = [self._header] if self._header else []
+        content = '\n'.join(head + lines)
+        while len(content) > MESSAGE_LIMIT and lines:
+            lines.pop(0)
+            content = '\n'.join(head + lines)
+        return content[:MESSAGE_LIMIT]
+
+    async def _update_board(self):
+        lines, self._lines = self._lines, []
+        self._board_lines.extend(lines)
+        content = self._render()
+        await self._take()
+        if self._board is not None:
+            try:
+                await self._board.edit(content=content)
+                self.stats.edits += 1
+                return
+            except Exception:
+                # deleted or otherwise gone: start a new board
+                self.stats.errors += 1
+                logger.warning('Scoreboard edit failed; sending a new one', exc_info=True)
+                self._board = None
+                await self._take()
+        try:
+            self._board = await self.channel.send(content)
+            self.stats.sends += 1
+        except Exception:
+            self.stats.errors += 1
+            logger.exception('Sending scoreboard failed')
+
+
+class Outboxes:
+    """One ChannelOutbox per channel, created on first use."""
+
+    def __init__(self, rate: float = OUTBOX_RATE, burst: int = OUTBOX_BURST, linger: float = OUTBOX_LINGER):
+        self.rate = rate
+        self.burst = burst
+        self.linger = linger
+        self.stats = OutboxStats()
+        self._boxes: Dict[int, ChannelOutbox] = {}
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def for_channel(self, channel) -> ChannelOutbox:
+        box = self._boxes.get(channel.id)
+        if box is None:
+            box = self._boxes[channel.id] = ChannelOutbox(channel, self.stats, self.rate, self.burst, self.linger)
+        return box
+
+    def discard(self, channel_id: Optional[int]):
+        """Forget a channel's outbox (queued posts still go out)."""
+        self._boxes.pop(channel_id, None)
@@ -1,16 +1,238 @@
+import os
+import time
 import sqlite3
 import json
-from typing import Dict, Optional, List
-from game_core import GameState, Team, PlayerSlot
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Callable, Dict, Iterator, Optional, List, Protocol, Tuple
+import codec
+import metrics
+from game_core import GameState, Team, PlayerSlot, SubRequest, MoveEvent, TurnPrompt, CAREER_FIELDS, career_deltas
 
 DB_PATH = 'basketball_blitz.db'
 
+# Connection pool tuning (see OPS.md "Performance Tuning")
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '10000'))
+DB_BUSY_TIMEOUT = 5.0
+STATEMENT_CACHE_SIZE = 128
 
-def init_db():
+# 'rows' keeps games normalized across games/teams/player_slots/sub_requests;
+# 'blob' stores each game as one codec-encoded row in game_blobs.
+STORAGE_MODE = os.getenv('STORAGE_MODE', 'rows')
+
+# Retention: finished games move to games_archive after this long
+ARCHIVE_AFTER_SECONDS = int(os.getenv('ARCHIVE_AFTER_SECONDS', '3600'))
+ARCHIVE_BATCH_SIZE = 200
+
+# pause before the writer retries a batch that failed to commit
+WRITE_RETRY_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+# Statements are kept as module constants so every call hands sqlite3 the
+# exact same text and hits the per-connection prepared-statement cache.
+# An upsert rather than INSERT OR REPLACE, so created_at survives updates
+_SQL_UPSERT_GAME = '''
+    INSERT INTO games 
+    (guild_id, host_id, active, move_count, current_possession_team, current_attacker_pos, toss_active, toss_choices,
+     event_seq, finished, channel_id, turn)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(guild_id) DO UPDATE SET
+        host_id=excluded.host_id, active=excluded.active, move_count=excluded.move_count,
+        current_possession_team=excluded.current_possession_team,
+        current_attacker_pos=excluded.current_attacker_pos, toss_active=excluded.toss_active,
+        toss_choices=excluded.toss_choices, event_seq=excluded.event_seq, finished=excluded.finished,
+        channel_id=excluded.channel_id, turn=excluded.turn, updated_at=CURRENT_TIMESTAMP
+'''
+_SQL_UPSERT_TEAM = '''
+    INSERT OR REPLACE INTO teams
+    (guild_id, team_id, name, captain_id, score)
+    VALUES (?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_SLOT = '''
+    INSERT OR REPLACE INTO player_slots
+    (guild_id, team_id, position, user_id, name, afk)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+_SQL_DELETE_SLOT = 'DELETE FROM player_slots WHERE guild_id=? AND team_id=? AND position=?'
+_SQL_DELETE_SUBS = 'DELETE FROM sub_requests WHERE guild_id=?'
+_SQL_DELETE_SUB = 'DELETE FROM sub_requests WHERE guild_id=? AND in_user_id=?'
+_SQL_INSERT_SUB = '''
+    INSERT INTO sub_requests
+    (guild_id, team_id, out_pos, in_user_id, in_name, deadline)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+_SQL_SELECT_GAME = '''
+    SELECT guild_id, host_id, active, move_count, current_possession_team,
+           current_attacker_pos, toss_active, toss_choices, event_seq, finished, channel_id, turn
+    FROM games WHERE guild_id=?
+'''
+_SQL_SELECT_TEAMS = 'SELECT team_id, name, captain_id, score FROM teams WHERE guild_id=?'
+_SQL_SELECT_SLOTS = 'SELECT team_id, position, user_id, name, afk FROM player_slots WHERE guild_id=?'
+_SQL_SELECT_SUBS = 'SELECT team_id, out_pos, in_user_id, in_name, deadline FROM sub_requests WHERE guild_id=?'
+_SQL_INSERT_EVENT = '''
+    INSERT OR REPLACE INTO move_events
+    (guild_id, seq, kind, team_id, actor_id, choice, guess, points, possession_team, possession_pos,
+     used_move, afk_user_id, turn)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_SELECT_EVENTS = '''
+    SELECT seq, kind, team_id, actor_id, choice, guess, points, possession_team, possession_pos,
+           used_move, afk_user_id, turn
+    FROM move_events WHERE guild_id=? AND seq>? ORDER BY seq
+'''
+_SQL_COMPACT_EVENTS = 'DELETE FROM move_events WHERE guild_id=? AND seq<=?'
+_SQL_UPSERT_BLOB = '''
+    INSERT INTO game_blobs (guild_id, active, finished, event_seq, data)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(guild_id) DO UPDATE SET
+        active=excluded.active, finished=excluded.finished, event_seq=excluded.event_seq,
+        data=excluded.data, updated_at=CURRENT_TIMESTAMP
+'''
+_SQL_SELECT_BLOB = 'SELECT data FROM game_blobs WHERE guild_id=?'
+# career counters are added to, never overwritten: each row is one move's deltas
+_CAREER_SET = ', '.join(f'{f}={f}+excluded.{f}' for f in CAREER_FIELDS)
+_SQL_ADD_CAREER = f'''
+    INSERT INTO career_stats (user_id, {', '.join(CAREER_FIELDS)})
+    VALUES ({', '.join('?' * (len(CAREER_FIELDS) + 1))})
+    ON CONFLICT(user_id) DO UPDATE SET {_CAREER_SET}, updated_at=CURRENT_TIMESTAMP
+'''
+_SQL_ADD_GUILD_CAREER = f'''
+    INSERT INTO guild_career_stats (guild_id, user_id, {', '.join(CAREER_FIELDS)})
+    VALUES ({', '.join('?' * (len(CAREER_FIELDS) + 2))})
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET {_CAREER_SET}, updated_at=CURRENT_TIMESTAMP
+'''
+# what /leaderboard can rank by; each has an index on both stats tables
+LEADERBOARD_ORDERS = ('points', 'wins')
+_SQL_UPSERT_PRACTICE = '''
+    INSERT INTO practice_stats (user_id, score, shots, made)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        score=excluded.score, shots=excluded.shots, made=excluded.made, updated_at=CURRENT_TIMESTAMP
+'''
+
+
+class ConnectionPool:
+    """A fixed-size pool of long-lived SQLite connections.
+
+    Connections are opened lazily in WAL mode with the tuned ``synchronous`` and
+    ``cache_size`` pragmas, and stay open so schema parsing and statement
+    preparation are paid once per connection instead of once per call.
+    """
+
+    def __init__(self, db_path: str, pool_size: int = DB_POOL_SIZE,
+                 synchronous: str = DB_SYNCHRONOUS, cache_size: int = DB_CACHE_SIZE):
+        if pool_size < 1:
+            raise ValueError('pool_size must be at least 1')
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT,
+                               check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('connection pool is closed')
+            if len(self._all) < self.pool_size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+        # pool exhausted: wait for another thread to hand one back
+        return self._idle.get()
+
+    def release(self, conn: sqlite3.Connection):
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; commit on success, roll back on error."""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            conns, self._all = self._all, []
+        for conn in conns:
+            conn.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the shared pool for ``DB_PATH``, reopening it if the path changed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.db_path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+
+def configure_pool(pool_size: int = DB_POOL_SIZE, synchronous: str = DB_SYNCHRONOUS,
+                   cache_size: int = DB_CACHE_SIZE) -> ConnectionPool:
+    """Replace the shared pool with one using the given settings."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(DB_PATH, pool_size, synchronous, cache_size)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def init_db(pool: Optional[ConnectionPool] = None):
     """Initialize database schema."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
+    with (pool or get_pool()).connection() as conn:
+        _create_schema(conn.cursor())
+
+
+def _create_schema(c: sqlite3.Cursor):
+    """Create all tables (idempotent)."""
     # Games table
     c.execute('''
         CREATE TABLE IF NOT EXISTS games (
@@ -22,6 +244,10 @@ def init_db():
             current_attacker_pos TEXT,
             toss_active INTEGER,
             toss_choices TEXT,
+            event_seq INTEGER DEFAULT 0,
+            finished INTEGER DEFAULT 0,
+            channel_id INTEGER,
+            turn TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
@@ -65,138 +291,1175 @@ def init_db():
             out_pos TEXT,
             in_user_id INTEGER,
             in_name TEXT,
+            deadline REAL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (guild_id) REFERENCES games(guild_id)
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    # Move log: one row per resolved step since the last checkpoint snapshot
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS move_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            seq INTEGER,
+            kind TEXT,
+            team_id INTEGER,
+            actor_id INTEGER,
+            choice TEXT,
+            guess TEXT,
+            points INTEGER,
+            possession_team INTEGER,
+            possession_pos TEXT,
+            used_move INTEGER,
+            afk_user_id INTEGER,
+            turn TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (guild_id) REFERENCES games(guild_id),
+            UNIQUE(guild_id, seq)
+        )
+    ''')
+    
+    # Single-blob storage mode: the whole game as one codec-encoded value
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS game_blobs (
+            guild_id INTEGER PRIMARY KEY,
+            active INTEGER,
+            finished INTEGER,
+            event_seq INTEGER,
+            data BLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Archive: one compact row per finished game
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS games_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            host_id INTEGER,
+            move_count INTEGER,
+            team1_name TEXT,
+            team1_score INTEGER,
+            team2_name TEXT,
+            team2_score INTEGER,
+            winner INTEGER,
+            roster TEXT,
+            created_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Career aggregates, kept up to date move by move (see career_deltas);
+    # leaderboards read these instead of scanning match history
+    counters = ',\n'.join(f'            {f} INTEGER DEFAULT 0' for f in CAREER_FIELDS)
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS career_stats (
+            user_id INTEGER PRIMARY KEY,
+{counters},
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS guild_career_stats (
+            guild_id INTEGER,
+            user_id INTEGER,
+{counters},
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    ''')
+    
+    # Shooting practice (game.py): running totals per user
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS practice_stats (
+            user_id INTEGER PRIMARY KEY,
+            score INTEGER,
+            shots INTEGER,
+            made INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    _migrate(c)
+    
+    # Indexes for list_games/restore and the archival sweep
+    c.execute('CREATE INDEX IF NOT EXISTS idx_games_active ON games(active)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_games_created_at ON games(created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_games_archive_guild ON games_archive(guild_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_game_blobs_active ON game_blobs(active)')
+    # Leaderboards: one index per ranking, global and per guild
+    for order in LEADERBOARD_ORDERS:
+        c.execute(f'CREATE INDEX IF NOT EXISTS idx_career_{order} ON career_stats({order} DESC, user_id)')
+        c.execute(f'CREATE INDEX IF NOT EXISTS idx_guild_career_{order} '
+                  f'ON guild_career_stats(guild_id, {order} DESC, user_id)')
+
 
+def _migrate(c: sqlite3.Cursor):
+    """Add columns introduced after a database was first created."""
+    columns = {row[1] for row in c.execute('PRAGMA table_info(games)')}
+    if 'event_seq' not in columns:
+        # seq of the last move event folded into the stored snapshot
+        c.execute('ALTER TABLE games ADD COLUMN event_seq INTEGER DEFAULT 0')
+    if 'finished' not in columns:
+        c.execute('ALTER TABLE games ADD COLUMN finished INTEGER DEFAULT 0')
+    if 'turn' not in columns:
+        # the pending move prompt and its deadline, see _turn_to_json
+        c.execute('ALTER TABLE games ADD COLUMN channel_id INTEGER')
+        c.execute('ALTER TABLE games ADD COLUMN turn TEXT')
+    if 'turn' not in {row[1] for row in c.execute('PRAGMA table_info(move_events)')}:
+        c.execute('ALTER TABLE move_events ADD COLUMN turn TEXT')
+    if 'deadline' not in {row[1] for row in c.execute('PRAGMA table_info(sub_requests)')}:
+        c.execute('ALTER TABLE sub_requests ADD COLUMN deadline REAL')
 
-def save_game(guild_id: int, gs: GameState):
-    """Save game state to database."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+
+def _snapshot(guild_id: int, gs: GameState, full: bool = False) -> dict:
+    """Capture the rows of ``gs`` that changed since its last flush as plain tuples.
+
+    Consumes the state's dirty set (see ``GameState.take_dirty``); ``full``
+    forces every row to be captured. The snapshot shares nothing mutable with
+    ``gs``, so it can be handed to the writer thread while the game keeps
+    changing on the event loop.
+    """
+    dirty = gs.take_dirty()
+    if STORAGE_MODE == 'blob':
+        # a blob is always rewritten whole
+        return {'blob': codec.encode(gs), 'active': 1 if gs.active else 0,
+                'finished': 1 if gs.finished else 0, 'seq': gs.event_seq, 'compact': False, 'owner': gs}
+    if full:
+        dirty = None
+    snap = {'full': dirty is None, 'game': None, 'teams': {}, 'slots': {}, 'subs': {},
+            'seq': gs.event_seq, 'compact': False, 'owner': gs}
+    if dirty is None or ('game',) in dirty:
+        snap['game'] = (
+            guild_id,
+            gs.host_id,
+            1 if gs.active else 0,
+            gs.move_count,
+            gs.current_possession_team,
+            gs.current_attacker_pos,
+            1 if gs.toss_active else 0,
+            json.dumps(gs.toss_choices),
+            gs.event_seq,
+            1 if gs.finished else 0,
+            gs.channel_id,
+            _turn_to_json(gs.turn)
+        )
+    for team_id, team in gs.teams.items():
+        if dirty is None or ('team', team_id) in dirty:
+            snap['teams'][team_id] = (guild_id, team_id, team.name, team.captain_id, team.score)
+        for pos, slot in team.slots.items():
+            if dirty is None or ('slot', team_id, pos) in dirty:
+                snap['slots'][(team_id, pos)] = (slot.user_id, slot.name, 1 if slot.afk else 0) if slot else None
+    if dirty is None:
+        keys = gs.sub_requests.keys()
+    else:
+        keys = [k[1] for k in dirty if k[0] == 'sub']
+    for in_user_id in keys:
+        req = gs.sub_requests.get(in_user_id)
+        snap['subs'][in_user_id] = (guild_id, req.team, req.out_pos, req.in_user_id, req.in_name,
+                                   req.deadline) if req else None
+    return snap
+
+
+def _merge_snapshots(old: dict, new: dict) -> dict:
+    """Coalesce two queued snapshots of the same guild; ``new`` wins row by row."""
+    if 'blob' in new or new['full']:
+        return {**new, 'compact': old['compact'] or new['compact']}
+    merged = {
+        'full': old['full'],
+        'game': new['game'] or old['game'],
+        'seq': new['seq'],
+        'compact': old['compact'] or new['compact'],
+        'owner': new['owner'],
+    }
+    for key in ('teams', 'slots', 'subs'):
+        merged[key] = {**old[key], **new[key]}
+    return merged
+
+
+def _write_snapshot(c: sqlite3.Cursor, guild_id: int, snap: dict):
+    """Write a snapshot taken by ``_snapshot`` using cursor ``c`` (no commit)."""
+    if 'blob' in snap:
+        c.execute(_SQL_UPSERT_BLOB, (guild_id, snap['active'], snap['finished'], snap['seq'], snap['blob']))
+        if snap['compact']:
+            c.execute(_SQL_COMPACT_EVENTS, (guild_id, snap['seq']))
+        return
     
     # Save game
-    c.execute('''
-        INSERT OR REPLACE INTO games 
-        (guild_id, host_id, active, move_count, current_possession_team, current_attacker_pos, toss_active, toss_choices)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        guild_id,
-        gs.host_id,
-        1 if gs.active else 0,
-        gs.move_count,
-        gs.current_possession_team,
-        gs.current_attacker_pos,
-        1 if gs.toss_active else 0,
-        json.dumps(gs.toss_choices)
-    ))
+    if snap['game']:
+        c.execute(_SQL_UPSERT_GAME, snap['game'])
     
     # Save teams and slots
-    for team_id, team in gs.teams.items():
-        c.execute('''
-            INSERT OR REPLACE INTO teams
-            (guild_id, team_id, name, captain_id, score)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (guild_id, team_id, team.name, team.captain_id, team.score))
-        
-        for pos, slot in team.slots.items():
-            if slot:
-                c.execute('''
-                    INSERT OR REPLACE INTO player_slots
-                    (guild_id, team_id, position, user_id, name, afk)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (guild_id, team_id, pos, slot.user_id, slot.name, 1 if slot.afk else 0))
-            else:
-                # Clear empty slot
-                c.execute('DELETE FROM player_slots WHERE guild_id=? AND team_id=? AND position=?',
-                         (guild_id, team_id, pos))
+    for row in snap['teams'].values():
+        c.execute(_SQL_UPSERT_TEAM, row)
+    
+    for (team_id, pos), slot in snap['slots'].items():
+        if slot:
+            c.execute(_SQL_UPSERT_SLOT, (guild_id, team_id, pos) + slot)
+        else:
+            # Clear empty slot
+            c.execute(_SQL_DELETE_SLOT, (guild_id, team_id, pos))
     
     # Save sub requests
-    c.execute('DELETE FROM sub_requests WHERE guild_id=?', (guild_id,))
-    for in_user_id, req in gs.sub_requests.items():
-        c.execute('''
-            INSERT INTO sub_requests
-            (guild_id, team_id, out_pos, in_user_id, in_name)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (guild_id, req.team, req.out_pos, req.in_user_id, req.in_name))
+    if snap['full']:
+        c.execute(_SQL_DELETE_SUBS, (guild_id,))
+    for in_user_id, row in snap['subs'].items():
+        if not snap['full']:
+            c.execute(_SQL_DELETE_SUB, (guild_id, in_user_id))
+        if row:
+            c.execute(_SQL_INSERT_SUB, row)
     
-    conn.commit()
-    conn.close()
+    # Drop log entries the snapshot now covers
+    if snap['compact']:
+        c.execute(_SQL_COMPACT_EVENTS, (guild_id, snap['seq']))
+
+
+def _turn_to_json(turn: Optional[TurnPrompt]) -> Optional[str]:
+    if turn is None:
+        return None
+    return json.dumps([turn.stage, turn.team, turn.actor_id, turn.att_choice, turn.pos, turn.deadline])
+
+
+def _turn_from_json(data: Optional[str]) -> Optional[TurnPrompt]:
+    if not data:
+        return None
+    stage, team, actor_id, att_choice, pos, deadline = json.loads(data)
+    return TurnPrompt(stage, team, actor_id, att_choice=att_choice, pos=pos, deadline=deadline)
+
+
+def _event_row(guild_id: int, ev: MoveEvent) -> tuple:
+    team, pos = ev.possession if ev.possession else (None, None)
+    return (guild_id, ev.seq, ev.kind, ev.team, ev.actor_id, ev.choice, ev.guess, ev.points,
+            team, pos, 1 if ev.move else 0, ev.afk_user_id, _turn_to_json(ev.turn))
+
+
+def _event_from_row(seq: int, kind: str, team_id: int, actor_id: Optional[int], choice: Optional[str],
+                    guess: Optional[str], points: int, possession_team: Optional[int],
+                    possession_pos: Optional[str], used_move: int, afk_user_id: Optional[int],
+                    turn: Optional[str] = None) -> MoveEvent:
+    return MoveEvent(
+        kind=kind,
+        team=team_id,
+        actor_id=actor_id,
+        choice=choice,
+        guess=guess,
+        points=points,
+        possession=(possession_team, possession_pos) if possession_team is not None else None,
+        move=bool(used_move),
+        afk_user_id=afk_user_id,
+        seq=seq,
+        turn=_turn_from_json(turn)
+    )
+
+
+def _delete_rows(c: sqlite3.Cursor, guild_id: int, archive: bool = True):
+    """Delete a guild's live rows.
+
+    A stored game that is finished is moved to ``games_archive`` first, in the
+    same transaction, so starting a new game never drops the last one's
+    result; pass ``archive=False`` if the caller archived it already.
+    """
+    if archive:
+        if STORAGE_MODE == 'blob':
+            finished = _finished_blobs(c, None, 1, guild_id)
+        else:
+            finished = _finished_rows(c, None, 1, guild_id)
+        _archive_games(c, finished)
+    c.execute('DELETE FROM games WHERE guild_id=?', (guild_id,))
+    c.execute('DELETE FROM teams WHERE guild_id=?', (guild_id,))
+    c.execute('DELETE FROM player_slots WHERE guild_id=?', (guild_id,))
+    c.execute('DELETE FROM sub_requests WHERE guild_id=?', (guild_id,))
+    c.execute('DELETE FROM move_events WHERE guild_id=?', (guild_id,))
+    c.execute('DELETE FROM game_blobs WHERE guild_id=?', (guild_id,))
+
+
+def save_game(guild_id: int, gs: GameState, pool: Optional[ConnectionPool] = None):
+    """Save game state to database.
+
+    Only rows the state marked dirty since its last save are written, all in
+    one transaction.
+    """
+    snap = _snapshot(guild_id, gs)
+    try:
+        with metrics.DB_SECONDS.time('save_game'), (pool or get_pool()).connection() as conn:
+            _write_snapshot(conn.cursor(), guild_id, snap)
+    except Exception:
+        # the rows were not written; make sure the next save retries them
+        gs.mark_dirty()
+        raise
 
 
-def load_game(guild_id: int) -> Optional[GameState]:
-    """Load game state from database."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+def load_game(guild_id: int, pool: Optional[ConnectionPool] = None) -> Optional[GameState]:
+    """Load game state from database.
+
+    The stored snapshot is brought up to date with the move events logged
+    after it, see ``replay_game``.
+    """
+    with metrics.DB_SECONDS.time('load_game'):
+        return replay_game(guild_id, pool)
+
+
+def replay_game(guild_id: int, pool: Optional[ConnectionPool] = None) -> Optional[GameState]:
+    """Rebuild a game from its last snapshot plus the move events recorded since."""
+    with (pool or get_pool()).connection() as conn:
+        c = conn.cursor()
+        gs = _read_game(c, guild_id)
+        if gs is None:
+            return None
+        c.execute(_SQL_SELECT_EVENTS, (guild_id, gs.event_seq))
+        for row in c.fetchall():
+            _event_from_row(*row).apply(gs)
+    return gs
+
+
+def _read_game(c: sqlite3.Cursor, guild_id: int) -> Optional[GameState]:
+    if STORAGE_MODE == 'blob':
+        c.execute(_SQL_SELECT_BLOB, (guild_id,))
+        row = c.fetchone()
+        if not row:
+            return None
+        gs = codec.decode(row[0])
+        gs.clear_dirty()
+        return gs
     
     # Load game
-    c.execute('SELECT * FROM games WHERE guild_id=?', (guild_id,))
+    c.execute(_SQL_SELECT_GAME, (guild_id,))
     row = c.fetchone()
     if not row:
-        conn.close()
         return None
+    gs = _game_from_row(row)
+    
+    # Load teams
+    c.execute(_SQL_SELECT_TEAMS, (guild_id,))
+    for team_row in c.fetchall():
+        _apply_team_row(gs, *team_row)
     
-    host_id, active, move_count, curr_team, curr_pos, toss_active, toss_choices = row[1:8]
+    # Load player slots
+    c.execute(_SQL_SELECT_SLOTS, (guild_id,))
+    for slot_row in c.fetchall():
+        _apply_slot_row(gs, *slot_row)
+    
+    # Load sub requests
+    c.execute(_SQL_SELECT_SUBS, (guild_id,))
+    for sub_row in c.fetchall():
+        _apply_sub_row(gs, *sub_row)
     
-    gs = GameState(host_id)
+    # freshly loaded state matches the stored rows
+    gs.reindex()
+    gs.clear_dirty()
+    return gs
+
+
+def _game_from_row(row: tuple) -> GameState:
+    (guild_id, host_id, active, move_count, curr_team, curr_pos, toss_active, toss_choices,
+     event_seq, finished, channel_id, turn) = row[:12]
+    
+    gs = GameState(host_id, guild_id)
+    gs.event_seq = event_seq or 0
+    gs.finished = bool(finished)
     gs.active = bool(active)
     gs.move_count = move_count
     gs.current_possession_team = curr_team
     gs.current_attacker_pos = curr_pos
     gs.toss_active = bool(toss_active)
-    gs.toss_choices = json.loads(toss_choices) if toss_choices else {}
+    # JSON object keys are strings; team ids are ints
+    gs.toss_choices = {int(k): v for k, v in json.loads(toss_choices).items()} if toss_choices else {}
+    gs.channel_id = channel_id
+    gs.turn = _turn_from_json(turn)
+    return gs
+
+
+def _apply_team_row(gs: GameState, team_id: int, name: str, captain_id: Optional[int], score: int):
+    if team_id in gs.teams:
+        gs.teams[team_id].name = name
+        gs.teams[team_id].captain_id = captain_id
+        gs.teams[team_id].score = score
+
+
+def _apply_slot_row(gs: GameState, team_id: int, pos: str, user_id: int, name: str, afk: int):
+    if team_id in gs.teams:
+        gs.teams[team_id].slots[pos] = PlayerSlot(
+            user_id=user_id,
+            name=name,
+            position=pos,
+            afk=bool(afk)
+        )
+
+
+def _apply_sub_row(gs: GameState, team_id: int, out_pos: str, in_user_id: int, in_name: str,
+                   deadline: Optional[float] = None):
+    req = SubRequest(team=team_id, out_pos=out_pos, in_user_id=in_user_id, in_name=in_name, deadline=deadline)
+    gs.sub_requests[in_user_id] = req
+
+
+def load_all_games(active_only: bool = True, pool: Optional[ConnectionPool] = None) -> Dict[int, GameState]:
+    """Load every stored game (by default only active ones) keyed by guild ID.
+
+    Unlike calling ``load_game`` per guild, this runs one set-based query per
+    table no matter how many games are stored, so it is what startup restore uses.
+    Like ``load_game``, events logged after each snapshot are replayed.
+    """
+    where = 'WHERE g.active=1' if active_only else 'WHERE 1'
+    table = 'game_blobs' if STORAGE_MODE == 'blob' else 'games'
+    with (pool or get_pool()).connection() as conn:
+        c = conn.cursor()
+        if STORAGE_MODE == 'blob':
+            c.execute(f'SELECT g.guild_id, g.data FROM game_blobs g {where}')
+            result = {guild_id: codec.decode(data) for guild_id, data in c.fetchall()}
+        else:
+            result = _read_all_rows(c, where)
+        
+        # the stored snapshots are loaded; replay the log on top of them
+        for gs in result.values():
+            gs.clear_dirty()
+        c.execute(f'''
+            SELECT e.guild_id, e.seq, e.kind, e.team_id, e.actor_id, e.choice, e.guess, e.points,
+                   e.possession_team, e.possession_pos, e.used_move, e.afk_user_id, e.turn
+            FROM move_events e JOIN {table} g ON g.guild_id = e.guild_id {where} AND e.seq > g.event_seq
+            ORDER BY e.guild_id, e.seq
+        ''')
+        for guild_id, *event_row in c.fetchall():
+            if guild_id in result:
+                _event_from_row(*event_row).apply(result[guild_id])
     
-    # Load teams
-    c.execute('SELECT team_id, name, captain_id, score FROM teams WHERE guild_id=?', (guild_id,))
-    for team_id, name, captain_id, score in c.fetchall():
-        if team_id in gs.teams:
-            gs.teams[team_id].name = name
-            gs.teams[team_id].captain_id = captain_id
-            gs.teams[team_id].score = score
+    return result
+
+
+def _read_all_rows(c: sqlite3.Cursor, where: str) -> Dict[int, GameState]:
+    c.execute(f'''
+        SELECT g.guild_id, g.host_id, g.active, g.move_count, g.current_possession_team,
+               g.current_attacker_pos, g.toss_active, g.toss_choices, g.event_seq, g.finished,
+               g.channel_id, g.turn
+        FROM games g {where}
+    ''')
+    result = {row[0]: _game_from_row(row) for row in c.fetchall()}
     
-    # Load player slots
-    c.execute('SELECT team_id, position, user_id, name, afk FROM player_slots WHERE guild_id=?', (guild_id,))
-    for team_id, pos, user_id, name, afk in c.fetchall():
-        if team_id in gs.teams:
-            gs.teams[team_id].slots[pos] = PlayerSlot(
-                user_id=user_id,
-                name=name,
-                position=pos,
-                afk=bool(afk)
-            )
+    c.execute(f'''
+        SELECT t.guild_id, t.team_id, t.name, t.captain_id, t.score
+        FROM teams t JOIN games g ON g.guild_id = t.guild_id {where}
+    ''')
+    for guild_id, *team_row in c.fetchall():
+        if guild_id in result:
+            _apply_team_row(result[guild_id], *team_row)
     
-    # Load sub requests
-    c.execute('SELECT team_id, out_pos, in_user_id, in_name FROM sub_requests WHERE guild_id=?', (guild_id,))
-    for team_id, out_pos, in_user_id, in_name in c.fetchall():
-        from game_core import SubRequest
-        req = SubRequest(team=team_id, out_pos=out_pos, in_user_id=in_user_id, in_name=in_name)
-        gs.sub_requests[in_user_id] = req
+    c.execute(f'''
+        SELECT s.guild_id, s.team_id, s.position, s.user_id, s.name, s.afk
+        FROM player_slots s JOIN games g ON g.guild_id = s.guild_id {where}
+    ''')
+    for guild_id, *slot_row in c.fetchall():
+        if guild_id in result:
+            _apply_slot_row(result[guild_id], *slot_row)
     
-    conn.close()
-    return gs
+    c.execute(f'''
+        SELECT r.guild_id, r.team_id, r.out_pos, r.in_user_id, r.in_name, r.deadline
+        FROM sub_requests r JOIN games g ON g.guild_id = r.guild_id {where}
+        ORDER BY r.id
+    ''')
+    for guild_id, *sub_row in c.fetchall():
+        if guild_id in result:
+            _apply_sub_row(result[guild_id], *sub_row)
+    for gs in result.values():
+        gs.reindex()
+    return result
 
 
-def delete_game(guild_id: int):
+def delete_game(guild_id: int, pool: Optional[ConnectionPool] = None):
     """Delete game from database."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('DELETE FROM games WHERE guild_id=?', (guild_id,))
-    c.execute('DELETE FROM teams WHERE guild_id=?', (guild_id,))
-    c.execute('DELETE FROM player_slots WHERE guild_id=?', (guild_id,))
-    c.execute('DELETE FROM sub_requests WHERE guild_id=?', (guild_id,))
-    conn.commit()
-    conn.close()
+    with metrics.DB_SECONDS.time('delete_game'), (pool or get_pool()).connection() as conn:
+        _delete_rows(conn.cursor(), guild_id)
 
 
-def list_games() -> List[int]:
+def list_games(pool: Optional[ConnectionPool] = None) -> List[int]:
     """Get all guild IDs with active games."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT guild_id FROM games WHERE active=1')
-    result = [row[0] for row in c.fetchall()]
-    conn.close()
-    return result
+    with (pool or get_pool()).connection() as conn:
+        table = 'game_blobs' if STORAGE_MODE == 'blob' else 'games'
+        c = conn.execute(f'SELECT guild_id FROM {table} WHERE active=1')
+        return [row[0] for row in c.fetchall()]
+
+
+def _add_career(c: sqlite3.Cursor, rows: List[tuple]):
+    """Add (guild_id, user_id, *deltas) rows to the global and per-guild aggregates."""
+    c.executemany(_SQL_ADD_CAREER, [row[1:] for row in rows])
+    c.executemany(_SQL_ADD_GUILD_CAREER, rows)
+
+
+def load_career(user_id: int, guild_id: Optional[int] = None,
+                pool: Optional[ConnectionPool] = None) -> Optional[Dict[str, int]]:
+    """A player's career counters (in one guild if ``guild_id`` is given), or None."""
+    cols = ', '.join(CAREER_FIELDS)
+    with (pool or get_pool()).connection() as conn:
+        if guild_id is None:
+            c = conn.execute(f'SELECT {cols} FROM career_stats WHERE user_id=?', (user_id,))
+        else:
+            c = conn.execute(f'SELECT {cols} FROM guild_career_stats WHERE guild_id=? AND user_id=?',
+                             (guild_id, user_id))
+        row = c.fetchone()
+    return dict(zip(CAREER_FIELDS, row)) if row else None
+
+
+def load_leaderboard(guild_id: Optional[int] = None, order: str = 'points', limit: int = 10,
+                     pool: Optional[ConnectionPool] = None) -> List[tuple]:
+    """The top ``limit`` players as (user_id, value), globally or in one guild.
+
+    Reads the leading entries of the ranking's index; never scans history.
+    """
+    if order not in LEADERBOARD_ORDERS:
+        raise ValueError(f'cannot rank by {order!r}; expected one of {", ".join(LEADERBOARD_ORDERS)}')
+    with (pool or get_pool()).connection() as conn:
+        if guild_id is None:
+            c = conn.execute(f'SELECT user_id, {order} FROM career_stats '
+                             f'ORDER BY {order} DESC, user_id LIMIT ?', (limit,))
+        else:
+            c = conn.execute(f'SELECT user_id, {order} FROM guild_career_stats WHERE guild_id=? '
+                             f'ORDER BY {order} DESC, user_id LIMIT ?', (guild_id, limit))
+        return c.fetchall()
+
+
+def save_practice_stats(stats: Dict[int, dict], pool: Optional[ConnectionPool] = None):
+    """Upsert shooting-practice totals, ``{user_id: {'score', 'shots', 'made'}}``, in one transaction."""
+    rows = [(user_id, s['score'], s['shots'], s['made']) for user_id, s in stats.items()]
+    with (pool or get_pool()).connection() as conn:
+        conn.executemany(_SQL_UPSERT_PRACTICE, rows)
+
+
+def load_practice_stats(pool: Optional[ConnectionPool] = None) -> Dict[int, dict]:
+    """Every stored shooting-practice total, keyed by user ID."""
+    with (pool or get_pool()).connection() as conn:
+        c = conn.execute('SELECT user_id, score, shots, made FROM practice_stats')
+        return {user_id: {'score': score, 'shots': shots, 'made': made}
+                for user_id, score, shots, made in c.fetchall()}
+
+
+def archive_finished_games(batch_size: int = ARCHIVE_BATCH_SIZE,
+                           min_age_seconds: int = ARCHIVE_AFTER_SECONDS,
+                           max_batches: Optional[int] = None,
+                           pause: float = 0.05,
+                           pool: Optional[ConnectionPool] = None) -> int:
+    """Move finished games into ``games_archive`` and delete their live rows.
+
+    Works in transactions of at most ``batch_size`` games, sleeping ``pause``
+    seconds between them, so the write lock is only ever held briefly. Games
+    are archived once they have been finished for ``min_age_seconds``.
+    Returns the number of games archived.
+    """
+    archived = 0
+    batches = 0
+    age = f'-{int(min_age_seconds)} seconds'
+    while max_batches is None or batches < max_batches:
+        with (pool or get_pool()).connection() as conn:
+            c = conn.cursor()
+            if STORAGE_MODE == 'blob':
+                finished = _finished_blobs(c, age, batch_size)
+            else:
+                finished = _finished_rows(c, age, batch_size)
+            if not finished:
+                break
+            ids = [game[0] for game in finished]
+            marks = ','.join('?' * len(ids))
+            _archive_games(c, finished)
+            for table in ('games', 'teams', 'player_slots', 'sub_requests', 'move_events', 'game_blobs'):
+                c.execute(f'DELETE FROM {table} WHERE guild_id IN ({marks})', ids)
+        archived += len(finished)
+        batches += 1
+        if len(finished) < batch_size:
+            break
+        time.sleep(pause)
+    if archived:
+        logger.info('archived %d finished games', archived)
+    return archived
+
+
+def _archive_games(c: sqlite3.Cursor, finished: List[tuple]):
+    """Insert one ``games_archive`` row per (guild_id, host_id, move_count, teams, roster, created, finished)."""
+    archive_rows = []
+    for gid, host_id, move_count, teams, roster, created_at, finished_at in finished:
+        t1_name, t1_score = teams.get(1, ('Team 1', 0))
+        t2_name, t2_score = teams.get(2, ('Team 2', 0))
+        winner = 1 if t1_score > t2_score else 2 if t2_score > t1_score else None
+        archive_rows.append((gid, host_id, move_count, t1_name, t1_score, t2_name, t2_score,
+                             winner, json.dumps(roster), created_at, finished_at))
+    if archive_rows:
+        c.executemany('''
+            INSERT INTO games_archive
+            (guild_id, host_id, move_count, team1_name, team1_score, team2_name, team2_score,
+             winner, roster, created_at, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', archive_rows)
+
+
+def _game_summary(gs: GameState) -> Tuple[Dict[int, tuple], list]:
+    """``(teams, roster)`` of a game as archived: {team_id: (name, score)} and [team, pos, user, name] rows."""
+    teams = {tid: (t.name, t.score) for tid, t in gs.teams.items()}
+    roster = [[tid, pos, slot.user_id, slot.name]
+              for tid, t in sorted(gs.teams.items())
+              for pos, slot in sorted(t.slots.items()) if slot]
+    return teams, roster
+
+
+def _archive_summary(guild_id: int, gs: GameState) -> tuple:
+    """(guild_id, host_id, move_count, teams, roster) of a game, as ``_archive_games`` takes it."""
+    return (guild_id, gs.host_id, gs.move_count) + _game_summary(gs)
+
+
+def _created_at(c: sqlite3.Cursor, guild_id: int) -> str:
+    table = 'game_blobs' if STORAGE_MODE == 'blob' else 'games'
+    row = c.execute(f'SELECT created_at FROM {table} WHERE guild_id=?', (guild_id,)).fetchone()
+    return row[0] if row else _utcnow()
+
+
+def _utcnow() -> str:
+    """Now, formatted like SQLite's CURRENT_TIMESTAMP."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+
+def _finished_rows(c: sqlite3.Cursor, age: Optional[str], limit: int,
+                   guild_id: Optional[int] = None) -> List[tuple]:
+    """Finished games in row storage as (guild_id, host_id, move_count, teams, roster, created, finished).
+
+    Either those finished before ``age`` (a SQLite datetime modifier), or
+    the game of ``guild_id`` if it is finished.
+    """
+    if guild_id is None:
+        c.execute('''
+            SELECT guild_id, host_id, move_count, created_at, updated_at FROM games
+            WHERE active=0 AND finished=1 AND updated_at <= datetime('now', ?)
+            LIMIT ?
+        ''', (age, limit))
+    else:
+        c.execute('''
+            SELECT guild_id, host_id, move_count, created_at, updated_at FROM games
+            WHERE guild_id=? AND active=0 AND finished=1
+        ''', (guild_id,))
+    rows = c.fetchall()
+    if not rows:
+        return []
+    ids = [row[0] for row in rows]
+    marks = ','.join('?' * len(ids))
+    teams: Dict[int, Dict[int, tuple]] = {gid: {} for gid in ids}
+    c.execute(f'SELECT guild_id, team_id, name, score FROM teams WHERE guild_id IN ({marks})', ids)
+    for gid, team_id, name, score in c.fetchall():
+        teams[gid][team_id] = (name, score)
+    rosters: Dict[int, list] = {gid: [] for gid in ids}
+    c.execute(f'''
+        SELECT guild_id, team_id, position, user_id, name FROM player_slots
+        WHERE guild_id IN ({marks}) ORDER BY guild_id, team_id, position
+    ''', ids)
+    for gid, team_id, pos, user_id, name in c.fetchall():
+        rosters[gid].append([team_id, pos, user_id, name])
+    return [(gid, host_id, move_count, teams[gid], rosters[gid], created_at, updated_at)
+            for gid, host_id, move_count, created_at, updated_at in rows]
+
+
+def _finished_blobs(c: sqlite3.Cursor, age: Optional[str], limit: int,
+                    guild_id: Optional[int] = None) -> List[tuple]:
+    """Same as ``_finished_rows`` for games kept in ``game_blobs``."""
+    if guild_id is None:
+        c.execute('''
+            SELECT guild_id, data, created_at, updated_at FROM game_blobs
+            WHERE active=0 AND finished=1 AND updated_at <= datetime('now', ?)
+            LIMIT ?
+        ''', (age, limit))
+    else:
+        c.execute('''
+            SELECT guild_id, data, created_at, updated_at FROM game_blobs
+            WHERE guild_id=? AND active=0 AND finished=1
+        ''', (guild_id,))
+    finished = []
+    for gid, data, created_at, updated_at in c.fetchall():
+        gs = codec.decode(data)
+        teams, roster = _game_summary(gs)
+        finished.append((gid, gs.host_id, gs.move_count, teams, roster, created_at, updated_at))
+    return finished
+
+
+class WriteBehindQueue:
+    """Persist game snapshots on a single dedicated writer thread.
+
+    ``submit_save``/``submit_delete`` only take a snapshot and enqueue it, so
+    they are cheap enough to call on the event loop. Writes for the same guild
+    coalesce: if a guild is saved again before the writer picks it up, only the
+    newest snapshot is written. Each submit returns a ``concurrent.futures.Future``
+    that resolves once the write is committed; callers that don't need
+    durability can simply ignore it.
+    """
+
+    def __init__(self, pool_getter: Optional[Callable[[], ConnectionPool]] = None):
+        # called per batch so the writer follows DB_PATH changes of the shared pool
+        self._pool_getter = pool_getter or get_pool
+        self._cond = threading.Condition()
+        # guild_id -> ops to apply in order: a snapshot, or None to delete the
+        # guild's rows. Coalescing keeps this to at most [None, snapshot].
+        self._pending: Dict[int, List[Optional[dict]]] = {}
+        # guild_id -> move_events rows to append, in seq order
+        self._events: Dict[int, List[tuple]] = {}
+        # (guild_id, user_id, *deltas) career rows of those moves; unlike the
+        # events they outlive a delete of the game
+        self._career: List[tuple] = []
+        # guild_id -> archive summary of a finished game whose snapshot a
+        # queued delete superseded; written to games_archive before the delete
+        self._archives: Dict[int, tuple] = {}
+        self._waiters: Dict[int, List[Future]] = {}
+        # waiters of the batch the writer is currently committing
+        self._inflight: List[Future] = []
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.retry_seconds = WRITE_RETRY_SECONDS
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, name='persistence-writer', daemon=True)
+                self._thread.start()
+
+    def submit_save(self, guild_id: int, gs: GameState, compact: bool = False) -> Future:
+        snap = _snapshot(guild_id, gs)
+        snap['compact'] = compact
+        return self._submit(guild_id, snap)
+
+    def submit_delete(self, guild_id: int) -> Future:
+        return self._submit(guild_id, None)
+
+    def submit_event(self, guild_id: int, event: MoveEvent,
+                     career: Optional[Dict[int, List[int]]] = None) -> Future:
+        """Append a move event, and add its ``career`` deltas in the same transaction.
+
+        Events are never coalesced.
+        """
+        fut: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('write-behind queue is closed')
+            self._events.setdefault(guild_id, []).append(_event_row(guild_id, event))
+            if career:
+                self._career.extend((guild_id, user_id, *d) for user_id, d in career.items())
+            self._waiters.setdefault(guild_id, []).append(fut)
+            self._cond.notify()
+        self.start()
+        return fut
+
+    def _submit(self, guild_id: int, snap: Optional[dict]) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('write-behind queue is closed')
+            ops = self._pending.setdefault(guild_id, [])
+            if snap is None:
+                last = ops[-1] if ops else None
+                if last is not None and last['owner'].finished:
+                    # the result never reached the table the delete archives from
+                    self._archives[guild_id] = _archive_summary(guild_id, last['owner'])
+                ops[:] = [None]
+                # the delete wipes the log too; queued appends would be orphans
+                self._events.pop(guild_id, None)
+            elif ops and ops[-1] is not None:
+                ops[-1] = _merge_snapshots(ops[-1], snap)
+            else:
+                ops.append(snap)
+            self._waiters.setdefault(guild_id, []).append(fut)
+            self._cond.notify()
+        self.start()
+        return fut
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending.keys() | self._events.keys())
+
+    def flush(self) -> Future:
+        """Return a future that resolves when everything queued so far is written."""
+        fut: Future = Future()
+        with self._cond:
+            # piggy-back on the last waiter of every pending guild
+            outstanding = [ws[-1] for ws in self._waiters.values() if ws]
+            outstanding += [w for w in self._inflight if not w.done()]
+        if not outstanding:
+            fut.set_result(None)
+            return fut
+        remaining = [len(outstanding)]
+        lock = threading.Lock()
+
+        def _done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0 and not fut.done():
+                    fut.set_result(None)
+        for w in outstanding:
+            w.add_done_callback(_done)
+        return fut
+
+    def close(self, timeout: Optional[float] = None):
+        """Write out everything still queued, then stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._events and not self._career and not self._closed:
+                    self._cond.wait()
+                if not self._pending and not self._events and not self._career and self._closed:
+                    return
+                batch, self._pending = self._pending, {}
+                events, self._events = self._events, {}
+                career, self._career = self._career, []
+                archives, self._archives = self._archives, {}
+                waiters, self._waiters = self._waiters, {}
+                self._inflight = [f for futs in waiters.values() for f in futs]
+            error: Optional[BaseException] = None
+            try:
+                with metrics.DB_SECONDS.time('write_batch'), self._pool_getter().connection() as conn:
+                    c = conn.cursor()
+                    # A queued delete always precedes the guild's queued events,
+                    # and events must land before a compacting snapshot.
+                    for guild_id, ops in batch.items():
+                        if ops[0] is None:
+                            with metrics.DB_SECONDS.time('delete_game'):
+                                summary = archives.get(guild_id)
+                                if summary is not None:
+                                    _archive_games(c, [summary + (_created_at(c, guild_id), _utcnow())])
+                                _delete_rows(c, guild_id, archive=summary is None)
+                    for rows in events.values():
+                        with metrics.DB_SECONDS.time('append_events'):
+                            c.executemany(_SQL_INSERT_EVENT, rows)
+                    if career:
+                        with metrics.DB_SECONDS.time('add_career'):
+                            _add_career(c, career)
+                    for guild_id, ops in batch.items():
+                        for snap in ops:
+                            if snap is not None:
+                                with metrics.DB_SECONDS.time('save_game'):
+                                    _write_snapshot(c, guild_id, snap)
+            except Exception as e:  # keep the writer alive; report via futures
+                logger.exception('write-behind batch of %d games failed', len(batch.keys() | events.keys()))
+                error = e
+                self._requeue(batch, events, career, archives)
+            for futs in waiters.values():
+                for fut in futs:
+                    if error is None:
+                        fut.set_result(None)
+                    else:
+                        fut.set_exception(error)
+            with self._cond:
+                self._inflight = []
+            if error is not None:
+                time.sleep(self.retry_seconds)
+
+    def _requeue(self, batch: Dict[int, List[Optional[dict]]], events: Dict[int, List[tuple]],
+                 career: List[tuple], archives: Dict[int, tuple]):
+        """Put back what a failed batch would have written, ahead of anything queued since.
+
+        Nothing was committed, so every op is queued again: a snapshot is
+        merged under any newer one of the same guild, and a delete queued
+        since supersedes it (archiving its result if the game had finished).
+        """
+        with self._cond:
+            deleted_since = {gid for gid, queued in self._pending.items() if queued and queued[0] is None}
+            for guild_id, ops in batch.items():
+                queued = self._pending.setdefault(guild_id, [])
+                if guild_id in archives:
+                    self._archives.setdefault(guild_id, archives[guild_id])
+                snap = ops[-1]
+                if guild_id in deleted_since:
+                    if snap is not None and snap['owner'].finished:
+                        self._archives.setdefault(guild_id, _archive_summary(guild_id, snap['owner']))
+                    continue
+                if snap is not None and queued:
+                    queued[0] = _merge_snapshots(snap, queued[0])
+                elif snap is not None:
+                    queued.append(snap)
+                if ops[0] is None:
+                    queued.insert(0, None)
+            for guild_id, rows in events.items():
+                if guild_id in deleted_since:
+                    # the game was deleted since; these would be orphans
+                    continue
+                self._events[guild_id] = rows + self._events.get(guild_id, [])
+            self._career[:0] = career
+
+
+_writer = WriteBehindQueue()
+
+
+def queue_save(guild_id: int, gs: GameState) -> Future:
+    """Snapshot ``gs`` and persist it in the background. Safe to call on the event loop."""
+    return _writer.submit_save(guild_id, gs)
+
+
+def queue_delete(guild_id: int) -> Future:
+    """Delete a game in the background, ordered after any queued save for the guild."""
+    return _writer.submit_delete(guild_id)
+
+
+def queue_move(guild_id: int, gs: GameState, event: MoveEvent, writer: Optional[WriteBehindQueue] = None) -> Future:
+    """Append a recorded move event to the log in the background.
+
+    The players' career stats are updated in the same transaction as the
+    event. Full snapshots are only written at checkpoints (halftime and game
+    end); those also compact away the events the snapshot now covers.
+    """
+    writer = writer or _writer
+    fut = writer.submit_event(guild_id, event, career_deltas(gs, event))
+    if gs.is_checkpoint(event):
+        fut = writer.submit_save(guild_id, gs, compact=True)
+    return fut
+
+
+async def save_game_durable(guild_id: int, gs: GameState):
+    """Queue a save and wait until it has been committed."""
+    await asyncio.wrap_future(queue_save(guild_id, gs))
+
+
+async def flush_writes():
+    """Wait until every save queued so far has been committed."""
+    await asyncio.wrap_future(_writer.flush())
+
+
+def close_writer(timeout: Optional[float] = None):
+    """Drain the write-behind queue and stop its thread (call on shutdown)."""
+    _writer.close(timeout)
+    close_pool()
+
+
+class StorageBackend(Protocol):
+    """What the bot needs from a game store.
+
+    ``save``/``load``/``delete``/``list``/``bulk_load`` are synchronous; the
+    ``queue_*`` calls are safe on the event loop and return futures that
+    resolve once the write is durable for that backend.
+    """
+
+    def init(self) -> None: ...
+    def save(self, guild_id: int, gs: GameState) -> None: ...
+    def load(self, guild_id: int) -> Optional[GameState]: ...
+    def delete(self, guild_id: int) -> None: ...
+    def list(self) -> List[int]: ...
+    def bulk_load(self, active_only: bool = True) -> Dict[int, GameState]: ...
+    def queue_save(self, guild_id: int, gs: GameState) -> Future: ...
+    def queue_delete(self, guild_id: int) -> Future: ...
+    def queue_move(self, guild_id: int, gs: GameState, event: MoveEvent) -> Future: ...
+    def flush(self) -> Future: ...
+    def archive_finished(self) -> int: ...
+    def career(self, user_id: int, guild_id: Optional[int] = None) -> Optional[Dict[str, int]]: ...
+    def leaderboard(self, guild_id: Optional[int] = None, order: str = 'points', limit: int = 10) -> List[tuple]: ...
+    def close(self) -> None: ...
+
+
+class SQLiteBackend:
+    """The SQLite store implemented by this module's functions.
+
+    With no ``db_path`` it uses the module-level ``DB_PATH``, shared pool and
+    write-behind queue; with one it owns a separate pool and writer thread.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, pool_size: int = DB_POOL_SIZE):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self._pool: Optional[ConnectionPool] = None
+        self._writer = _writer if db_path is None else WriteBehindQueue(self.pool)
+
+    def pool(self) -> ConnectionPool:
+        if self.db_path is None:
+            return get_pool()
+        if self._pool is None:
+            self._pool = ConnectionPool(self.db_path, self.pool_size)
+        return self._pool
+
+    def init(self):
+        init_db(self.pool())
+
+    def save(self, guild_id: int, gs: GameState):
+        save_game(guild_id, gs, self.pool())
+
+    def load(self, guild_id: int) -> Optional[GameState]:
+        return load_game(guild_id, self.pool())
+
+    def delete(self, guild_id: int):
+        delete_game(guild_id, self.pool())
+
+    def list(self) -> List[int]:
+        return list_games(self.pool())
+
+    def bulk_load(self, active_only: bool = True) -> Dict[int, GameState]:
+        return load_all_games(active_only, self.pool())
+
+    def queue_save(self, guild_id: int, gs: GameState) -> Future:
+        return self._writer.submit_save(guild_id, gs)
+
+    def queue_delete(self, guild_id: int) -> Future:
+        return self._writer.submit_delete(guild_id)
+
+    def queue_move(self, guild_id: int, gs: GameState, event: MoveEvent) -> Future:
+        return queue_move(guild_id, gs, event, self._writer)
+
+    def flush(self) -> Future:
+        return self._writer.flush()
+
+    def archive_finished(self, **kwargs) -> int:
+        return archive_finished_games(pool=self.pool(), **kwargs)
+
+    def career(self, user_id: int, guild_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        return load_career(user_id, guild_id, self.pool())
+
+    def leaderboard(self, guild_id: Optional[int] = None, order: str = 'points', limit: int = 10) -> List[tuple]:
+        return load_leaderboard(guild_id, order, limit, self.pool())
+
+    def close(self):
+        self._writer.close()
+        if self.db_path is None:
+            close_pool()
+        elif self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+
+def _done(result=None) -> Future:
+    fut: Future = Future()
+    fut.set_result(result)
+    return fut
+
+
+class MemoryBackend:
+    """A process-local store with the same semantics as the SQLite backend.
+
+    Games are kept as ``codec`` blobs plus their move log, so stored state is
+    isolated from the live objects exactly as on disk. Nothing touches the
+    filesystem, which makes it suitable for load runs and parallel tests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # guild_id -> (active, finished, finished_since, blob)
+        self._games: Dict[int, tuple] = {}
+        self._events: Dict[int, List[MoveEvent]] = {}
+        # user_id / (guild_id, user_id) -> counters per CAREER_FIELDS
+        self._career: Dict[int, List[int]] = {}
+        self._guild_career: Dict[tuple, List[int]] = {}
+        self.archive: List[dict] = []
+
+    def init(self):
+        pass
+
+    def save(self, guild_id: int, gs: GameState):
+        gs.take_dirty()
+        blob = codec.encode(gs)
+        with self._lock:
+            prev = self._games.get(guild_id)
+            since = prev[2] if prev and prev[1] and gs.finished else time.monotonic()
+            self._games[guild_id] = (gs.active, gs.finished, since, blob)
+
+    def _replay(self, guild_id: int, blob: bytes) -> GameState:
+        gs = codec.decode(blob)
+        gs.clear_dirty()
+        for event in self._events.get(guild_id, ()):
+            if event.seq > gs.event_seq:
+                event.apply(gs)
+        return gs
+
+    def load(self, guild_id: int) -> Optional[GameState]:
+        with self._lock:
+            entry = self._games.get(guild_id)
+            return self._replay(guild_id, entry[3]) if entry else None
+
+    def delete(self, guild_id: int):
+        with self._lock:
+            entry = self._games.pop(guild_id, None)
+            if entry is not None and entry[1]:
+                self._archive(guild_id, self._replay(guild_id, entry[3]))
+            self._events.pop(guild_id, None)
+
+    def _archive(self, guild_id: int, gs: GameState):
+        teams, roster = _game_summary(gs)
+        self.archive.append({
+            'guild_id': guild_id,
+            'host_id': gs.host_id,
+            'move_count': gs.move_count,
+            'scores': {tid: score for tid, (_, score) in teams.items()},
+            'roster': roster,
+        })
+
+    def list(self) -> List[int]:
+        with self._lock:
+            return [gid for gid, entry in self._games.items() if entry[0]]
+
+    def bulk_load(self, active_only: bool = True) -> Dict[int, GameState]:
+        with self._lock:
+            return {gid: self._replay(gid, entry[3]) for gid, entry in self._games.items()
+                    if entry[0] or not active_only}
+
+    def queue_save(self, guild_id: int, gs: GameState) -> Future:
+        self.save(guild_id, gs)
+        return _done()
+
+    def queue_delete(self, guild_id: int) -> Future:
+        self.delete(guild_id)
+        return _done()
+
+    def queue_move(self, guild_id: int, gs: GameState, event: MoveEvent) -> Future:
+        with self._lock:
+            turn = replace(event.turn) if event.turn else None
+            self._events.setdefault(guild_id, []).append(replace(event, turn=turn))
+            for user_id, deltas in career_deltas(gs, event).items():
+                for totals in (self._career.setdefault(user_id, [0] * len(CAREER_FIELDS)),
+                               self._guild_career.setdefault((guild_id, user_id), [0] * len(CAREER_FIELDS))):
+                    for i, d in enumerate(deltas):
+                        totals[i] += d
+        if gs.is_checkpoint(event):
+            self.save(guild_id, gs)
+            with self._lock:
+                self._events[guild_id] = [e for e in self._events[guild_id] if e.seq > gs.event_seq]
+        return _done()
+
+    def flush(self) -> Future:
+        return _done()
+
+    def archive_finished(self, min_age_seconds: int = ARCHIVE_AFTER_SECONDS, **kwargs) -> int:
+        cutoff = time.monotonic() - min_age_seconds
+        with self._lock:
+            done = [gid for gid, (_, finished, since, _) in self._games.items() if finished and since <= cutoff]
+            for gid in done:
+                self._archive(gid, self._replay(gid, self._games.pop(gid)[3]))
+                self._events.pop(gid, None)
+        return len(done)
+
+    def career(self, user_id: int, guild_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        with self._lock:
+            totals = self._career.get(user_id) if guild_id is None else self._guild_career.get((guild_id, user_id))
+            return dict(zip(CAREER_FIELDS, totals)) if totals else None
+
+    def leaderboard(self, guild_id: Optional[int] = None, order: str = 'points', limit: int = 10) -> List[tuple]:
+        if order not in LEADERBOARD_ORDERS:
+            raise ValueError(f'cannot rank by {order!r}; expected one of {", ".join(LEADERBOARD_ORDERS)}')
+        i = CAREER_FIELDS.index(order)
+        with self._lock:
+            if guild_id is None:
+                rows = [(uid, t[i]) for uid, t in self._career.items()]
+            else:
+                rows = [(uid, t[i]) for (gid, uid), t in self._guild_career.items() if gid == guild_id]
+        return sorted(rows, key=lambda r: (-r[1], r[0]))[:limit]
+
+    def close(self):
+        pass
+
+
+# 'sqlite', 'memory' or 'remote' (a cluster worker; see cluster.py)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+
+
+def make_backend(name: Optional[str] = None, **kwargs) -> StorageBackend:
+    """Build the storage backend named by ``name`` (default: ``STORAGE_BACKEND``)."""
+    name = name or STORAGE_BACKEND
+    if name == 'sqlite':
+        return SQLiteBackend(**kwargs)
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'remote':
+        from cluster import RemoteBackend
+        return RemoteBackend.from_env()
+    raise ValueError(f'unknown storage backend {name!r}')
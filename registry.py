@@ -0,0 +1,238 @@
+"""
+Bounded, lazily reloaded registry of the games this process holds.
+
+Games are kept in least-recently-touched order. ``sweep`` evicts games that
+finished more than GAME_FINISHED_SECONDS ago, and games nobody touched for
+GAME_IDLE_SECONDS; ``__setitem__`` evicts the least recently touched games
+once more than GAME_CACHE_SIZE are held. An evicted game is saved to
+storage first, and ``await load(guild_id)`` brings it back, reading storage
+on a worker thread; the bot does that before every serialized command, so
+callers never see the difference beyond one storage read. Evictions run as
+jobs on the guild's actor, so a command that is in flight always finishes
+with the GameState it started on.
+
+A game that is waiting on a prompt or a sub request is never evicted: its
+open views and armed deadlines hold the GameState object itself, and a
+reloaded copy would fork the game.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from actors import GuildActors
+from game_core import GameState
+
+logger = logging.getLogger(__name__)
+
+# games held in memory before the least recently touched are evicted
+GAME_CACHE_SIZE = int(os.getenv('GAME_CACHE_SIZE', '5000'))
+# untouched games are evicted after this long
+GAME_IDLE_SECONDS = int(os.getenv('GAME_IDLE_SECONDS', '3600'))
+# finished games stay this long so /livescore can still show the result
+GAME_FINISHED_SECONDS = int(os.getenv('GAME_FINISHED_SECONDS', '300'))
+
+
+class GameRegistry:
+    """A guild_id -> GameState mapping that keeps memory bounded.
+
+    Supports the dict operations the bot uses (``in``, ``[]``, ``get``,
+    ``pop``, ``update``, ``values``, ``len``) over the games in memory;
+    ``await load(guild_id)`` first to bring back an evicted one.
+    """
+
+    def __init__(self, max_games: int = GAME_CACHE_SIZE, idle_seconds: float = GAME_IDLE_SECONDS,
+                 finished_seconds: float = GAME_FINISHED_SECONDS,
+                 clock: Callable[[], float] = time.monotonic, actors: Optional[GuildActors] = None):
+        self.max_games = max_games
+        self.idle_seconds = idle_seconds
+        self.finished_seconds = finished_seconds
+        self.clock = clock
+        # evictions are queued on these; without them they happen on the spot
+        self.actors = actors
+        self.storage = None
+        # called with each game that leaves memory: evicted (after it was
+        # queued for saving) or dropped
+        self.on_evict: Optional[Callable[[GameState], None]] = None
+        # guild_id -> (game, last touched), least recently touched first
+        self._games: "OrderedDict[int, Tuple[GameState, float]]" = OrderedDict()
+        # evicted games whose save may not have landed yet; a reload takes them from here
+        self._flushing: Dict[int, Tuple[GameState, Future]] = {}
+        # guilds with an overflow eviction queued on their actor
+        self._evicting: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.evictions = 0
+        self.reloads = 0
+
+    def attach(self, storage):
+        """Use ``storage`` to save evicted games and load them back."""
+        self.storage = storage
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._games))
+
+    def __contains__(self, guild_id: int) -> bool:
+        return self.get(guild_id) is not None
+
+    def __getitem__(self, guild_id: int) -> GameState:
+        gs = self.get(guild_id)
+        if gs is None:
+            raise KeyError(guild_id)
+        return gs
+
+    def __setitem__(self, guild_id: int, gs: GameState):
+        self._flushing.pop(guild_id, None)
+        self._games[guild_id] = (gs, self.clock())
+        self._games.move_to_end(guild_id)
+        over = len(self._games) - self.max_games - len(self._evicting)
+        if over > 0:
+            self._evict_oldest(over)
+
+    def get(self, guild_id: int, default: Optional[GameState] = None) -> Optional[GameState]:
+        """The guild's game if it is in memory; marks it touched."""
+        entry = self._games.get(guild_id)
+        if entry is not None:
+            self._games[guild_id] = (entry[0], self.clock())
+            self._games.move_to_end(guild_id)
+            return entry[0]
+        flushing = self._flushing.get(guild_id)
+        if flushing is not None and not flushing[0].finished:
+            # evicted moments ago; its save may still be queued
+            self.reloads += 1
+            self[guild_id] = flushing[0]
+            return flushing[0]
+        return default
+
+    async def load(self, guild_id: int) -> Optional[GameState]:
+        """The guild's game, read back from storage on a worker thread if it is not in memory.
+
+        Finished games are not brought back; the archival sweep takes them.
+        """
+        gs = self.get(guild_id)
+        if gs is not None or self.storage is None:
+            return gs
+        try:
+            gs = await asyncio.to_thread(self.storage.load, guild_id)
+        except Exception:
+            # the next lookup tries again
+            logger.exception('Reloading game %s failed', guild_id)
+            return None
+        if gs is None or gs.finished:
+            return None
+        # another job may have set or reloaded it while storage was read
+        current = self.get(guild_id)
+        if current is not None:
+            return current
+        self.reloads += 1
+        self[guild_id] = gs
+        return gs
+
+    def pop(self, guild_id: int, *default) -> GameState:
+        gs = self.get(guild_id)
+        if gs is None:
+            if default:
+                return default[0]
+            raise KeyError(guild_id)
+        del self._games[guild_id]
+        return gs
+
+    def drop(self, guild_id: int) -> Optional[GameState]:
+        """Remove the guild's game without saving it, tearing it down like an eviction."""
+        gs = self.pop(guild_id, None)
+        if gs is not None and self.on_evict is not None:
+            self.on_evict(gs)
+        return gs
+
+    def update(self, other: Dict[int, GameState]):
+        for guild_id, gs in other.items():
+            self[guild_id] = gs
+
+    def values(self) -> List[GameState]:
+        return [gs for gs, _ in self._games.values()]
+
+    def items(self) -> List[Tuple[int, GameState]]:
+        return [(guild_id, gs) for guild_id, (gs, _) in self._games.items()]
+
+    @staticmethod
+    def evictable(gs: GameState) -> bool:
+        return gs.finished or (gs.turn is None and not gs.sub_requests)
+
+    def evict(self, guild_id: int) -> bool:
+        """Save the guild's game and drop it from memory; returns False if it is in play.
+
+        Call this from a job on the guild's actor (or use ``evict_queued``).
+        """
+        entry = self._games.get(guild_id)
+        if entry is None or not self.evictable(entry[0]):
+            return False
+        gs = entry[0]
+        del self._games[guild_id]
+        if self.storage is not None:
+            self._flushing[guild_id] = (gs, self.storage.queue_save(guild_id, gs))
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(gs)
+        return True
+
+    async def evict_queued(self, guild_id: int, check: Optional[Callable[[], bool]] = None) -> bool:
+        """``evict`` after the guild's queued jobs, if ``check()`` still holds by then."""
+        async def job():
+            return (check is None or check()) and self.evict(guild_id)
+        if self.actors is None:
+            return await job()
+        return await self.actors.run(guild_id, job, force=True)
+
+    def _evict_oldest(self, n: int):
+        for guild_id in list(self._games):
+            if n <= 0:
+                break
+            if guild_id in self._evicting or not self.evictable(self._games[guild_id][0]):
+                continue
+            n -= 1
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # no loop yet (restoring at startup): nothing else can be running
+                self.evict(guild_id)
+                continue
+            self._evicting.add(guild_id)
+            task = loop.create_task(self._evict_overflow(guild_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _evict_overflow(self, guild_id: int):
+        try:
+            await self.evict_queued(guild_id, lambda: len(self._games) > self.max_games)
+        except Exception:
+            logger.exception('Evicting game %s failed', guild_id)
+        finally:
+            self._evicting.discard(guild_id)
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Evict finished and idle games; returns how many were evicted."""
+        now = self.clock() if now is None else now
+
+        def stale(guild_id: int) -> bool:
+            entry = self._games.get(guild_id)
+            if entry is None:
+                return False
+            limit = self.finished_seconds if entry[0].finished else self.idle_seconds
+            return now - entry[1] >= limit
+
+        candidates = [guild_id for guild_id in list(self._games) if stale(guild_id)]
+        results = await asyncio.gather(*(self.evict_queued(guild_id, lambda gid=guild_id: stale(gid))
+                                         for guild_id in candidates))
+        # forget saves that have landed; take back games whose save failed
+        for guild_id, (gs, fut) in list(self._flushing.items()):
+            if not fut.done():
+                continue
+            del self._flushing[guild_id]
+            if fut.exception() is not None and guild_id not in self._games:
+                self._games[guild_id] = (gs, now)
+        return sum(results)
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from actors import GuildActors, GuildBusy
+
+
+class Abort(BaseException):
+    pass
+
+
+def test_jobs_of_a_guild_run_in_order_one_at_a_time():
+    async def main():
+        actors = GuildActors()
+        log = []
+
+        def job(n):
+            async def run():
+                log.append(('start', n))
+                await asyncio.sleep(0)
+                log.append(('end', n))
+                return n
+            return run
+
+        results = await asyncio.gather(*(actors.run(1, job(n)) for n in range(5)))
+        return results, log, len(actors)
+
+    results, log, busy = asyncio.run(main())
+    assert results == [0, 1, 2, 3, 4]
+    assert log == [(step, n) for n in range(5) for step in ('start', 'end')]
+    assert busy == 0
+
+
+def test_guilds_do_not_wait_on_each_other():
+    async def main():
+        actors = GuildActors()
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+
+        first = asyncio.create_task(actors.run(1, blocked))
+        other = await asyncio.wait_for(actors.run(2, lambda: asyncio.sleep(0, 'done')), 1)
+        release.set()
+        await first
+        return other
+
+    assert asyncio.run(main()) == 'done'
+
+
+def test_failing_job_reaches_its_caller_and_the_next_job_runs():
+    async def main():
+        actors = GuildActors()
+
+        async def fail():
+            raise ValueError('bad move')
+
+        async def abort():
+            raise Abort
+
+        failing = actors.run(1, fail)
+        aborted = actors.run(1, abort)
+        after = actors.run(1, lambda: asyncio.sleep(0, 'ran'))
+        return await asyncio.gather(failing, aborted, after, return_exceptions=True)
+
+    failed, aborted, after = asyncio.run(main())
+    assert isinstance(failed, ValueError)
+    assert isinstance(aborted, Abort)
+    assert after == 'ran'
+
+
+def test_job_cancelled_from_inside_does_not_stop_the_guild():
+    async def main():
+        actors = GuildActors()
+
+        async def cancelled():
+            raise asyncio.CancelledError
+
+        first = asyncio.ensure_future(actors.run(1, cancelled))
+        after = await actors.run(1, lambda: asyncio.sleep(0, 'ran'))
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return after
+
+    assert asyncio.run(main()) == 'ran'
+
+
+def test_cancelled_worker_cancels_the_queued_jobs():
+    async def main():
+        actors = GuildActors()
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        running = asyncio.ensure_future(actors.run(1, hang))
+        queued = asyncio.ensure_future(actors.run(1, lambda: asyncio.sleep(0)))
+        await started.wait()
+        actors._actors[1].worker.cancel()
+        results = await asyncio.gather(running, queued, return_exceptions=True)
+        return results, len(actors)
+
+    results, busy = asyncio.run(main())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+    assert busy == 0
+
+
+def test_full_queue_turns_commands_away_unless_forced():
+    async def main():
+        actors = GuildActors(depth=1)
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+
+        running = asyncio.ensure_future(actors.run(1, blocked))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(actors.run(1, blocked))
+        await asyncio.sleep(0)
+        with pytest.raises(GuildBusy):
+            await actors.run(1, blocked)
+        forced = asyncio.ensure_future(actors.run(1, lambda: asyncio.sleep(0, 'forced'), force=True))
+        release.set()
+        await asyncio.gather(running, waiting)
+        return await forced, actors.rejected
+
+    assert asyncio.run(main()) == ('forced', 1)
@@ -0,0 +1,65 @@
+import pytest
+
+import codec
+from codec import CodecError
+from game_core import Action, GameState
+
+
+def game_in_play() -> GameState:
+    gs = GameState(10, 99)
+    for uid in range(10, 16):
+        gs.join_player(uid, f'player{uid} ✓')
+    gs.start_game(10)
+    gs.channel_id = 555
+    gs.start_toss()
+    gs.set_toss_choice(1, 'high')
+    gs.score_points(2, 3)
+    gs.mark_afk(12)
+    gs.make_sub_request(1, 'sg', 77, 'bench', deadline=1700000000.5)
+    gs.play(gs.begin_turn(now=1700000000.0), Action.SIDEPASS, now=1700000001.0)
+    return gs
+
+
+def test_round_trip_restores_the_game():
+    gs = game_in_play()
+    blob = codec.encode(gs)
+    back = codec.decode(blob)
+
+    assert codec.encode(back) == blob
+    assert (back.guild_id, back.host_id, back.channel_id) == (99, 10, 555)
+    assert (back.active, back.finished, back.move_count, back.event_seq) == \
+        (gs.active, gs.finished, gs.move_count, gs.event_seq)
+    assert back.toss_choices == {1: 'high'}
+    assert [t.score for t in back.teams.values()] == [t.score for t in gs.teams.values()]
+    assert back.teams[1].slots['pg'].name == gs.teams[1].slots['pg'].name
+    assert back.get_slot(*gs.find_slot_of_user(12)).afk
+    assert [(r.in_user_id, r.deadline) for r in back.sub_requests.values()] == [(77, 1700000000.5)]
+    assert (back.turn.stage, back.turn.actor_id, back.turn.deadline) == \
+        (gs.turn.stage, gs.turn.actor_id, gs.turn.deadline)
+
+
+def test_decoded_game_rebuilds_its_roster_indexes():
+    gs = game_in_play()
+    back = codec.decode(codec.encode(gs))
+    for uid in range(10, 16):
+        assert back.find_slot_of_user(uid) == gs.find_slot_of_user(uid)
+    assert back.team_captained_by(gs.teams[1].captain_id) == 1
+
+
+def test_empty_lobby_round_trip():
+    gs = GameState(1)
+    back = codec.decode(codec.encode(gs))
+    assert codec.encode(back) == codec.encode(gs)
+    assert back.turn is None and back.channel_id is None
+
+
+@pytest.mark.parametrize('mangle', [
+    lambda blob: b'XX' + blob[2:],  # not a game blob
+    lambda blob: blob[:2] + bytes([99]) + blob[3:],  # unknown version
+    lambda blob: blob[:len(blob) // 2],  # truncated
+    lambda blob: blob + b'\0',  # trailing bytes
+    lambda blob: b'',
+])
+def test_bad_blobs_raise_codec_error(mangle):
+    with pytest.raises(CodecError):
+        codec.decode(mangle(codec.encode(game_in_play())))
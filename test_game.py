@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+import persistence
+from game import Game, Leaderboard
+
+
+def test_leaderboard_orders_by_score_then_accuracy_then_user():
+    board = Leaderboard()
+    board.update(5, 10, 5, 4)   # 10 points at 80%
+    board.update(3, 10, 10, 4)  # 10 points at 40%
+    board.update(4, 10, 10, 4)  # tied with 3; lower user_id first
+    board.update(9, 12, 20, 5)
+    board.update(7, 0, 0, 0)
+    assert board.top() == [(9, 12, 0.25), (5, 10, 0.8), (3, 10, 0.4), (4, 10, 0.4), (7, 0, 0.0)]
+    assert board.top(2) == [(9, 12, 0.25), (5, 10, 0.8)]
+    assert [board.rank(uid) for uid in (9, 5, 3, 4, 7)] == [1, 2, 3, 4, 5]
+    assert board.rank(1) is None
+
+
+def test_leaderboard_rank_follows_updates():
+    board = Leaderboard()
+    board.update(1, 4, 2, 2)
+    board.update(2, 2, 1, 1)
+    assert board.rank(2) == 2
+    board.update(2, 7, 3, 3)
+    assert (board.rank(1), board.rank(2)) == (2, 1)
+    assert len(board) == 2
+    board.update(1, 7, 3, 3)
+    assert board.top() == [(1, 7, 1.0), (2, 7, 1.0)]
+
+
+def test_shoot_many_totals_match_the_draws():
+    random.seed(7)
+    game = Game()
+    game.start_player(1)
+    game.shoot(1)
+    before = dict(game.stats(1))
+    result = game.shoot_many(1, 30000)
+    assert result['shots'] == 30000
+    assert result['miss'] + result['2pt'] + result['3pt'] == 30000
+    assert result['points'] == 2 * result['2pt'] + 3 * result['3pt']
+    # same odds as shoot: 40% miss, 40% 2-pointer, 20% 3-pointer
+    assert result['miss'] / 30000 == pytest.approx(0.4, abs=0.02)
+    assert result['2pt'] / 30000 == pytest.approx(0.4, abs=0.02)
+    assert result['3pt'] / 30000 == pytest.approx(0.2, abs=0.02)
+    stats = game.stats(1)
+    assert stats == {'score': before['score'] + result['points'],
+                     'shots': before['shots'] + 30000,
+                     'made': before['made'] + result['2pt'] + result['3pt']}
+    assert game.top() == [(1, stats['score'], stats['made'] / stats['shots'])]
+
+
+def test_shoot_many_rejects_unknown_player_and_no_shots():
+    game = Game()
+    assert game.shoot_many(1, 5) == {'error': 'not_started'}
+    game.start_player(1)
+    assert game.shoot_many(1, 0) == {'error': 'no_shots'}
+    assert game.stats(1) == {'score': 0, 'shots': 0, 'made': 0}
+
+
+def test_save_load_round_trip(tmp_path):
+    pool = persistence.ConnectionPool(str(tmp_path / 'blitz.db'))
+    persistence.init_db(pool)
+    try:
+        game = Game()
+        for uid in (1, 2):
+            game.start_player(uid)
+        game.shoot_many(1, 20)
+        game.shoot_many(2, 5)
+        game.save(pool)
+        game.shoot_many(2, 5)
+        game.save(pool)
+        loaded = Game.load(pool)
+    finally:
+        pool.close()
+    assert loaded.players == game.players
+    assert loaded.top() == game.top()
+    assert loaded.rank(2) == game.rank(2)
@@ -0,0 +1,72 @@
+import pytest
+
+from game_core import Action, Guess, GameState, match_guess, shot_points
+
+# what the original string-matching match_guess answered for every menu
+# action, written out by hand so the lookup table is checked against fixed data
+BASELINE_HITS = {
+    Action.SIDEPASS: {Guess.SIDEPASS},
+    Action.PG_DRIBBLE_LAYUP: {Guess.DRIBBLE},
+    Action.PG_DRIBBLE_JUMP: {Guess.DRIBBLE},
+    Action.PG_HALF: set(),
+    Action.PG_FULL: set(),
+    Action.HOLD: set(),
+    Action.PLAY_BACK: set(),
+    Action.SG_DRIBBLE_LAYUP: {Guess.DRIBBLE},
+    Action.SG_DRIBBLE_DUNK: {Guess.DRIBBLE},
+    Action.SG_3_HALF: {Guess.THREE_POINTER, Guess.HALFCOURT, Guess.FULLCOURT},
+    Action.SG_3_FULL: {Guess.THREE_POINTER, Guess.HALFCOURT, Guess.FULLCOURT},
+    Action.ACTION: set(),
+}
+
+
+@pytest.mark.parametrize('action', list(Action))
+def test_match_guess_menu_values(action):
+    assert {g for g in Guess if match_guess(action, g)} == BASELINE_HITS[action]
+
+
+@pytest.mark.parametrize('action, guess, hit', [
+    ('sidepass', 'sidepass', True),
+    ('sg_3_half', '3-pointer', True),
+    ('pg_3_half', '3', True),
+    ('pg_3_half', '3 pointer', True),
+    ('pg_3_half', '3pointer', False),
+    ('pg_dribble_layup', 'dribble', True),
+    ('pg_dribble_layup', 'layup', False),
+    ('sg_dribble_dunk', 'dunk', False),
+    ('dribble_dunk', 'dunk', False),
+    ('LAYUP', 'layup', True),
+    ('Jump Shot', 'jump shot', True),
+    ('action', 'dribble', False),
+    ('action', 'dunk', False),
+    (None, 'dribble', False),
+    ('', '3', False),
+])
+def test_match_guess_free_form(action, guess, hit):
+    assert match_guess(action, guess) is hit
+
+
+@pytest.mark.parametrize('action, points', [
+    (Action.SG_3_HALF, 3),
+    (Action.SG_3_FULL, 3),
+    (Action.PG_HALF, 2),
+    (Action.SG_DRIBBLE_DUNK, 2),
+    ('pg_3_half', 3),
+    ('layup', 2),
+])
+def test_shot_points(action, points):
+    assert shot_points(action) == points
+
+
+@pytest.mark.parametrize('mutate, dirty', [
+    (lambda gs: gs.score_points(1, 2), {('team', 1)}),
+    (lambda gs: gs.set_possession(2, 'sg'), {('game',)}),
+    (lambda gs: gs.advance_moves(3), {('game',)}),
+])
+def test_mutators_mark_dirty(mutate, dirty):
+    gs = GameState(1, 1)
+    gs.take_dirty()
+    version = gs.version
+    mutate(gs)
+    assert gs.take_dirty() == dirty
+    assert gs.version > version
@@ -0,0 +1,27 @@
+import metrics
+from game_core import GameState
+from persistence import SQLiteBackend
+
+
+def test_counter_callback_renders_as_counter():
+    reg = metrics.Registry()
+    totals = {('hit',): 3, ('miss',): 1}
+    reg.counter_callback('bb_lookups_total', 'Lookups.', lambda: totals, ['result'])
+    reg.gauge('bb_loaded', 'Loaded.', lambda: 2)
+    text = reg.render()
+    assert '# TYPE bb_lookups_total counter' in text
+    assert 'bb_lookups_total{result="hit"} 3' in text
+    assert '# TYPE bb_loaded gauge' in text
+
+
+def test_write_behind_batches_record_per_op_timings(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / 'blitz.db'))
+    storage.init()
+    before = {op: metrics.DB_SECONDS.count(op) for op in ('save_game', 'delete_game', 'write_batch')}
+    gs = GameState(1, 1)
+    gs.join_player(1, 'host')
+    storage.queue_save(1, gs).result(5)
+    storage.queue_delete(1).result(5)
+    storage.close()
+    assert {op: metrics.DB_SECONDS.count(op) - n for op, n in before.items()} == \
+        {'save_game': 1, 'delete_game': 1, 'write_batch': 2}
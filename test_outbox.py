@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from outbox import ChannelOutbox, OutboxStats, Outboxes, TokenBucket
+
+
+class Message:
+    def __init__(self, channel, content, view=None):
+        self.channel = channel
+        self.content = content
+        self.view = view
+        self.edits = []
+        self.deleted = False
+
+    async def edit(self, content):
+        if self.deleted:
+            raise RuntimeError('unknown message')
+        self.content = content
+        self.edits.append(content)
+
+
+class Channel:
+    def __init__(self, id=1, fail_sends=0):
+        self.id = id
+        self.sent = []
+        self.fail_sends = fail_sends
+
+    async def send(self, content, view=None):
+        if self.fail_sends:
+            self.fail_sends -= 1
+            raise RuntimeError('send failed')
+        message = Message(self, content, view)
+        self.sent.append(message)
+        return message
+
+
+def make_outbox(channel, linger=0.01):
+    return ChannelOutbox(channel, OutboxStats(), rate=1000, burst=100, linger=linger)
+
+
+async def drained(box):
+    while box._task is not None:
+        await asyncio.sleep(0.005)
+
+
+def test_lines_share_one_scoreboard_message():
+    async def main():
+        channel = Channel()
+        box = make_outbox(channel)
+        for n in range(5):
+            box.line(f'move {n}', header='1 - 0')
+        await drained(box)
+        box.line('move 5', header='2 - 0')
+        await drained(box)
+        return channel, box.stats
+
+    channel, stats = asyncio.run(main())
+    assert len(channel.sent) == 1
+    board = channel.sent[0]
+    assert board.content.split('\n') == ['2 - 0'] + [f'move {n}' for n in range(6)]
+    assert (stats.lines, stats.sends, stats.edits) == (6, 1, 1)
+    assert stats.messages_saved == 5
+
+
+def test_prompt_goes_first_and_carries_pending_lines():
+    async def main():
+        channel = Channel()
+        box = make_outbox(channel, linger=1)
+        box.line('steal!')
+        message = await box.prompt('your move', view='view')
+        await drained(box)
+        return channel, message
+
+    channel, message = asyncio.run(main())
+    assert channel.sent == [message]
+    assert message.content == 'steal!\nyour move'
+    assert message.view == 'view'
+
+
+def test_failed_prompt_fails_its_future():
+    async def main():
+        channel = Channel(fail_sends=1)
+        box = make_outbox(channel)
+        with pytest.raises(RuntimeError):
+            await box.prompt('your move')
+        return box.stats
+
+    assert asyncio.run(main()).errors == 1
+
+
+def test_deleted_scoreboard_is_replaced():
+    async def main():
+        channel = Channel()
+        box = make_outbox(channel)
+        box.line('one')
+        await drained(box)
+        channel.sent[0].deleted = True
+        box.line('two')
+        await drained(box)
+        return channel
+
+    channel = asyncio.run(main())
+    assert [m.content for m in channel.sent] == ['one', 'one\ntwo']
+
+
+def test_outboxes_are_per_channel():
+    async def main():
+        boxes = Outboxes(rate=1000, burst=100, linger=0.01)
+        a, b = Channel(1), Channel(2)
+        assert boxes.for_channel(a) is boxes.for_channel(a)
+        boxes.for_channel(a).line('a')
+        boxes.for_channel(b).line('b')
+        await asyncio.gather(drained(boxes.for_channel(a)), drained(boxes.for_channel(b)))
+        boxes.discard(1)
+        return boxes, a, b
+
+    boxes, a, b = asyncio.run(main())
+    assert len(boxes) == 1
+    assert [m.content for m in a.sent] == ['a'] and [m.content for m in b.sent] == ['b']
+    assert boxes.stats.lines == 2
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    async def main():
+        now = [0.0]
+        bucket = TokenBucket(rate=100, burst=2, clock=lambda: now[0])
+        waits = [await bucket.take() for _ in range(3)]
+        now[0] += 1
+        waits.append(await bucket.take())
+        return waits
+
+    waits = asyncio.run(main())
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.01)
+    assert waits[3] == 0.0
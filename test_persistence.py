@@ -0,0 +1,165 @@
+import sqlite3
+
+import pytest
+
+import persistence
+from game_core import Action, GameState, MoveEvent
+from persistence import ConnectionPool, MemoryBackend, SQLiteBackend, WriteBehindQueue
+
+
+def full_lobby(guild_id: int, host_id: int = 1) -> GameState:
+    gs = GameState(host_id, guild_id)
+    for uid in range(host_id, host_id + 6):
+        gs.join_player(uid, f'player{uid}')
+    gs.start_game(host_id)
+    return gs
+
+
+def finished_game(guild_id: int) -> GameState:
+    gs = full_lobby(guild_id)
+    gs.score_points(1, 7)
+    gs.score_points(2, 3)
+    gs.end_game()
+    return gs
+
+
+@pytest.fixture
+def backend(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / 'blitz.db'))
+    storage.init()
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def flaky(tmp_path):
+    """A writer on its own pool whose next batch fails once ``fail[0]`` is set."""
+    pool = ConnectionPool(str(tmp_path / 'blitz.db'))
+    persistence.init_db(pool)
+    fail = [False]
+
+    def pool_getter():
+        if fail[0]:
+            fail[0] = False
+            raise sqlite3.OperationalError('disk I/O error')
+        return pool
+
+    writer = WriteBehindQueue(pool_getter)
+    writer.retry_seconds = 0
+    yield writer, pool, fail
+    writer.close(5)
+    pool.close()
+
+
+def rows(storage, sql, *params):
+    conn = sqlite3.connect(storage.db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_save_load_round_trip(backend):
+    gs = full_lobby(1)
+    gs.score_points(1, 4)
+    backend.queue_save(1, gs).result(5)
+    loaded = backend.load(1)
+    assert loaded.teams[1].score == 4
+    assert loaded.find_slot_of_user(2) == gs.find_slot_of_user(2)
+    assert backend.list() == [1]
+
+
+def test_queued_save_of_unchanged_game_is_coalesced(backend):
+    gs = full_lobby(1)
+    futs = [backend.queue_save(1, gs) for _ in range(5)]
+    for fut in futs:
+        fut.result(5)
+    assert backend.load(1).host_id == 1
+
+
+@pytest.mark.parametrize('mode', ['rows', 'blob'])
+@pytest.mark.parametrize('wait_for_save', [True, False])
+def test_newgame_after_finish_archives_result(backend, monkeypatch, mode, wait_for_save):
+    # /newgame deletes the guild's finished game; its result must end up archived
+    monkeypatch.setattr(persistence, 'STORAGE_MODE', mode)
+    fut = backend.queue_save(1, finished_game(1))
+    if wait_for_save:
+        fut.result(5)
+    backend.queue_delete(1)
+    backend.queue_save(1, full_lobby(1, host_id=50)).result(5)
+
+    archived = rows(backend, 'SELECT guild_id, host_id, team1_score, team2_score, winner FROM games_archive')
+    assert archived == [(1, 1, 7, 3, 1)]
+    assert backend.load(1).host_id == 50
+    assert backend.load(1).teams[1].score == 0
+
+
+def test_delete_of_unfinished_game_is_not_archived(backend):
+    backend.queue_save(1, full_lobby(1)).result(5)
+    backend.queue_delete(1).result(5)
+    assert rows(backend, 'SELECT COUNT(*) FROM games_archive') == [(0,)]
+    assert backend.load(1) is None
+
+
+def test_failed_save_is_rewritten_in_full_by_the_next(flaky):
+    writer, pool, fail = flaky
+    gs = full_lobby(1)
+    fail[0] = True
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit_save(1, gs).result(5)
+    gs.score_points(1, 2)
+    writer.submit_save(1, gs).result(5)
+    loaded = persistence.load_game(1, pool)
+    assert loaded.find_slot_of_user(6) is not None
+    assert loaded.teams[1].score == 2
+
+
+def test_failed_save_is_retried_without_another_save(flaky):
+    writer, pool, fail = flaky
+    gs = full_lobby(1)
+    fail[0] = True
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit_save(1, gs).result(5)
+    writer.close(5)
+    assert persistence.load_game(1, pool).find_slot_of_user(6) is not None
+
+
+def test_failed_delete_is_retried(flaky):
+    writer, pool, fail = flaky
+    writer.submit_save(1, full_lobby(1)).result(5)
+    fail[0] = True
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit_delete(1).result(5)
+    writer.close(5)
+    assert persistence.load_game(1, pool) is None
+
+
+def test_failed_batch_keeps_its_events_and_career_rows(flaky):
+    writer, pool, fail = flaky
+    gs = full_lobby(1)
+    writer.submit_save(1, gs).result(5)
+    event, _ = gs.play(gs.begin_turn(), Action.PG_HALF)
+    fail[0] = True
+    with pytest.raises(sqlite3.OperationalError):
+        persistence.queue_move(1, gs, event, writer).result(5)
+    writer.close(5)
+    with pool.connection() as conn:
+        assert conn.execute('SELECT guild_id, seq, choice FROM move_events').fetchall() == [(1, event.seq, 'pg_half')]
+        assert conn.execute('SELECT pg_moves FROM career_stats WHERE user_id=1').fetchall() == [(1,)]
+
+
+def test_memory_backend_archives_on_delete():
+    storage = MemoryBackend()
+    storage.queue_save(1, finished_game(1))
+    storage.queue_delete(1)
+    assert [(a['guild_id'], a['scores']) for a in storage.archive] == [(1, {1: 7, 2: 3})]
+    assert storage.load(1) is None
+
+
+def test_memory_backend_sweep_archives_logged_moves():
+    storage = MemoryBackend()
+    gs = finished_game(1)
+    storage.queue_save(1, gs)
+    storage.queue_move(1, gs, MoveEvent('attack', team=2, actor_id=4, points=2, seq=gs.event_seq + 1))
+    assert storage.archive_finished(min_age_seconds=0) == 1
+    assert [a['scores'] for a in storage.archive] == [{1: 7, 2: 5}]
@@ -0,0 +1,132 @@
+import asyncio
+
+from actors import GuildActors
+from game_core import GameState
+from persistence import MemoryBackend
+from registry import GameRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def lobby(guild_id: int) -> GameState:
+    gs = GameState(1, guild_id)
+    gs.join_player(1, 'host')
+    return gs
+
+
+def make_registry(**kwargs):
+    clock = Clock()
+    reg = GameRegistry(clock=clock, **kwargs)
+    storage = MemoryBackend()
+    reg.attach(storage)
+    return reg, storage, clock
+
+
+def test_idle_game_is_evicted_and_loaded_back():
+    reg, storage, clock = make_registry(idle_seconds=60)
+    reg[1] = lobby(1)
+    clock.now += 61
+
+    async def main():
+        assert await reg.sweep() == 1
+        assert 1 not in reg
+        await reg.sweep()  # the save has landed; forget the evicted copy
+        return await reg.load(1)
+
+    gs = asyncio.run(main())
+    assert gs.find_slot_of_user(1) is not None
+    assert reg[1] is gs
+    assert (reg.evictions, reg.reloads) == (1, 1)
+
+
+def test_game_in_play_is_not_evicted():
+    reg, storage, clock = make_registry(idle_seconds=60)
+    gs = lobby(1)
+    for uid in range(2, 7):
+        gs.join_player(uid, f'p{uid}')
+    gs.start_game(1)
+    gs.begin_turn()
+    reg[1] = gs
+    clock.now += 61
+    assert asyncio.run(reg.sweep()) == 0
+    assert reg[1] is gs
+
+
+def test_finished_game_is_not_loaded_back():
+    reg, storage, clock = make_registry(finished_seconds=10)
+    gs = lobby(1)
+    gs.end_game()
+    reg[1] = gs
+    clock.now += 11
+
+    async def main():
+        assert await reg.sweep() == 1
+        await reg.sweep()
+        return await reg.load(1)
+
+    assert asyncio.run(main()) is None
+
+
+def test_evicted_game_is_taken_back_before_its_save_is_swept():
+    reg, storage, clock = make_registry()
+    gs = lobby(1)
+    reg[1] = gs
+    assert reg.evict(1)
+    assert reg.get(1) is gs
+
+
+def test_eviction_waits_for_the_guilds_queued_commands():
+    async def main():
+        actors = GuildActors()
+        reg, storage, clock = make_registry(idle_seconds=60, actors=actors)
+        gs = reg[1] = lobby(1)
+        clock.now += 61
+        release = asyncio.Event()
+
+        async def command():
+            await release.wait()
+            gs.join_player(2, 'late')
+
+        running = asyncio.create_task(actors.run(1, command))
+        await asyncio.sleep(0)
+        sweep = asyncio.create_task(reg.sweep())
+        await asyncio.sleep(0)
+        assert reg.values() == [gs]
+        release.set()
+        await running
+        assert await sweep == 1
+        return storage.load(1)
+
+    saved = asyncio.run(main())
+    assert saved.find_slot_of_user(2) is not None
+
+
+def test_overflow_evicts_least_recently_touched():
+    async def main():
+        reg, storage, clock = make_registry(max_games=2, actors=GuildActors())
+        for gid in (1, 2, 3):
+            reg[gid] = lobby(gid)
+            clock.now += 1
+        await asyncio.gather(*reg._tasks)
+        return reg, storage
+
+    reg, storage = asyncio.run(main())
+    assert sorted(reg) == [2, 3]
+    assert storage.load(1) is not None
+
+
+def test_dropped_game_is_torn_down_and_not_saved():
+    reg, storage, clock = make_registry()
+    torn_down = []
+    reg.on_evict = torn_down.append
+    gs = reg[1] = lobby(1)
+    assert reg.drop(1) is gs
+    assert reg.drop(1) is None
+    assert torn_down == [gs]
+    assert 1 not in reg and storage.load(1) is None
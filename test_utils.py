@@ -3,12 +3,35 @@ Test utilities for Basketball Blitz.
 Add these as debug/test commands during development.
 """
 
-def create_test_commands(bot, games):
-    """Create test commands as a cog."""
+def create_test_commands(bot, games, storage=None):
+    """Create test commands as a cog.
+
+    ``storage`` is the bot's StorageBackend; defaults to one built from config.
+    """
+    import functools
     from discord.ext import commands
-    from game_core import GameState
-    from persistence import save_game, delete_game
+    from actors import GuildBusy
+    from game_core import GameState, MAX_MOVES
+    from persistence import make_backend
     import discord
+
+    if storage is None:
+        storage = make_backend()
+    
+    def serialized(func):
+        """Run the command on the guild's actor, like the bot's own commands."""
+        @functools.wraps(func)
+        async def wrapper(self, ctx, *args, **kwargs):
+            async def job():
+                await games.load(ctx.guild.id)
+                return await func(self, ctx, *args, **kwargs)
+            if games.actors is None:
+                return await job()
+            try:
+                return await games.actors.run(ctx.guild.id, job)
+            except GuildBusy:
+                await ctx.send('Game is busy — try again in a moment.')
+        return wrapper
     
     class TestCommands(commands.Cog):
         def __init__(self, bot):
@@ -16,16 +39,18 @@ def create_test_commands(bot, games):
         
         @commands.command(name='test_reset')
         @commands.is_owner()
+        @serialized
         async def test_reset(self, ctx):
             """Reset all games (owner-only, for testing)."""
             gid = ctx.guild.id
-            if gid in games:
-                games.pop(gid)
-                delete_game(gid)
+            # same teardown as /yeet: deadlines, cached render and outbox go too
+            if games.drop(gid) is not None:
+                storage.queue_delete(gid)
             await ctx.send('✅ Game reset.')
         
         @commands.command(name='test_state')
         @commands.is_owner()
+        @serialized
         async def test_state(self, ctx):
             """Display current game state (owner-only)."""
             gid = ctx.guild.id
@@ -35,7 +60,7 @@ def create_test_commands(bot, games):
             gs = games[gid]
             msg = f"**Game State**\n"
             msg += f"Active: {gs.active}\n"
-            msg += f"Move: {gs.move_count}/36\n"
+            msg += f"Move: {gs.move_count}/{MAX_MOVES}\n"
             msg += f"Possession: Team {gs.current_possession_team} at {gs.current_attacker_pos}\n"
             msg += f"Toss Active: {gs.toss_active}\n"
             for tid, team in gs.teams.items():
@@ -48,6 +73,7 @@ def create_test_commands(bot, games):
         
         @commands.command(name='test_advance')
         @commands.is_owner()
+        @serialized
         async def test_advance(self, ctx, moves: int = 1):
             """Advance move counter (owner-only)."""
             gid = ctx.guild.id
@@ -55,12 +81,13 @@ def create_test_commands(bot, games):
                 await ctx.send('No game.')
                 return
             gs = games[gid]
-            gs.move_count += moves
-            save_game(gid, gs)
+            gs.advance_moves(moves)
+            storage.queue_save(gid, gs)
             await ctx.send(f'✅ Advanced {moves} moves. Now at {gs.move_count}.')
         
         @commands.command(name='test_score')
         @commands.is_owner()
+        @serialized
         async def test_score(self, ctx, team: int, points: int):
             """Award points to a team (owner-only)."""
             gid = ctx.guild.id
@@ -72,11 +99,12 @@ def create_test_commands(bot, games):
                 await ctx.send('Invalid team.')
                 return
             gs.score_points(team, points)
-            save_game(gid, gs)
+            storage.queue_save(gid, gs)
             await ctx.send(f'✅ Team {team} scored {points}. Total: {gs.teams[team].score}')
         
         @commands.command(name='test_possession')
         @commands.is_owner()
+        @serialized
         async def test_possession(self, ctx, team: int, pos: str):
             """Set possession (owner-only)."""
             gid = ctx.guild.id
@@ -88,7 +116,7 @@ def create_test_commands(bot, games):
                 await ctx.send('Invalid team/pos.')
                 return
             gs.set_possession(team, pos)
-            save_game(gid, gs)
+            storage.queue_save(gid, gs)
             await ctx.send(f'✅ Possession: Team {team} {pos.upper()}')
     
     return TestCommands(bot)